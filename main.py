@@ -1,3 +1,4 @@
+import os
 import zmq
 
 from njoy_core.input_node import EmbeddedInputNode
@@ -15,11 +16,14 @@ def main():
 
     input_node = EmbeddedInputNode(context=ctx,
                                    events_endpoint="inproc://input_events",
-                                   requests_endpoint="inproc://requests")
+                                   requests_endpoint="inproc://requests",
+                                   backend=os.environ.get('NJOY_INPUT_BACKEND', 'sdl'),
+                                   wait_strategy=os.environ.get('NJOY_INPUT_WAIT_STRATEGY', 'sleep'))
 
     output_node = EmbeddedOutputNode(context=ctx,
                                      events_endpoint="inproc://output_events",
-                                     requests_endpoint="inproc://requests")
+                                     requests_endpoint="inproc://requests",
+                                     backend=os.environ.get('NJOY_OUTPUT_BACKEND', 'vjoy'))
 
     core.start()
     input_node.start()
@@ -7,7 +7,10 @@ from .model import CoreRequest
 from .model import InputNodeRegisterRequest, InputNodeRegisterReply
 from .model import OutputNodeCapabilities, OutputNodeAssignments
 from .model import InputNode, OutputNode, PhysicalDevice, VirtualDevice, Axis, Button, Hat
-from .multiplexers import InputMultiplexer, OutputMultiplexer
+from .model import AxisEncoding, PhysicalControlEvent, VirtualControlEvent
+from .multiplexers import InputMultiplexer, OutputMultiplexer, StreamingOutputMultiplexer
+from .reactor import Reactor
+from .state_store import StateStore
 
 
 class CoreException(Exception):
@@ -18,18 +21,25 @@ class Core(threading.Thread):
     __INTERNAL_MUX_IN__ = 'inproc://core/internal/mux_in'
     __INTERNAL_MUX_OUT__ = 'inproc://core/internal/mux_out'
 
-    def __init__(self, *, context, input_events, output_events, requests):
+    def __init__(self, *, context, input_events, output_events, requests,
+                 axis_encodings=(AxisEncoding.INT16, AxisEncoding.FLOAT64), conflate_inputs=False, use_reactor=False,
+                 streaming_outputs=False):
         super().__init__()
 
         self._ctx = context
+        self._axis_encodings = axis_encodings  # By order of preference
+        self._use_reactor = use_reactor  # A single Reactor thread, instead of an Actuator per virtual control
 
         self._mux_in = InputMultiplexer(context=self._ctx,
                                         frontend=input_events,
-                                        backend=self.__INTERNAL_MUX_IN__)
+                                        backend=self.__INTERNAL_MUX_IN__,
+                                        conflate=conflate_inputs)
 
-        self._mux_out = OutputMultiplexer(context=self._ctx,
-                                          frontend=output_events,
-                                          backend=self.__INTERNAL_MUX_OUT__)
+        # The output nodes must be started in streaming mode as well
+        output_multiplexer_cls = StreamingOutputMultiplexer if streaming_outputs else OutputMultiplexer
+        self._mux_out = output_multiplexer_cls(context=self._ctx,
+                                               frontend=output_events,
+                                               backend=self.__INTERNAL_MUX_OUT__)
 
         self._requests = self._ctx.socket(zmq.REP)
         self._requests.bind(requests)
@@ -75,21 +85,33 @@ class Core(threading.Thread):
 
         return node
 
+    def _negotiate_axis_encoding(self, node_axis_encodings):
+        for axis_encoding in self._axis_encodings:
+            if axis_encoding in node_axis_encodings:
+                return axis_encoding
+        raise CoreException("No common axis encoding with the node : {}".format(node_axis_encodings))
+
     def _handshake(self):
         parsed_design = njoy_core.core.parsers.design_parser.parse_design()
         devices = parsed_design['input_devices']
         controls = parsed_design['controls']
+        axis_encodings = dict()  # Axis encoding negotiated with the output node of each virtual control
 
         # Accepts requests until we've registered all the input and output nodes
         while devices or controls:
             request = CoreRequest.recv(self._requests)
 
             if isinstance(request, InputNodeRegisterRequest):
-                reply = InputNodeRegisterReply(node=self._register_input_node(request.available_devices))
+                reply = InputNodeRegisterReply(node=self._register_input_node(request.available_devices),
+                                               axis_encoding=self._negotiate_axis_encoding(request.axis_encodings))
                 devices = [d for d in devices if not d.is_assigned]
 
             elif isinstance(request, OutputNodeCapabilities):
-                reply = OutputNodeAssignments(node=self._register_output_node(controls, request.capabilities))
+                reply = OutputNodeAssignments(node=self._register_output_node(controls, request.capabilities),
+                                              axis_encoding=self._negotiate_axis_encoding(request.axis_encodings))
+                for control in controls:
+                    if control.is_assigned:
+                        axis_encodings[id(control)] = reply.axis_encoding
                 controls = [c for c in controls if not c.is_assigned]
 
             else:
@@ -97,11 +119,29 @@ class Core(threading.Thread):
 
             reply.send(self._requests)
 
-        return [Actuator(context=self._ctx,
-                         input_endpoint=self.__INTERNAL_MUX_IN__,
-                         output_endpoint=self.__INTERNAL_MUX_OUT__,
-                         virtual_control=control)
-                for control in parsed_design['controls']]
+        # All the nodes are registered now, the controls and their identities won't change anymore
+        PhysicalControlEvent.freeze_lookup_table()
+        VirtualControlEvent.freeze_lookup_table()
+
+        if self._use_reactor:
+            return [Reactor(context=self._ctx,
+                            input_endpoint=self.__INTERNAL_MUX_IN__,
+                            output_endpoint=self.__INTERNAL_MUX_OUT__,
+                            virtual_controls=parsed_design['controls'],
+                            axis_encodings=axis_encodings)]
+
+        # A single store of the physical states, shared by all the Actuators
+        state_store = StateStore(context=self._ctx,
+                                 input_endpoint=self.__INTERNAL_MUX_IN__,
+                                 physical_controls=[c for vc in parsed_design['controls'] for c in vc.input_controls])
+
+        return [state_store] + [Actuator(context=self._ctx,
+                                         input_endpoint=self.__INTERNAL_MUX_IN__,
+                                         output_endpoint=self.__INTERNAL_MUX_OUT__,
+                                         virtual_control=control,
+                                         axis_encoding=axis_encodings[id(control)],
+                                         state_store=state_store)
+                                for control in parsed_design['controls']]
 
     def run(self):
         threads = [self._mux_in, self._mux_out]
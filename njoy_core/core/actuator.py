@@ -1,27 +1,63 @@
 import threading
 import zmq
 
-from njoy_core.core.model import VirtualControlEvent
+from njoy_core.core.model import AxisEncoding, VirtualControlEvent
+from njoy_core.core.toolbox.memoization import memoize
 from .input_buffer import InputBuffer
 
 
 class Actuator(threading.Thread):
-    def __init__(self, *, context, input_endpoint, output_endpoint, virtual_control):
+    """Computes and emits the value of a virtual control, each time one of its input controls changed.
+
+    The input states are read either from a StateStore shared by all the Actuators of the core, or, when no store is
+    given, from a dedicated InputBuffer.
+
+    The last emitted value is remembered, and the outputs which wouldn't change it are suppressed (and counted), saving
+    a round trip through the OutputMultiplexer and a call to the output device."""
+
+    def __init__(self, *, context, input_endpoint, output_endpoint, virtual_control,
+                 axis_encoding=AxisEncoding.FLOAT64, state_store=None):
         super().__init__()
         self._ctx = context
         self._socket = self._ctx.socket(zmq.REQ)
         self._socket.set(zmq.IDENTITY, VirtualControlEvent.mk_identity(virtual_control))
         self._socket.connect(output_endpoint)
         self._virtual_control = virtual_control
-        self._input_buffer = InputBuffer(context=context,
-                                         input_endpoint=input_endpoint,
-                                         physical_controls=virtual_control.input_controls)
+        self._processor = memoize(virtual_control.processor, virtual_control.input_controls)
+        self._axis_encoding = axis_encoding
+        self._state_store = state_store
+        self._state_version = 0  # Last version of the state store we consumed
+        if state_store is None:
+            self._input_buffer = InputBuffer(context=context,
+                                             input_endpoint=input_endpoint,
+                                             physical_controls=virtual_control.input_controls)
+        else:
+            self._input_buffer = None
+        self._last_value = None  # Last emitted value, None until a first value is emitted
+        self._suppressed_events = 0
+
+    def _wait_state(self):
+        if self._input_buffer is not None:
+            return self._input_buffer.state
+        (self._state_version, state) = self._state_store.wait_state(self._virtual_control.input_controls,
+                                                                    self._state_version)
+        return state
+
+    @property
+    def suppressed_events(self):
+        return self._suppressed_events
 
     def loop(self):
-        VirtualControlEvent(value=self._virtual_control.processor(self._input_buffer.state)).send(self._socket)
+        value = self._processor(self._wait_state())
+        if value is not None and value == self._last_value:
+            self._suppressed_events += 1
+            return
+        VirtualControlEvent(value=value, axis_encoding=self._axis_encoding).send(self._socket)
         VirtualControlEvent.recv(self._socket)
+        self._last_value = value
 
     def run(self):
-        self._input_buffer.start()
+        if self._input_buffer is not None:
+            self._input_buffer.start()
         while True:
             self.loop()
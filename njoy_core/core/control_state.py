@@ -0,0 +1,69 @@
+"""Compact states of a fixed set of controls, used by the Core at run time.
+
+The controls are given a dense slot once and for all, and their values are stored in a preallocated list, indexed by
+those slots. The slots are keyed by the controls ids, so the lookups never call the controls __hash__ (which rebuilds
+a tuple on each call).
+
+ControlState is the mutable, writer side. Its snapshot() is O(1) : it hands the current values list over to a
+read-only ControlStateView, and marks it as shared. The next write then copies the list before modifying it
+(copy-on-write), so the published views are never modified afterwards.
+
+ControlStateView is a read-only mapping of the controls to their values, so the processors can read it as they would
+read a dict.
+"""
+import collections.abc
+
+
+class ControlStateView(collections.abc.Mapping):
+    def __init__(self, *, controls, slots, values):
+        self._controls = controls  # slot => control
+        self._slots = slots  # id(control) => slot
+        self._values = values  # slot => value
+
+    def _slot(self, control):
+        slot = self._slots.get(id(control))
+        if slot is None or self._controls[slot] is not control:
+            raise KeyError(control)
+        return slot
+
+    def __getitem__(self, control):
+        return self._values[self._slot(control)]
+
+    def __contains__(self, control):
+        slot = self._slots.get(id(control))
+        return slot is not None and self._controls[slot] is control
+
+    def __iter__(self):
+        return iter(self._controls)
+
+    def __len__(self):
+        return len(self._controls)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, dict(zip(self._controls, self._values)))
+
+    def values(self):
+        return list(self._values)
+
+
+class ControlState(ControlStateView, collections.abc.MutableMapping):
+    def __init__(self, controls):
+        controls = tuple(collections.OrderedDict.fromkeys(controls))  # Duplicates share the same slot
+        super().__init__(controls=controls,
+                         slots={id(c): slot for (slot, c) in enumerate(controls)},
+                         values=[None] * len(controls))
+        self._shared = False  # Whether the values list has been handed over to a view
+
+    def __setitem__(self, control, value):
+        slot = self._slot(control)
+        if self._shared:
+            self._values = list(self._values)
+            self._shared = False
+        self._values[slot] = value
+
+    def __delitem__(self, control):
+        raise TypeError("Controls can't be removed from a {}".format(self.__class__.__name__))
+
+    def snapshot(self):
+        self._shared = True
+        return ControlStateView(controls=self._controls, slots=self._slots, values=self._values)
@@ -1,9 +1,9 @@
 import collections
 import threading
-import time
 import zmq
 
-from njoy_core.core.model import PhysicalControlEvent
+from njoy_core.core.model import PhysicalControlEvent, PhysicalControlEventBatch, PhysicalDeviceSnapshot
+from .control_state import ControlState
 
 
 class InputBuffer(threading.Thread):
@@ -17,8 +17,16 @@ class InputBuffer(threading.Thread):
 
     - The main loop collects events as fast as it can, but only publishes a new state when something changed.
 
+    Both loops accept single events, batches of events and snapshots of whole devices (typically received when the
+    input nodes emit their initial state, so the initial loop usually completes in a single round).
+    A whole batch or snapshot is applied before publishing, and the controls which aren't ours are ignored.
+    The events are decoded in place, straight into the internal state, without instantiating any intermediate event.
+    The internal state is array-backed and copy-on-write : publishing a state is O(1), the published states are
+    read-only mapping views of the controls values.
+
     The state property is a blocking call, which is waiting for a state to be put in the queue
-    It then pops and return it, so each state change is only consumed once."""
+    It then pops and return it, so each state change is only consumed once.
+    The consumer sleeps on a condition variable until a state is published, wait_state() also accepts a timeout."""
 
     def __init__(self, *, context, input_endpoint, physical_controls):
         super().__init__()
@@ -28,29 +36,30 @@ class InputBuffer(threading.Thread):
         self._socket.connect(input_endpoint)
         for control in physical_controls:
             self._socket.subscribe(PhysicalControlEvent.mk_identity(control))
+        for topic in {PhysicalDeviceSnapshot.mk_topic(control.dev) for control in physical_controls}:
+            self._socket.subscribe(topic)
 
-        self._state = {c: None for c in physical_controls}
+        self._state = ControlState(physical_controls)
         self._state_queue = collections.deque(maxlen=2)
+        self._state_published = threading.Condition()
 
     def _publish_state(self):
-        self._state_queue.appendleft({c: s for (c, s) in self._state.items()})
+        with self._state_published:
+            self._state_queue.appendleft(self._state.snapshot())
+            self._state_published.notify()
 
     def initial_loop(self):
         # Consume the first events and collect them
-        event = PhysicalControlEvent.recv(self._socket)
-        self._state[event.control] = event.value
+        PhysicalControlEventBatch.recv_into(self._socket, self._state)
 
         # Delay publishing into the output queue until we have a first full set
-        if not any([value is None for value in self._state.values()]):
+        if None not in self._state.values():
             self._publish_state()
 
     def loop(self):
         # Consume the input events as fast as we can, collecting the states in a dict.
         # Older unprocessed states are discarded.
-        event = PhysicalControlEvent.recv(self._socket)
-
-        if self._state[event.control] != event.value:
-            self._state[event.control] = event.value
+        if PhysicalControlEventBatch.recv_into(self._socket, self._state):
             self._publish_state()
 
     def run(self):
@@ -62,9 +71,14 @@ class InputBuffer(threading.Thread):
         while True:
             self.loop()
 
+    def wait_state(self, timeout=None):
+        """Blocking call : wait until a state is published, or until the timeout (in seconds) expires.
+        Returns None if the timeout expired."""
+        with self._state_published:
+            if not self._state_published.wait_for(lambda: self._state_queue, timeout=timeout):
+                return None
+            return self._state_queue.pop()
+
     @property
     def state(self):
-        # Blocking call : wait 100 µs between each read attempt, to give a chance for other threads to run
-        while not self._state_queue:
-            time.sleep(0.0001)
-        return self._state_queue.pop()
+        return self.wait_state()
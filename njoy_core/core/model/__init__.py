@@ -8,7 +8,10 @@ from .devices import DeviceDuplicateAliasError, DeviceDuplicateGuidError, Device
 from .devices import DeviceRegisterControlError
 from .controls import Axis, Button, Hat
 from .controls import ControlInvalidDeviceError
-from .messages import HatState, ControlEvent, PhysicalControlEvent, VirtualControlEvent
+from .messages import HatState, AxisEncoding, ControlEvent, PhysicalControlEvent, VirtualControlEvent
+from .messages import ControlEventBatch, PhysicalControlEventBatch, VirtualControlEventBatch
+from .messages import DeviceSnapshot, PhysicalDeviceSnapshot, VirtualDeviceSnapshot
+from .messages import OutputCredits
 from .messages import CoreRequest, InputNodeRegisterRequest, InputNodeRegisterReply
 from .messages import OutputNodeCapabilities, OutputNodeAssignments
-from .messages import MessageIdentityError
+from .messages import MessageError, MessageIdentityError, MessageProtocolVersionError
@@ -7,7 +7,8 @@ They just *represent* a control, though, they do not store any state themselves.
 
 Instead, they are used by the Core at design-parsing time, to build a set of recursive state processor functions (by
 calling the 'mk_state_processor' on the top-level virtual controls). At runtime, the Actuators will call the
-corresponding state processor to obtain a new state from the physical controls.
+corresponding state processor to obtain a new state from the physical controls. Alternatively, the Reactor compiles
+the whole design into one flat evaluator per virtual device (see parsers.design_compiler).
 
 The controls are otherwise used throughout the whole application as a model, to identify and retrieve specific controls
 of specific devices on any given node.
@@ -82,6 +83,7 @@ class AbstractControl(metaclass=AutoRegisteringControl):
     def __init__(self, *, processor=None, inputs=None, **_kwargs):
         self.dev = None  # Automatically set by the device it is assigned to
         self.id = None  # Automatically set by the device it is assigned to
+        self.identity = None  # Set while the ControlEvent lookup table is frozen (see ControlEvent.freeze_lookup_table)
         self.processor = processor
         self.input_controls = inputs
 
@@ -95,16 +97,20 @@ class AbstractControl(metaclass=AutoRegisteringControl):
                                                       self.__class__.__name__.lower(),
                                                       self.id)
 
+    @property
+    def _hashable_inputs(self):
+        return tuple(self.input_controls) if self.input_controls is not None else None
+
     def __hash__(self):
         if self.dev is None:
             return hash((self.__class__.__name__,
-                         hash(self.input_controls),
+                         hash(self._hashable_inputs),
                          id(self.processor),
                          self.id))
 
         if self.dev.node is None:
             return hash((self.__class__.__name__,
-                         hash(self.input_controls),
+                         hash(self._hashable_inputs),
                          id(self.processor),
                          self.dev.id,
                          self.id))
@@ -1,8 +1,8 @@
 """Central module for all zmq message definitions."""
 import enum
-import pickle
 import struct
 
+from .nodes import InputNode, OutputNode
 from .devices import PhysicalDevice, VirtualDevice
 from .controls import AbstractControl, Axis, Button, Hat
 
@@ -15,6 +15,11 @@ class MessageIdentityError(MessageError):
     pass
 
 
+class MessageProtocolVersionError(MessageError):
+    def __init__(self, version, expected_version):
+        super().__init__("Unsupported protocol version {} (expected {})".format(version, expected_version))
+
+
 @enum.unique
 class HatState(enum.IntFlag):
     HAT_CENTER = 0
@@ -36,12 +41,20 @@ class HatState(enum.IntFlag):
         return {v for v in cls}
 
 
+@enum.unique
+class AxisEncoding(enum.IntEnum):
+    """Wire encodings of the axis values, negotiated for each node during the handshake."""
+    FLOAT64 = 0
+    INT16 = 1
+
+
 class ControlEvent:
     """
     Anonymous ControlEvent frames:
             | Evt Val      |
     Ready:  |     -        | A single empty frame (used as a 'ready' signal)
     Axis:   | vvvvvvvv * 8 | float (double)
+    Axis:   | vvvvvvvv * 2 | int16 (fixed-point)
     Button: | 0000000v     | bool          (MSB = 0)
     Hat:    | 1000vvvv     | HatValue enum (MSB = 1)
 
@@ -50,6 +63,7 @@ class ControlEvent:
             | Node+Dev Kind+Ctrl| Empty | Evt Val      |
     Ready:  | nnnndddd ........ |   -   |     -        | Id + 2 empty frames (used as a 'ready' signal)
     Axis:   | nnnndddd 10000ccc |   -   | vvvvvvvv * 8 | float (double)
+    Axis:   | nnnndddd 10000ccc |   -   | vvvvvvvv * 2 | int16 (fixed-point)
     Button: | nnnndddd 0ccccccc |   -   | 0000000v     | bool          (MSB = 0)
     Hat:    | nnnndddd 110000cc |   -   | 1000vvvv     | HatValue enum (MSB = 1)
 
@@ -69,12 +83,28 @@ class ControlEvent:
 
     Summing up :
     => The identity can be coded on 2 bytes
+
+    Axis values :
+    => They are floats in range [-1.0 .. 1.0], sent as doubles unless the node negotiated the int16 encoding during
+       the handshake (see AxisEncoding). The int16 encoding is a fixed-point representation of the same range,
+       scaled by 0x7FFF. Raw int values (as read from SDL) are sent as is.
+    => The receiving side tells both encodings apart by the size of the value frame.
+    => The receiving side may also keep the int16 values raw (see raw_axes), for an end-to-end integer pipeline : the
+       raw values are then only converted to floats where a processor actually needs them (see axis_to_float).
+
+    Lookup tables :
+    => Once the handshake is done, the set of controls doesn't change anymore : freeze_lookup_table() then maps each of
+       the 65536 possible identities directly to its control, so decoding an identity is a single indexing operation.
+    => The identity of each control is then also stored on the control itself, until clear_lookup_table() : after a
+       new handshake, the identities are computed again.
     """
     __IDENTITY_PACKER = struct.Struct('>H')
+    __CONTROL_TABLE__ = None  # identity => control, frozen separately for each ControlEvent subclass
 
     __BUTTON_VALUE_PACKER__ = struct.Struct('>?')
     __HAT_VALUE_PACKER__ = struct.Struct('>B')
     __AXIS_VALUE_PACKER__ = struct.Struct('>d')
+    __AXIS_INT16_VALUE_PACKER__ = struct.Struct('>h')
 
     __CTRL_GROUP__ = {0x0080: 'axes',
                       0x0000: 'buttons',
@@ -85,9 +115,10 @@ class ControlEvent:
                         0x00C0: 0x0003}
     __DEV_CLASS__ = NotImplemented
 
-    def __init__(self, *, control=None, value=None):
+    def __init__(self, *, control=None, value=None, axis_encoding=AxisEncoding.FLOAT64):
         self.control = control
         self.value = value
+        self.axis_encoding = axis_encoding
 
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
@@ -96,6 +127,13 @@ class ControlEvent:
 
     @classmethod
     def mk_identity(cls, control):
+        identity = getattr(control, 'identity', None)  # Only set while the lookup table is frozen
+        if identity is not None:
+            return identity
+        return cls._mk_identity(control)
+
+    @classmethod
+    def _mk_identity(cls, control):
         if not isinstance(control, AbstractControl):
             raise MessageIdentityError("Invalid control class.")
 
@@ -119,6 +157,30 @@ class ControlEvent:
 
         raise MessageIdentityError("Invalid control class.")
 
+    @classmethod
+    def is_axis_identity(cls, identity):
+        return identity[1] & 0xC0 == 0x80
+
+    @classmethod
+    def freeze_lookup_table(cls):
+        """Builds the identity => control lookup table, from all the devices currently registered in the nodes."""
+        # ControlEvent is Abstract class, __DEV_CLASS__ must be defined by each subclass : pylint: disable=no-member
+        table = [None] * 0x10000
+        for node in cls.__DEV_CLASS__.__NODE_CLASS__.registered_nodes():
+            for device in node:
+                for control in [*device.axes.values(), *device.buttons.values(), *device.hats.values()]:
+                    control.identity = cls._mk_identity(control)
+                    table[cls.__IDENTITY_PACKER.unpack(control.identity)[0]] = control
+        cls.__CONTROL_TABLE__ = tuple(table)
+
+    @classmethod
+    def clear_lookup_table(cls):
+        if cls.__CONTROL_TABLE__ is not None:
+            for control in cls.__CONTROL_TABLE__:
+                if control is not None:
+                    control.identity = None
+        cls.__CONTROL_TABLE__ = None
+
     def _serialize_control(self):
         if self.control is None:
             return []
@@ -131,7 +193,9 @@ class ControlEvent:
             return b''
 
         if isinstance(self.control, Axis) or isinstance(self.value, float):
-            return self.__AXIS_VALUE_PACKER__.pack(self.value)
+            if self.axis_encoding == AxisEncoding.INT16:
+                return self.__AXIS_INT16_VALUE_PACKER__.pack(self._to_int16(self.value))
+            return self.__AXIS_VALUE_PACKER__.pack(self.axis_to_float(self.value))
 
         if isinstance(self.control, Button) or isinstance(self.value, bool):
             return self.__BUTTON_VALUE_PACKER__.pack(self.value)
@@ -141,6 +205,39 @@ class ControlEvent:
 
         raise MessageError("Cannot serialize value : {}".format(self.value))
 
+    @staticmethod
+    def _to_int16(value):
+        if isinstance(value, float):
+            value = round(value * 0x7FFF)
+        return min(max(value, -0x8000), 0x7FFF)
+
+    @staticmethod
+    def _from_int16(value):
+        return max(value / 0x7FFF, -1.0)
+
+    @classmethod
+    def axis_to_float(cls, value):
+        """Returns the float value of an axis, whether it is a raw int16 value or already a float."""
+        if isinstance(value, int):
+            return cls._from_int16(value)
+        return value
+
+    @classmethod
+    def mk_value_packer(cls, control, axis_encoding=AxisEncoding.FLOAT64):
+        """Returns the function serializing the values of the given control into value frames, for the senders which
+        pre-serialize the identities (see ControlEventBatch.send_entries). With the int16 encoding, the axis values
+        must be raw ints, and with the float64 encoding, floats."""
+        if isinstance(control, Axis):
+            if axis_encoding == AxisEncoding.INT16:
+                return cls.__AXIS_INT16_VALUE_PACKER__.pack
+            return cls.__AXIS_VALUE_PACKER__.pack
+        if isinstance(control, Button):
+            return cls.__BUTTON_VALUE_PACKER__.pack
+        if isinstance(control, Hat):
+            hat_packer = cls.__HAT_VALUE_PACKER__
+            return lambda value: hat_packer.pack(value | 0x80)
+        raise MessageError("Cannot serialize values of : {}".format(control))
+
     def send(self, socket):
         msg_parts = self._serialize_control()
         msg_parts.append(self._serialize_value())
@@ -159,6 +256,9 @@ class ControlEvent:
     @classmethod
     def _deserialize_control(cls, control_frame):
         unpacked = cls.__IDENTITY_PACKER.unpack(control_frame)
+        if cls.__CONTROL_TABLE__ is not None and cls.__CONTROL_TABLE__[unpacked[0]] is not None:
+            return cls.__CONTROL_TABLE__[unpacked[0]]
+
         # ControlEvent is Abstract class, __DEV_CLASS__ must be defined by each subclass : pylint: disable=no-member
         dev = cls.__DEV_CLASS__.find(node=(unpacked[0] & 0xF000) >> 12,
                                      dev=(unpacked[0] & 0x0F00) >> 8)
@@ -167,7 +267,7 @@ class ControlEvent:
         return ctrl_grp[ctrl_id]
 
     @classmethod
-    def _deserialize_value(cls, value_frame):
+    def _deserialize_value(cls, value_frame, raw_axes=False):
         if value_frame == b'':
             return None  # Single-Frame 'Ready' signal
 
@@ -175,6 +275,10 @@ class ControlEvent:
             unpacked = cls.__AXIS_VALUE_PACKER__.unpack(value_frame)
             return unpacked[0]
 
+        if len(value_frame) == 2:
+            unpacked = cls.__AXIS_INT16_VALUE_PACKER__.unpack(value_frame)
+            return unpacked[0] if raw_axes else cls._from_int16(unpacked[0])
+
         if len(value_frame) == 1 and value_frame[0] & 0x80 == 0x00:
             unpacked = cls.__BUTTON_VALUE_PACKER__.unpack(value_frame)
             return unpacked[0]
@@ -185,14 +289,20 @@ class ControlEvent:
 
         raise MessageError("Cannot deserialize value frame : {}".format(value_frame))
 
+    @classmethod
+    def _deserialize_axis_encoding(cls, value_frame):
+        return AxisEncoding.INT16 if len(value_frame) == 2 else AxisEncoding.FLOAT64
+
     @classmethod
     def _deserialize(cls, frames):
         if len(frames) == 3 and len(frames[0]) == 2 and frames[1] == b'':
             return {'control': cls._deserialize_control(frames[0]),
-                    'value': cls._deserialize_value(frames[2])}
+                    'value': cls._deserialize_value(frames[2]),
+                    'axis_encoding': cls._deserialize_axis_encoding(frames[2])}
 
         if len(frames) == 1:
-            return {'value': cls._deserialize_value(frames[0])}
+            return {'value': cls._deserialize_value(frames[0]),
+                    'axis_encoding': cls._deserialize_axis_encoding(frames[0])}
 
         raise MessageError("Cannot deserialize frames : {}".format(frames))
 
@@ -200,6 +310,25 @@ class ControlEvent:
     def recv(cls, socket):
         return cls(**cls._deserialize(socket.recv_multipart()))
 
+    @classmethod
+    def recv_into(cls, socket, event, raw_axes=False):
+        """Zero-copy alternative to recv() : the frames are decoded in place, into the given (reusable) event.
+        If raw_axes is set, the int16 axis values are kept as raw ints."""
+        frames = [memoryview(frame) for frame in socket.recv_multipart(copy=False)]
+
+        if len(frames) == 3 and len(frames[0]) == 2 and len(frames[1]) == 0:
+            event.control = cls._deserialize_control(frames[0])
+            event.value = cls._deserialize_value(frames[2], raw_axes)
+            event.axis_encoding = cls._deserialize_axis_encoding(frames[2])
+        elif len(frames) == 1:
+            event.control = None
+            event.value = cls._deserialize_value(frames[0], raw_axes)
+            event.axis_encoding = cls._deserialize_axis_encoding(frames[0])
+        else:
+            raise MessageError("Cannot deserialize frames : {}".format([bytes(f) for f in frames]))
+
+        return event
+
 
 class PhysicalControlEvent(ControlEvent):
     __DEV_CLASS__ = PhysicalDevice
@@ -209,7 +338,352 @@ class VirtualControlEvent(ControlEvent):
     __DEV_CLASS__ = VirtualDevice
 
 
+class DeviceSnapshot:
+    """
+    DeviceSnapshot frames:
+            |          Topic             |
+            | Node+Dev                   | Empty | Axis Enc | Axes         | Buttons        | Hats       |
+    Snap:   | nnnndddd 11111111 11111111 |   -   | eeeeeeee | 8 * Axis Val | 128 bits mask  | 4 * 4 bits |
+
+    A snapshot carries the whole state of a device, in a single message :
+    - the values of the 8 axes, encoded according to the axis encoding (see AxisEncoding and ControlEvent)
+    - the states of the 128 buttons, as a bitmask (button i is bit i)
+    - the states of the 4 hats, as HatState values packed into nibbles (hat i in bits 4*i to 4*i+3)
+
+    The values of the controls which aren't registered to the device are zeroed, and ignored on reception.
+
+    Reasoning for the format of the topic frame :
+    => Its second byte is never a valid 'Kind+Ctrl' byte, so it never matches an identity subscription of a SUB socket
+    => The snapshots of each device can still be subscribed to independently
+    """
+    __TOPIC_SUFFIX__ = b'\xFF\xFF'
+    __AXIS_ENCODING_PACKER__ = struct.Struct('>B')
+    __AXES_PACKERS__ = {AxisEncoding.FLOAT64: struct.Struct('>8d'),
+                        AxisEncoding.INT16: struct.Struct('>8h')}
+    __BUTTONS_SIZE__ = 16
+    __HATS_PACKER__ = struct.Struct('>H')
+    __DEV_CLASS__ = NotImplemented
+
+    def __init__(self, *, device, axes=None, buttons=None, hats=None, axis_encoding=AxisEncoding.FLOAT64):
+        self.device = device
+        self.axes = axes if axes is not None else dict()  # ctrl_id => value
+        self.buttons = buttons if buttons is not None else dict()  # ctrl_id => value
+        self.hats = hats if hats is not None else dict()  # ctrl_id => value
+        self.axis_encoding = axis_encoding
+
+    @classmethod
+    def mk_topic(cls, device):
+        return bytes([(device.node.id & 0xF) << 4 | (device.id & 0xF)]) + cls.__TOPIC_SUFFIX__
+
+    @classmethod
+    def mk_topic_from_identity(cls, identity):
+        """Returns the topic of the device of a control, from the identity frame of the control alone."""
+        return bytes(identity[:1]) + cls.__TOPIC_SUFFIX__
+
+    @classmethod
+    def is_snapshot(cls, frames):
+        return (len(frames) == 3 and len(frames[0]) == 3 and frames[0][1:] == cls.__TOPIC_SUFFIX__ and
+                len(frames[1]) == 0)
+
+    def items(self):
+        """Yields the (control, value) couples of all the controls of the device present in the snapshot."""
+        for (values, ctrl_grp) in [(self.axes, self.device.axes),
+                                   (self.buttons, self.device.buttons),
+                                   (self.hats, self.device.hats)]:
+            for (ctrl_id, value) in values.items():
+                if ctrl_id in ctrl_grp:
+                    yield ctrl_grp[ctrl_id], value
+
+    def _serialize_state(self):
+        axes = [self.axes.get(i, 0) for i in range(8)]
+        if self.axis_encoding == AxisEncoding.INT16:
+            axes = [ControlEvent._to_int16(v) for v in axes]  # pylint: disable=protected-access
+        else:
+            axes = [float(v) for v in axes]
+        buttons = sum([1 << i for (i, v) in self.buttons.items() if v])
+        hats = sum([(v & 0xF) << (4 * i) for (i, v) in self.hats.items()])
+        return b''.join([self.__AXIS_ENCODING_PACKER__.pack(self.axis_encoding),
+                         self.__AXES_PACKERS__[self.axis_encoding].pack(*axes),
+                         buttons.to_bytes(self.__BUTTONS_SIZE__, 'big'),
+                         self.__HATS_PACKER__.pack(hats)])
+
+    def send(self, socket):
+        socket.send_multipart([self.mk_topic(self.device), b'', self._serialize_state()])
+
+    @classmethod
+    def _deserialize(cls, frames, raw_axes=False):
+        if not cls.is_snapshot(frames):
+            raise MessageError("Cannot deserialize frames : {}".format([bytes(f) for f in frames]))
+
+        # DeviceSnapshot is Abstract class, __DEV_CLASS__ must be defined by each subclass : pylint: disable=no-member
+        device = cls.__DEV_CLASS__.find(node=(frames[0][0] & 0xF0) >> 4,
+                                        dev=frames[0][0] & 0x0F)
+
+        state = frames[2]
+        try:
+            axis_encoding = AxisEncoding(state[0] if len(state) else None)
+        except ValueError:
+            raise MessageError("Cannot deserialize snapshot state : {}".format(bytes(state)))
+        axes_packer = cls.__AXES_PACKERS__[axis_encoding]
+        buttons_offset = cls.__AXIS_ENCODING_PACKER__.size + axes_packer.size
+        hats_offset = buttons_offset + cls.__BUTTONS_SIZE__
+        if len(state) != hats_offset + cls.__HATS_PACKER__.size:
+            raise MessageError("Cannot deserialize snapshot state : {}".format(bytes(state)))
+
+        axes = axes_packer.unpack_from(state, cls.__AXIS_ENCODING_PACKER__.size)
+        if axis_encoding == AxisEncoding.INT16 and not raw_axes:
+            axes = [ControlEvent._from_int16(v) for v in axes]  # pylint: disable=protected-access
+        buttons = int.from_bytes(state[buttons_offset:hats_offset], 'big')
+        (hats,) = cls.__HATS_PACKER__.unpack_from(state, hats_offset)
+
+        return {'device': device,
+                'axes': {i: axes[i] for i in device.axes},
+                'buttons': {i: (buttons >> i) & 1 == 1 for i in device.buttons},
+                'hats': {i: (hats >> (4 * i)) & 0xF for i in device.hats},
+                'axis_encoding': axis_encoding}
+
+    @classmethod
+    def recv(cls, socket):
+        return cls(**cls._deserialize(socket.recv_multipart()))
+
+
+class PhysicalDeviceSnapshot(DeviceSnapshot):
+    __DEV_CLASS__ = PhysicalDevice
+
+
+class VirtualDeviceSnapshot(DeviceSnapshot):
+    __DEV_CLASS__ = VirtualDevice
+
+
+class ControlEventBatch:
+    """
+    ControlEventBatch frames:
+            | Marker   | Empty | Entries                                          |
+    Batch:  | 11111111 |   -   | (Identity * 2 | Length | Evt Val * Length) * N   |
+
+    Each entry is the identity frame of a ControlEvent, followed by the length of its value frame on one byte, then
+    the value frame itself (see ControlEvent for the format of both).
+
+    Reasoning for the format of the marker frame :
+    => It is a single byte, so it can never be mistaken for a 2-bytes identity frame
+    => For the same reason, it never matches the (2-bytes) identity subscriptions of a SUB socket
+
+    Receiving a batch also accepts a single ControlEvent message, which is returned as a batch of one event.
+    Receiving a batch in place (see recv_into) also accepts a DeviceSnapshot message.
+    """
+    __MARKER__ = b'\xFF'
+    __ENTRY_HEADER_PACKER__ = struct.Struct('>2sB')
+    __EVENT_CLASS__ = NotImplemented
+    __SNAPSHOT_CLASS__ = NotImplemented
+
+    def __init__(self, *, events=None):
+        self.events = list(events) if events is not None else list()
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return NotImplemented
+        return self.events == other.events
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def append(self, event):
+        self.events.append(event)
+
+    @classmethod
+    def pack_entries(cls, entries):
+        """Packs the given (identity frame, value frame) couples into an entries frame, without decoding them."""
+        packed = list()
+        for (identity, value_frame) in entries:
+            packed.append(cls.__ENTRY_HEADER_PACKER__.pack(bytes(identity), len(value_frame)))
+            packed.append(value_frame)
+        return b''.join(packed)
+
+    def _serialize_entries(self):
+        return self.pack_entries([(event.mk_identity(event.control),
+                                   event._serialize_value())  # pylint: disable=protected-access
+                                  for event in self.events])
+
+    def send(self, socket):
+        socket.send_multipart([self.__MARKER__, b'', self._serialize_entries()])
+
+    @classmethod
+    def send_entries(cls, socket, entries):
+        """Alternative to send() for the pre-serialized events : sends the given (identity frame, value frame) couples
+        as a batch."""
+        socket.send_multipart([cls.__MARKER__, b'', cls.pack_entries(entries)])
+
+    @classmethod
+    def is_batch(cls, frames):
+        return len(frames) == 3 and frames[0] == cls.__MARKER__ and len(frames[1]) == 0
+
+    @classmethod
+    def _iter_entries(cls, entries_frame):
+        """Yields the (identity, value) frames of each entry, sliced out of the entries frame.
+
+        The entries frame may be a memoryview, in which case the slices are zero-copy views as well."""
+        offset = 0
+        while offset < len(entries_frame):
+            if offset + cls.__ENTRY_HEADER_PACKER__.size > len(entries_frame):
+                raise MessageError("Truncated batch entry header at offset {}".format(offset))
+            length = entries_frame[offset + 2]
+            value_offset = offset + cls.__ENTRY_HEADER_PACKER__.size
+            if value_offset + length > len(entries_frame):
+                raise MessageError("Truncated batch entry value at offset {}".format(value_offset))
+            yield entries_frame[offset:offset + 2], entries_frame[value_offset:value_offset + length]
+            offset = value_offset + length
+
+    @classmethod
+    def _iter_events(cls, frames):
+        """Yields the (identity, value) frames of each event, whether the frames are a batch or a single event."""
+        if cls.is_batch(frames):
+            yield from cls._iter_entries(frames[2])
+        elif len(frames) == 3 and len(frames[0]) == 2 and len(frames[1]) == 0:
+            yield frames[0], frames[2]
+        else:
+            raise MessageError("Cannot deserialize frames : {}".format([bytes(f) for f in frames]))
+
+    @classmethod
+    def split(cls, frames):
+        """Splits a batch into the equivalent list of single ControlEvent messages, without decoding the controls.
+
+        A single ControlEvent message is returned as is, in a list of one."""
+        if not cls.is_batch(frames):
+            return [frames]
+        return [[identity, b'', value] for (identity, value) in cls._iter_entries(frames[2])]
+
+    @classmethod
+    def _deserialize(cls, frames):
+        # ControlEventBatch is Abstract class, __EVENT_CLASS__ must be defined by each subclass
+        event_cls = cls.__EVENT_CLASS__
+        return [event_cls(**event_cls._deserialize(event_frames))  # pylint: disable=protected-access
+                for event_frames in cls.split(frames)]
+
+    @classmethod
+    def recv(cls, socket):
+        return cls(events=cls._deserialize(socket.recv_multipart()))
+
+    @classmethod
+    def recv_values(cls, socket, raw_axes=False):
+        """Alternative to recv() which doesn't decode the controls : returns the list of (identity frame, value)
+        couples, so the receiver can match the identities against its own controls.
+        If raw_axes is set, the int16 axis values are kept as raw ints."""
+        # ControlEventBatch is Abstract class, __EVENT_CLASS__ must be defined by each subclass
+        event_cls = cls.__EVENT_CLASS__
+        frames = [memoryview(f) for f in socket.recv_multipart(copy=False)]
+        return [(bytes(identity), event_cls._deserialize_value(value, raw_axes))  # pylint: disable=protected-access
+                for (identity, value) in cls._iter_events(frames)]
+
+    @classmethod
+    def recv_into(cls, socket, state, changed_controls=None, raw_axes=False):
+        """Zero-copy alternative to recv() : the frames are decoded in place, and the values are directly written into
+        the given state mapping. Only the controls already present in the state are updated, the others are ignored.
+        If raw_axes is set, the int16 axis values are kept as raw ints.
+
+        Returns the number of values which actually changed. Those controls are also appended to changed_controls,
+        if a list is provided."""
+        # ControlEventBatch is Abstract class, __EVENT_CLASS__ and __SNAPSHOT_CLASS__ must be defined by each subclass
+        event_cls = cls.__EVENT_CLASS__
+        changed = 0
+        frames = [memoryview(f) for f in socket.recv_multipart(copy=False)]
+
+        # A device snapshot may be received instead
+        if cls.__SNAPSHOT_CLASS__.is_snapshot(frames):
+            snapshot = cls.__SNAPSHOT_CLASS__(**cls.__SNAPSHOT_CLASS__._deserialize(frames, raw_axes))
+            for (control, value) in snapshot.items():
+                if control in state and state[control] != value:
+                    state[control] = value
+                    changed += 1
+                    if changed_controls is not None:
+                        changed_controls.append(control)
+            return changed
+
+        for (identity, value) in cls._iter_events(frames):
+            control = event_cls._deserialize_control(identity)  # pylint: disable=protected-access
+            if control in state:
+                value = event_cls._deserialize_value(value, raw_axes)  # pylint: disable=protected-access
+                if state[control] != value:
+                    state[control] = value
+                    changed += 1
+                    if changed_controls is not None:
+                        changed_controls.append(control)
+        return changed
+
+
+class PhysicalControlEventBatch(ControlEventBatch):
+    __EVENT_CLASS__ = PhysicalControlEvent
+    __SNAPSHOT_CLASS__ = PhysicalDeviceSnapshot
+
+
+class VirtualControlEventBatch(ControlEventBatch):
+    __EVENT_CLASS__ = VirtualControlEvent
+    __SNAPSHOT_CLASS__ = VirtualDeviceSnapshot
+
+
+class OutputCredits:
+    """
+    OutputCredits frames:
+            | Marker   | Credits  |
+    Credit: | 11111110 | uint16   |
+
+    In streaming mode, each output device grants credits to the StreamingOutputMultiplexer : one credit allows the
+    multiplexer to send one more batch of events to the device. The device grants a new credit each time it applied a
+    batch.
+
+    The streaming socket of an output device is identified by the topic of the device (see DeviceSnapshot.mk_topic),
+    so the multiplexer can route an event to its device from the identity frame of the control alone.
+    """
+    __MARKER__ = b'\xFE'
+    __CREDITS_PACKER__ = struct.Struct('>H')
+
+    def __init__(self, *, credits=1):
+        self.credits = credits
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return NotImplemented
+        return self.credits == other.credits
+
+    def send(self, socket):
+        socket.send_multipart([self.__MARKER__, self.__CREDITS_PACKER__.pack(self.credits)])
+
+    @classmethod
+    def is_credits(cls, frames):
+        return len(frames) == 2 and frames[0] == cls.__MARKER__ and len(frames[1]) == cls.__CREDITS_PACKER__.size
+
+    @classmethod
+    def _deserialize(cls, frames):
+        if not cls.is_credits(frames):
+            raise MessageError("Cannot deserialize frames : {}".format([bytes(f) for f in frames]))
+        return {'credits': cls.__CREDITS_PACKER__.unpack(frames[1])[0]}
+
+    @classmethod
+    def recv(cls, socket):
+        return cls(**cls._deserialize(socket.recv_multipart()))
+
+
 class CoreRequest:
+    """
+    CoreRequest frames:
+            | Command | Version  | Payload                                         |
+            | utf-8   | vvvvvvvv | one frame per payload item, see the subclasses  |
+
+    The payload is encoded with a slim binary schema specific to each command, carrying only the ids the remote side
+    needs. In particular, no code object (like the processors of the virtual controls) is ever sent or received.
+
+    Strings and other variable-length fields are prefixed with their length on one byte :
+            | Length   | Data            |
+            | llllllll | dddddddd * llll |
+
+    The version is checked on reception : both sides must speak the same version of the protocol.
+    """
+    __PROTOCOL_VERSION__ = 2
+    __VERSION_PACKER__ = struct.Struct('>B')
+    __LENGTH_PACKER__ = struct.Struct('>B')
+
     def __init__(self, *, command, payload):
         self.command = command
         self.payload = payload
@@ -230,61 +704,250 @@ class CoreRequest:
             return string.decode('utf-8')
         raise MessageError("Cannot decode string : {}".format(string))
 
+    @classmethod
+    def _pack_field(cls, data):
+        data = cls._encoded_string(data) if data is not None else b''
+        if len(data) > 0xFF:
+            raise MessageError("Field too long : {}".format(data))
+        return cls.__LENGTH_PACKER__.pack(len(data)) + data
+
+    @classmethod
+    def _pack_axis_encodings(cls, axis_encodings):
+        return cls._pack_field(bytes(axis_encodings))
+
+    @classmethod
+    def _unpack_axis_encodings(cls, frame):
+        (axis_encodings, _) = cls._unpack_field(frame, 0)
+        try:
+            return [AxisEncoding(e) for e in axis_encodings]
+        except ValueError:
+            raise MessageError("Unknown axis encoding in : {}".format(axis_encodings))
+
+    @classmethod
+    def _unpack_field(cls, frame, offset):
+        """Returns the field found at the given offset of the frame, and the offset of the next field."""
+        if offset + cls.__LENGTH_PACKER__.size > len(frame):
+            raise MessageError("Truncated field at offset {} : {}".format(offset, frame))
+        (length,) = cls.__LENGTH_PACKER__.unpack_from(frame, offset)
+        offset += cls.__LENGTH_PACKER__.size
+        if offset + length > len(frame):
+            raise MessageError("Truncated field at offset {} : {}".format(offset, frame))
+        return bytes(frame[offset:offset + length]), offset + length
+
+    def _serialize_payload(self):
+        return [self._encoded_string(frame) for frame in self.payload]
+
+    @classmethod
+    def _deserialize_payload(cls, frames):
+        return {'payload': list(frames)}
+
     def send(self, socket):
-        socket.send_multipart([self._encoded_string(self.command)] +
-                              [pickle.dumps(frame) for frame in self.payload])
+        socket.send_multipart([self._encoded_string(self.command),
+                               self.__VERSION_PACKER__.pack(self.__PROTOCOL_VERSION__)] +
+                              self._serialize_payload())
 
     @classmethod
-    def recv(cls, socket):
-        frames = socket.recv_multipart()
+    def _deserialize(cls, frames):
+        if len(frames) < 2 or len(frames[1]) != cls.__VERSION_PACKER__.size:
+            raise MessageError("Cannot deserialize frames : {}".format(frames))
+
+        (version,) = cls.__VERSION_PACKER__.unpack(frames[1])
+        if version != cls.__PROTOCOL_VERSION__:
+            raise MessageProtocolVersionError(version, cls.__PROTOCOL_VERSION__)
+
         command = cls._decoded_string(frames[0])
-        payload = [pickle.loads(frame) for frame in frames[1:]]
+        payload = frames[2:]
         if command == 'register':
-            return InputNodeRegisterRequest(available_devices=payload)
+            return InputNodeRegisterRequest(**InputNodeRegisterRequest._deserialize_payload(payload))
         if command == 'registered':
-            return InputNodeRegisterReply(node=payload[0])
+            return InputNodeRegisterReply(**InputNodeRegisterReply._deserialize_payload(payload))
         if command == 'capabilities':
-            return OutputNodeCapabilities(capabilities=payload)
+            return OutputNodeCapabilities(**OutputNodeCapabilities._deserialize_payload(payload))
         if command == 'assignments':
-            return OutputNodeAssignments(node=payload[0])
-        return cls(command=command, payload=payload)
+            return OutputNodeAssignments(**OutputNodeAssignments._deserialize_payload(payload))
+        return cls(command=command, **cls._deserialize_payload(payload))
+
+    @classmethod
+    def recv(cls, socket):
+        return cls._deserialize(socket.recv_multipart())
+
+
+def _unregistered(model_cls, **attributes):
+    """Instantiates a model class without registering it anywhere (bypassing the auto-registering metaclasses).
+
+    The nodes and devices received during the handshake are mere descriptions of the ones registered in the Core."""
+    instance = model_cls.__new__(model_cls)
+    instance.__dict__.update(attributes)
+    return instance
+
+
+class NodeReply(CoreRequest):
+    """
+    NodeReply payload frames:
+            | Node Id  | Axis Enc |                                                         | First frame
+            | Dev Id   | GUID field | Name field | Axes field | Buttons field | Hats field | One frame per device
+
+    The axis encoding is the one chosen by the Core, among those offered by the node in its request.
+
+    The GUID and Name fields are only relevant for the physical devices, they are left empty for the virtual ones.
+    The Axes, Buttons and Hats fields hold the ids of the controls of each kind, one byte per control.
+    """
+    __ID_PACKER__ = struct.Struct('>B')
+    __NODE_HEADER_PACKER__ = struct.Struct('>BB')
+    __NODE_CLASS__ = NotImplemented
+    __DEVICE_CLASS__ = NotImplemented
+
+    def __init__(self, *, command, node, axis_encoding=AxisEncoding.FLOAT64):
+        super().__init__(command=command,
+                         payload=[node])
+        self.axis_encoding = axis_encoding
+
+    @property
+    def node(self):
+        return self.payload[0]
+
+    @classmethod
+    def _serialize_device(cls, device):
+        return b''.join([cls.__ID_PACKER__.pack(device.id),
+                         cls._pack_field(getattr(device, 'guid', None)),
+                         cls._pack_field(getattr(device, 'name', None)),
+                         cls._pack_field(bytes(sorted(device.axes.keys()))),
+                         cls._pack_field(bytes(sorted(device.buttons.keys()))),
+                         cls._pack_field(bytes(sorted(device.hats.keys())))])
+
+    def _serialize_payload(self):
+        return ([self.__NODE_HEADER_PACKER__.pack(self.node.id, self.axis_encoding)] +
+                [self._serialize_device(device) for device in self.node])
+
+    @classmethod
+    def _deserialize_device(cls, frame, node):
+        if len(frame) < cls.__ID_PACKER__.size:
+            raise MessageError("Cannot deserialize device frame : {}".format(frame))
+        (dev_id,) = cls.__ID_PACKER__.unpack_from(frame, 0)
+        (guid, offset) = cls._unpack_field(frame, cls.__ID_PACKER__.size)
+        (name, offset) = cls._unpack_field(frame, offset)
+        (axes, offset) = cls._unpack_field(frame, offset)
+        (buttons, offset) = cls._unpack_field(frame, offset)
+        (hats, offset) = cls._unpack_field(frame, offset)
+
+        device = _unregistered(cls.__DEVICE_CLASS__, node=node, id=dev_id, axes=dict(), buttons=dict(), hats=dict())
+        if issubclass(cls.__DEVICE_CLASS__, PhysicalDevice):
+            device.__dict__.update(alias=None, guid=guid or None, name=cls._decoded_string(name) or None)
+
+        for (ctrl_cls, ctrl_ids, ctrl_grp) in [(Axis, axes, device.axes),
+                                               (Button, buttons, device.buttons),
+                                               (Hat, hats, device.hats)]:
+            for ctrl_id in ctrl_ids:
+                ctrl_grp[ctrl_id] = _unregistered(ctrl_cls, dev=device, id=ctrl_id, processor=None, input_controls=None)
+        return device
+
+    @classmethod
+    def _deserialize_payload(cls, frames):
+        if not frames or len(frames[0]) != cls.__NODE_HEADER_PACKER__.size:
+            raise MessageError("Cannot deserialize node frames : {}".format(frames))
+
+        (node_id, axis_encoding) = cls.__NODE_HEADER_PACKER__.unpack(frames[0])
+        node = _unregistered(cls.__NODE_CLASS__, _devices=list(), id=node_id)
+        for frame in frames[1:]:
+            node._devices.append(cls._deserialize_device(frame, node))  # pylint: disable=protected-access
+
+        try:
+            return {'node': node, 'axis_encoding': AxisEncoding(axis_encoding)}
+        except ValueError:
+            raise MessageError("Unknown axis encoding : {}".format(axis_encoding))
 
 
 class InputNodeRegisterRequest(CoreRequest):
-    def __init__(self, *, available_devices):
+    """
+    InputNodeRegisterRequest payload frames:
+            | Axis Encodings field    | First frame, the encodings supported by the node, by order of preference
+            | GUID field | Name field | One frame per available device
+    """
+    def __init__(self, *, available_devices, axis_encodings=(AxisEncoding.FLOAT64,)):
         super().__init__(command='register',
                          payload=available_devices)
+        self.axis_encodings = list(axis_encodings)
 
     @property
     def available_devices(self):
         return self.payload
 
+    def _serialize_payload(self):
+        return ([self._pack_axis_encodings(self.axis_encodings)] +
+                [self._pack_field(guid) + self._pack_field(name) for (guid, name) in self.available_devices])
 
-class InputNodeRegisterReply(CoreRequest):
-    def __init__(self, *, node):
-        super().__init__(command='registered',
-                         payload=[node])
+    @classmethod
+    def _deserialize_payload(cls, frames):
+        if not frames:
+            raise MessageError("Missing axis encodings frame")
+
+        available_devices = list()
+        for frame in frames[1:]:
+            (guid, offset) = cls._unpack_field(frame, 0)
+            (name, _) = cls._unpack_field(frame, offset)
+            available_devices.append((guid, cls._decoded_string(name)))
+        return {'available_devices': available_devices,
+                'axis_encodings': cls._unpack_axis_encodings(frames[0])}
 
-    @property
-    def node(self):
-        return self.payload[0]
+
+class InputNodeRegisterReply(NodeReply):
+    __NODE_CLASS__ = InputNode
+    __DEVICE_CLASS__ = PhysicalDevice
+
+    def __init__(self, *, node, axis_encoding=AxisEncoding.FLOAT64):
+        super().__init__(command='registered',
+                         node=node,
+                         axis_encoding=axis_encoding)
 
 
 class OutputNodeCapabilities(CoreRequest):
-    def __init__(self, *, capabilities):
+    """
+    OutputNodeCapabilities payload frames:
+            | Axis Encodings field                      | First frame, the encodings supported by the node
+            | Dev Id   | Max Axes | Max Btns | Max Hats | One frame per available device
+    """
+    __CAPABILITIES_PACKER__ = struct.Struct('>BBBB')
+
+    def __init__(self, *, capabilities, axis_encodings=(AxisEncoding.FLOAT64,)):
         super().__init__(command='capabilities',
                          payload=capabilities)
+        self.axis_encodings = list(axis_encodings)
 
     @property
     def capabilities(self):
         return self.payload
 
+    def _serialize_payload(self):
+        return ([self._pack_axis_encodings(self.axis_encodings)] +
+                [self.__CAPABILITIES_PACKER__.pack(c['device_id'],
+                                                   c['max_nb_axes'],
+                                                   c['max_nb_buttons'],
+                                                   c['max_nb_hats'])
+                 for c in self.capabilities])
 
-class OutputNodeAssignments(CoreRequest):
-    def __init__(self, *, node):
+    @classmethod
+    def _deserialize_payload(cls, frames):
+        if not frames:
+            raise MessageError("Missing axis encodings frame")
+
+        capabilities = list()
+        for frame in frames[1:]:
+            if len(frame) != cls.__CAPABILITIES_PACKER__.size:
+                raise MessageError("Cannot deserialize capabilities frame : {}".format(frame))
+            unpacked = cls.__CAPABILITIES_PACKER__.unpack(frame)
+            capabilities.append({'device_id': unpacked[0],
+                                 'max_nb_axes': unpacked[1],
+                                 'max_nb_buttons': unpacked[2],
+                                 'max_nb_hats': unpacked[3]})
+        return {'capabilities': capabilities,
+                'axis_encodings': cls._unpack_axis_encodings(frames[0])}
+
+
+class OutputNodeAssignments(NodeReply):
+    __NODE_CLASS__ = OutputNode
+    __DEVICE_CLASS__ = VirtualDevice
+
+    def __init__(self, *, node, axis_encoding=AxisEncoding.FLOAT64):
         super().__init__(command='assignments',
-                         payload=[node])
-
-    @property
-    def node(self):
-        return self.payload[0]
+                         node=node,
+                         axis_encoding=axis_encoding)
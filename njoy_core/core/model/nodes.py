@@ -60,6 +60,10 @@ class AbstractNode(collections.MutableSequence, metaclass=AutoIndexingNode):
             raise NodeNotFoundError(cls, node)
         return cls.__NODES__[cls][node]
 
+    @classmethod
+    def registered_nodes(cls):
+        return list(cls.__NODES__[cls])
+
     def __init__(self):
         self._devices = list()
         self.id = None  # Automatically set by the metaclass when instantiated
@@ -1,7 +1,9 @@
+import collections
 import threading
 import zmq
 
-from njoy_core.core.model import VirtualControlEvent
+from njoy_core.core.model import PhysicalControlEvent, PhysicalControlEventBatch, PhysicalDeviceSnapshot
+from njoy_core.core.model import VirtualControlEvent, VirtualControlEventBatch, VirtualDeviceSnapshot, OutputCredits
 
 
 class OutputMultiplexerError(Exception):
@@ -9,19 +11,75 @@ class OutputMultiplexerError(Exception):
 
 
 class InputMultiplexer(threading.Thread):
-    def __init__(self, *, context, frontend, backend):
+    """Forwards the events of all the input nodes to the internal PUB socket.
+
+    The input nodes may send their events in batches : those are split back into single events before being
+    published, so that each InputBuffer keeps receiving only the controls it subscribed to.
+
+    In conflating mode, the multiplexer drains everything that's available from the input nodes, then publishes at
+    most one pending update per control : only the latest value of each axis is kept, while the successive values of
+    the buttons and hats are all queued, so that no edge is ever dropped.
+    The device snapshots are never conflated : all the pending updates are published before them."""
+    __MAX_DRAIN__ = 1000  # Max number of messages received before publishing the pending updates
+
+    def __init__(self, *, context, frontend, backend, conflate=False):
         super().__init__()
         self._ctx = context
         self._frontend = self._ctx.socket(zmq.PULL)
         self._frontend.bind(frontend)
         self._backend = self._ctx.socket(zmq.PUB)
         self._backend.bind(backend)
+        self._conflate = conflate
+        self._pending = collections.OrderedDict()  # identity => deque of value frames
+
+    def _enqueue(self, frames):
+        if PhysicalDeviceSnapshot.is_snapshot(frames):
+            while self._pending:
+                self._publish_pending()
+            self._backend.send_multipart(frames)
+            return
+
+        for (identity, _, value) in PhysicalControlEventBatch.split(frames):
+            if PhysicalControlEvent.is_axis_identity(identity) and identity in self._pending:
+                self._pending[identity][0] = value
+            elif identity in self._pending:
+                self._pending[identity].append(value)
+            else:
+                self._pending[identity] = collections.deque([value])
+
+    def _publish_pending(self):
+        for (identity, values) in list(self._pending.items()):
+            self._backend.send_multipart([identity, b'', values.popleft()])
+            if not values:
+                del self._pending[identity]
+
+    def _conflating_loop(self):
+        # Only block waiting for the input nodes when there's nothing left to publish
+        for _ in range(self.__MAX_DRAIN__):
+            try:
+                self._enqueue(self._frontend.recv_multipart(zmq.NOBLOCK if self._pending else 0))
+            except zmq.Again:
+                break
+        self._publish_pending()
+
+    def loop(self):
+        if self._conflate:
+            self._conflating_loop()
+            return
+
+        for event_frames in PhysicalControlEventBatch.split(self._frontend.recv_multipart()):
+            self._backend.send_multipart(event_frames)
 
     def run(self):
-        zmq.proxy(self._frontend, self._backend)
+        while True:
+            self.loop()
 
 
 class OutputMultiplexer(threading.Thread):
+    """Pairs the events of the actuators (backend) with the 'ready' requests of the output nodes (frontend).
+
+    Both sides are identified by the identity of their control, so the multiplexer is a pure byte router : it routes
+    on the raw identity frames, and forwards the value frames untouched, without ever decoding the events."""
     def __init__(self, *, context, frontend, backend):
         super().__init__()
         self._ctx = context
@@ -32,34 +90,113 @@ class OutputMultiplexer(threading.Thread):
         self._poller = zmq.Poller()
         self._poller.register(self._backend, zmq.POLLIN)
         self._poller.register(self._frontend, zmq.POLLIN)
-        self._queue = dict()
+        self._queue = dict()  # identity => value frame, waiting for the other side
 
     def loop(self):
         events = dict(self._poller.poll())
 
         if self._backend in events:
-            event = VirtualControlEvent.recv(self._backend)
-            if event.control in self._queue:
+            (identity, _, value) = self._backend.recv_multipart()
+            if identity in self._queue:
                 # The output node is already waiting for this event, forward it immediately
-                event.send(self._frontend)
+                self._frontend.send_multipart([identity, b'', value])
                 # Also signal back to the backend that we treated its event
-                self._queue[event.control].send(self._backend)
-                del self._queue[event.control]
+                self._backend.send_multipart([identity, b'', self._queue.pop(identity)])
             else:
                 # The output node is not ready for this event yet, queue it
-                self._queue[event.control] = event
+                self._queue[identity] = value
 
         if self._frontend in events:
-            event = VirtualControlEvent.recv(self._frontend)
-            if event.control in self._queue:
+            (identity, _, value) = self._frontend.recv_multipart()
+            if identity in self._queue:
                 # The backend has already sent an event for this control, forward it immediately
-                self._queue[event.control].send(self._frontend)
-                del self._queue[event.control]
+                self._frontend.send_multipart([identity, b'', self._queue.pop(identity)])
                 # Also signal back to the backend that we treated its event
-                event.send(self._backend)
+                self._backend.send_multipart([identity, b'', value])
             else:
                 # The backend hasn't sent any event for this control yet, queue the request
-                self._queue[event.control] = event
+                self._queue[identity] = value
+
+    def run(self):
+        while True:
+            self.loop()
+
+
+class StreamingOutputMultiplexer(threading.Thread):
+    """Streaming alternative to the OutputMultiplexer, which never blocks the actuators on the output nodes.
+
+    The events of the actuators (backend) are acknowledged as soon as they are received, and kept until they can be
+    forwarded : only the latest value of each axis is kept, while the successive values of the buttons and hats are
+    all kept in order, so that no edge is ever dropped. The multiplexer is a pure byte router, the events are never
+    decoded.
+
+    Each output device has a single streaming socket (frontend), identified by the topic of the device, and grants
+    credits to the multiplexer (see OutputCredits). Whenever a device has credits and pending events, all its pending
+    events are sent to it in a single batch, which consumes one credit."""
+    __MAX_DRAIN__ = 1000  # Max number of messages received from each side before flushing the pending events
+
+    def __init__(self, *, context, frontend, backend):
+        super().__init__()
+        self._ctx = context
+        self._frontend = self._ctx.socket(zmq.ROUTER)
+        self._frontend.bind(frontend)
+        self._backend = self._ctx.socket(zmq.ROUTER)
+        self._backend.bind(backend)
+        self._poller = zmq.Poller()
+        self._poller.register(self._backend, zmq.POLLIN)
+        self._poller.register(self._frontend, zmq.POLLIN)
+        self._pending = collections.defaultdict(list)  # stream => [(identity, value frame)], in order
+        self._axis_positions = collections.defaultdict(dict)  # stream => {axis identity => position of its entry}
+        self._credits = collections.defaultdict(int)  # stream => credits
+
+    def _recv_backend(self):
+        frames = self._backend.recv_multipart(zmq.NOBLOCK)
+        # Acknowledge right away, so the actuator can go on
+        self._backend.send_multipart(frames)
+        (identity, _, value) = frames
+        stream = VirtualDeviceSnapshot.mk_topic_from_identity(identity)
+        (pending, axis_positions) = (self._pending[stream], self._axis_positions[stream])
+        if identity in axis_positions:
+            pending[axis_positions[identity]] = (identity, value)
+        else:
+            if VirtualControlEvent.is_axis_identity(identity):
+                axis_positions[identity] = len(pending)
+            pending.append((identity, value))
+
+    def _recv_frontend(self):
+        (stream, *frames) = self._frontend.recv_multipart(zmq.NOBLOCK)
+        if OutputCredits.is_credits(frames):
+            credits = OutputCredits._deserialize(frames)['credits']  # pylint: disable=protected-access
+            self._credits[stream] += credits
+        else:
+            raise OutputMultiplexerError("Unexpected message from {} : {}".format(stream, frames))
+
+    def _drain(self, recv):
+        for _ in range(self.__MAX_DRAIN__):
+            try:
+                recv()
+            except zmq.Again:
+                break
+
+    def _flush(self):
+        for (stream, pending) in self._pending.items():
+            if pending and self._credits[stream] > 0:
+                self._frontend.send_multipart([stream, VirtualControlEventBatch.__MARKER__, b'',
+                                               VirtualControlEventBatch.pack_entries(pending)])
+                self._credits[stream] -= 1
+                pending.clear()
+                self._axis_positions[stream].clear()
+
+    def loop(self):
+        events = dict(self._poller.poll())
+
+        if self._backend in events:
+            self._drain(self._recv_backend)
+
+        if self._frontend in events:
+            self._drain(self._recv_frontend)
+
+        self._flush()
 
     def run(self):
         while True:
@@ -0,0 +1,158 @@
+"""Compiler for the parsed nJoy Designs.
+
+The virtual controls of a design are recursive 'processor' + 'inputs' trees, whose leaves are physical controls.
+Instead of interpreting those trees at run time, the whole design is compiled into a DAG :
+- Common sub-expressions are shared : the same processor applied to the same inputs is a single node, whichever
+  virtual controls (or nested controls) use it.
+- Passthroughs are short-circuited : a passthrough node is replaced by its input node.
+- Constants are folded : a processor without any input, or whose inputs are all constants, is evaluated once at
+  compile time.
+
+The pure processors (see toolbox.memoization) are memoized.
+
+The physical axes may be fed with raw int16 values (see ControlEvent.axis_to_float) : they're only converted to floats
+when they are the input of a processor, the short-circuited passthroughs forward them unchanged.
+
+The DAG is then split into one DeviceEvaluator per virtual device, holding the flattened, topologically ordered list
+of the processors to call for the controls of the device.
+
+Processors must only depend on the values of their inputs (in order), and not on the input control instances : a
+shared node is evaluated with the input controls of the first occurrence met.
+"""
+import collections
+
+from njoy_core.core.model import Axis, ControlEvent
+from njoy_core.core.toolbox.essential_toolbox import EssentialToolbox
+from njoy_core.core.toolbox.memoization import memoize
+
+
+class DesignCompilerError(Exception):
+    pass
+
+
+class PhysicalInputNode:
+    def __init__(self, control):
+        self.control = control
+        self.leaves = frozenset([id(control)])  # ids of the physical controls this node depends on
+
+
+class ConstantNode:
+    def __init__(self, value):
+        self.value = value
+        self.leaves = frozenset()
+
+
+class ProcessorNode:
+    def __init__(self, processor, input_controls, children):
+        self.processor = memoize(processor, input_controls)
+        self.input_controls = input_controls
+        self.children = children
+        self.leaves = frozenset().union(*[child.leaves for child in children])
+
+
+class DeviceEvaluator:
+    """Evaluates all the virtual controls of a virtual device, in a single flat loop.
+
+    The evaluator keeps the values of its nodes between calls, so when the changed physical controls are given, only
+    the processors depending on them are called again, and only the virtual controls depending on them are returned.
+    A virtual control is only evaluated once all its physical inputs have a value."""
+
+    def __init__(self, *, device, outputs):
+        self.device = device
+        self._slots = dict()  # id(node) => slot
+        self._inputs = list()  # (slot, physical control)
+        self._steps = list()  # (slot, processor, input controls, input slots, float slots, leaves), in DAG order
+        self._values = list()  # slot => value
+        for (_, node) in outputs:
+            self._add_node(node)
+        self._outputs = [(control, self._slots[id(node)], node.leaves) for (control, node) in outputs]
+        self.input_controls = [control for (_, control) in self._inputs]
+
+    def _add_node(self, node):
+        if id(node) in self._slots:
+            return self._slots[id(node)]
+
+        if isinstance(node, ProcessorNode):
+            input_slots = [self._add_node(child) for child in node.children]
+            # The physical axes may hold raw int16 values, which the processor expects as floats
+            float_slots = {slot for (slot, child) in zip(input_slots, node.children)
+                           if isinstance(child, PhysicalInputNode) and isinstance(child.control, Axis)}
+
+        slot = len(self._values)
+        self._slots[id(node)] = slot
+        if isinstance(node, PhysicalInputNode):
+            self._values.append(None)
+            self._inputs.append((slot, node.control))
+        elif isinstance(node, ConstantNode):
+            self._values.append(node.value)
+        else:
+            self._values.append(None)
+            self._steps.append((slot, node.processor, node.input_controls, input_slots, float_slots, node.leaves))
+        return slot
+
+    @staticmethod
+    def _is_affected(leaves, changed):
+        return changed is None or not leaves.isdisjoint(changed)
+
+    def evaluate(self, state, changed_controls=None):
+        """Returns the (virtual control, value) outputs, from the given physical controls state.
+
+        If changed_controls is provided, only the outputs depending on those physical controls are returned."""
+        changed = None if changed_controls is None else {id(c) for c in changed_controls}
+        values = self._values
+        missing = set()
+        for (slot, control) in self._inputs:
+            if changed is None or id(control) in changed or values[slot] is None:
+                values[slot] = state[control]
+            if values[slot] is None:
+                missing.add(id(control))
+
+        for (slot, processor, input_controls, input_slots, float_slots, leaves) in self._steps:
+            if self._is_affected(leaves, changed) and leaves.isdisjoint(missing):
+                inputs = [ControlEvent.axis_to_float(values[i]) if i in float_slots else values[i] for i in input_slots]
+                values[slot] = processor(dict(zip(input_controls, inputs)))
+
+        return [(control, values[slot]) for (control, slot, leaves) in self._outputs
+                if self._is_affected(leaves, changed) and leaves.isdisjoint(missing)]
+
+
+class DesignCompiler:
+    def __init__(self):
+        self._nodes = dict()  # node key => node, for the common sub-expressions sharing
+
+    def _shared(self, key, mk_node):
+        if key not in self._nodes:
+            self._nodes[key] = mk_node()
+        return self._nodes[key]
+
+    def compile_control(self, control):
+        """Returns the DAG node computing the value of the given control."""
+        if control.is_physical_control:
+            return self._shared(('input', id(control)), lambda: PhysicalInputNode(control))
+
+        if control.processor is None:
+            raise DesignCompilerError("{} has neither a processor, nor a physical device".format(control))
+
+        input_controls = list(control.input_controls or [])
+        children = [self.compile_control(c) for c in input_controls]
+
+        if control.processor is EssentialToolbox.passthrough and len(children) == 1:
+            return children[0]
+
+        if all([isinstance(child, ConstantNode) for child in children]):
+            return ConstantNode(control.processor(dict(zip(input_controls, [child.value for child in children]))))
+
+        return self._shared(('processor', id(control.processor), tuple([id(child) for child in children])),
+                            lambda: ProcessorNode(control.processor, input_controls, children))
+
+    def compile(self, virtual_controls):
+        """Returns one DeviceEvaluator per virtual device, in order of first appearance in virtual_controls."""
+        outputs = collections.OrderedDict()  # virtual device => [(virtual control, node)]
+        for control in virtual_controls:
+            outputs.setdefault(control.dev, list()).append((control, self.compile_control(control)))
+        return [DeviceEvaluator(device=device, outputs=device_outputs)
+                for (device, device_outputs) in outputs.items()]
+
+
+def compile_design(virtual_controls):
+    return DesignCompiler().compile(virtual_controls)
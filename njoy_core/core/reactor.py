@@ -0,0 +1,139 @@
+import collections
+import threading
+import zmq
+
+from njoy_core.core.model import AxisEncoding, PhysicalControlEvent, PhysicalControlEventBatch, PhysicalDeviceSnapshot
+from njoy_core.core.model import VirtualControlEvent
+from njoy_core.core.parsers.design_compiler import compile_design
+
+
+class Reactor(threading.Thread):
+    """Single-threaded alternative to running one Actuator (and its InputBuffer) per virtual control.
+
+    The virtual controls are first compiled into one evaluator per virtual device (see design_compiler).
+    The int16 axis values are kept raw : they're only converted to floats for the processors which need them.
+    The reactor subscribes once to all the physical controls used by the design, and keeps a reverse index from each
+    physical control to the evaluators depending on it. On each input change, only the processors depending on the
+    changed controls are evaluated, and only the affected outputs are emitted.
+
+    A virtual control is only evaluated once all its inputs received a first value. The virtual controls folded into
+    constants don't depend on any input : they're emitted once, when the reactor starts.
+
+    Towards the OutputMultiplexer, each virtual control still has its own socket (the multiplexer routes on the
+    socket identities), mimicking the REQ sockets of the Actuators : there's at most one output in flight per virtual
+    control. The outputs computed in the meantime are conflated, only the latest one is sent once the previous one has
+    been acknowledged, unless it reverted to the value in flight. The outputs which wouldn't change the last value
+    emitted for a virtual control are suppressed (and counted)."""
+
+    def __init__(self, *, context, input_endpoint, output_endpoint, virtual_controls, axis_encodings=None):
+        super().__init__()
+        self._ctx = context
+        axis_encodings = axis_encodings if axis_encodings is not None else dict()
+
+        self._state = dict()  # physical control => value
+        self._dependents = collections.defaultdict(list)  # physical control => [evaluators]
+        self._evaluators = compile_design(virtual_controls)
+        for evaluator in self._evaluators:
+            for physical_control in evaluator.input_controls:
+                self._state[physical_control] = None
+                self._dependents[physical_control].append(evaluator)
+
+        self._input = self._ctx.socket(zmq.SUB)
+        self._input.connect(input_endpoint)
+        for physical_control in self._state:
+            self._input.subscribe(PhysicalControlEvent.mk_identity(physical_control))
+        for topic in {PhysicalDeviceSnapshot.mk_topic(control.dev) for control in self._state}:
+            self._input.subscribe(topic)
+
+        self._poller = zmq.Poller()
+        self._poller.register(self._input, zmq.POLLIN)
+
+        self._outputs = dict()  # virtual control => DEALER socket
+        self._output_controls = dict()  # DEALER socket => virtual control
+        self._axis_encodings = dict()  # virtual control => axis encoding
+        for virtual_control in virtual_controls:
+            socket = self._ctx.socket(zmq.DEALER)
+            socket.set(zmq.IDENTITY, VirtualControlEvent.mk_identity(virtual_control))
+            socket.connect(output_endpoint)
+            self._poller.register(socket, zmq.POLLIN)
+            self._outputs[virtual_control] = socket
+            self._output_controls[socket] = virtual_control
+            self._axis_encodings[virtual_control] = axis_encodings.get(id(virtual_control), AxisEncoding.FLOAT64)
+
+        self._in_flight = dict()  # virtual control => output waiting for an acknowledgement
+        self._pending = dict()  # virtual control => latest output, to be sent once acknowledged
+        self._last_values = dict()  # virtual control => last output, sent or pending
+        self._suppressed_events = 0
+
+    @property
+    def suppressed_events(self):
+        return self._suppressed_events
+
+    def _evaluate(self, changed_controls):
+        """Returns the new (virtual control, value) outputs, for the virtual controls depending on the changed ones."""
+        affected = list()
+        for physical_control in changed_controls:
+            for evaluator in self._dependents[physical_control]:
+                if evaluator not in affected:
+                    affected.append(evaluator)
+
+        outputs = list()
+        for evaluator in affected:
+            outputs.extend(evaluator.evaluate(self._state, changed_controls))
+        return outputs
+
+    def _evaluate_all(self):
+        """Returns the outputs of all the virtual controls which can be evaluated : at start up, only the constants."""
+        outputs = list()
+        for evaluator in self._evaluators:
+            outputs.extend(evaluator.evaluate(self._state))
+        return outputs
+
+    def _send(self, virtual_control, value):
+        event = VirtualControlEvent(control=virtual_control, value=value,
+                                    axis_encoding=self._axis_encodings[virtual_control])
+        value_frame = event._serialize_value()  # pylint: disable=protected-access
+        self._outputs[virtual_control].send_multipart([b'', value_frame])  # Add an empty frame to mimic a REQ socket
+        self._in_flight[virtual_control] = value
+
+    def _emit(self, virtual_control, value):
+        if virtual_control in self._last_values and self._last_values[virtual_control] == value:
+            self._suppressed_events += 1
+            return
+        self._last_values[virtual_control] = value
+
+        if virtual_control in self._in_flight:
+            if self._in_flight[virtual_control] == value:
+                # Back to the value in flight : the pending output would be stale once acknowledged
+                self._pending.pop(virtual_control, None)
+                self._suppressed_events += 1
+            else:
+                self._pending[virtual_control] = value
+        else:
+            self._send(virtual_control, value)
+
+    def _acknowledge(self, socket):
+        socket.recv_multipart()
+        virtual_control = self._output_controls[socket]
+        self._in_flight.pop(virtual_control, None)
+        if virtual_control in self._pending:
+            self._send(virtual_control, self._pending.pop(virtual_control))
+
+    def loop(self):
+        events = dict(self._poller.poll())
+
+        for socket in events:
+            if socket in self._output_controls:
+                self._acknowledge(socket)
+
+        if self._input in events:
+            changed_controls = list()
+            PhysicalControlEventBatch.recv_into(self._input, self._state, changed_controls, raw_axes=True)
+            for (virtual_control, value) in self._evaluate(changed_controls):
+                self._emit(virtual_control, value)
+
+    def run(self):
+        for (virtual_control, value) in self._evaluate_all():
+            self._emit(virtual_control, value)
+        while True:
+            self.loop()
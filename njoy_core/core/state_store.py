@@ -0,0 +1,88 @@
+import threading
+import zmq
+
+from njoy_core.core.model import PhysicalControlEvent, PhysicalControlEventBatch, PhysicalDeviceSnapshot
+
+
+class StateStore(threading.Thread):
+    """Core-wide store of the physical controls states, shared by all the Actuators.
+
+    The store subscribes once to all the physical controls used by the design, so each input event is delivered and
+    decoded once, whatever the number of virtual controls depending on it.
+    It keeps one slot per physical control, and a version counter which is incremented each time a single event, a
+    batch or a snapshot changed something. Each slot also remembers the version of its last change.
+
+    The events are decoded in place into a private working state, and only the changed slots are then applied to the
+    shared state, under the lock. The readers get consistent snapshots : a batch or a snapshot is always applied as
+    a whole.
+
+    wait_state() is a blocking call, which returns a snapshot of the requested controls once all of them have a value
+    and one of them changed since the version the caller already consumed. The readers of the same set of controls
+    share a condition, and a change only notifies the conditions of the sets including the changed controls : the
+    readers which don't depend on it are never woken up."""
+
+    def __init__(self, *, context, input_endpoint, physical_controls):
+        super().__init__()
+
+        self._ctx = context
+        self._socket = context.socket(zmq.SUB)
+        self._socket.connect(input_endpoint)
+
+        self._working_state = dict()  # physical control => value, as decoded from the input events
+        for control in physical_controls:
+            if control not in self._working_state:
+                self._working_state[control] = None
+                self._socket.subscribe(PhysicalControlEvent.mk_identity(control))
+        for topic in {PhysicalDeviceSnapshot.mk_topic(control.dev) for control in self._working_state}:
+            self._socket.subscribe(topic)
+
+        self._state = {c: None for c in self._working_state}  # physical control => value
+        self._versions = {c: 0 for c in self._working_state}  # physical control => version of its last change
+        self._version = 0
+        self._lock = threading.Lock()
+        self._conditions = dict()  # frozenset of physical controls => condition of their readers
+        self._watchers = {c: list() for c in self._working_state}  # physical control => [conditions depending on it]
+
+    @property
+    def version(self):
+        return self._version
+
+    def loop(self):
+        changed_controls = list()
+        if PhysicalControlEventBatch.recv_into(self._socket, self._working_state, changed_controls):
+            with self._lock:
+                self._version += 1
+                conditions = set()
+                for control in changed_controls:
+                    self._state[control] = self._working_state[control]
+                    self._versions[control] = self._version
+                    conditions.update(self._watchers[control])
+                for condition in conditions:
+                    condition.notify_all()
+
+    def run(self):
+        while True:
+            self.loop()
+
+    def _condition(self, physical_controls):
+        """Returns the condition of the given set of controls, created on first use. Must be called under the lock."""
+        key = frozenset(physical_controls)
+        if key not in self._conditions:
+            self._conditions[key] = threading.Condition(self._lock)
+            for control in key:
+                self._watchers[control].append(self._conditions[key])
+        return self._conditions[key]
+
+    def _is_ready(self, physical_controls, version):
+        return all([self._state[c] is not None for c in physical_controls]) and \
+            any([self._versions[c] > version for c in physical_controls])
+
+    def wait_state(self, physical_controls, version=0, timeout=None):
+        """Blocking call : wait until all the given controls have a value, and one of them changed after the given
+        version, or until the timeout (in seconds) expires.
+        Returns a (version, {control: value}) tuple, or None if the timeout expired."""
+        with self._lock:
+            condition = self._condition(physical_controls)
+            if not condition.wait_for(lambda: self._is_ready(physical_controls, version), timeout=timeout):
+                return None
+            return self._version, {c: self._state[c] for c in physical_controls}
@@ -1,3 +1,6 @@
+from .memoization import pure
+
+
 class EssentialToolboxError(Exception):
     pass
 
@@ -10,16 +13,19 @@ class EssentialToolbox:
         return list(ctrl_state.values())[0]
 
     @staticmethod
+    @pure
     def not_(ctrl_state):
         if len(ctrl_state) != 1:
             raise EssentialToolboxError("EssentialToolbox.not_ is a unary operator")
         return not list(ctrl_state.values())[0]
 
     @staticmethod
+    @pure
     def any(ctrl_states):
         return any([value for value in ctrl_states.values()])
 
     @staticmethod
+    @pure
     def not_any(ctrl_states):
         tmp = not any([value for value in ctrl_states.values()])
         return tmp
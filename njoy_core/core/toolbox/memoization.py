@@ -0,0 +1,104 @@
+"""Memoization of the pure processors.
+
+A processor marked with the @pure decorator promises its result only depends on the values of its inputs (in order).
+The runtime then wraps it in a MemoizedProcessor, which caches its results keyed by the input values tuple :
+- If all its inputs have a small discrete domain (buttons and hats), the whole truth table is computed upfront, and
+  each call is a single table lookup.
+- Otherwise, the results are kept in a LRU cache.
+
+    class MyToolbox:
+        @staticmethod
+        @pure
+        def my_processor(ctrl_states):
+            ...
+
+        @staticmethod
+        @pure(cache_size=64)
+        def my_other_processor(ctrl_states):
+            ...
+"""
+import collections
+import functools
+import itertools
+import operator
+
+from njoy_core.core.model import Button, Hat, HatState
+
+
+__DEFAULT_CACHE_SIZE__ = 1024
+
+# All the hat states, listed explicitly : iterating an IntFlag doesn't yield the composite members on every Python
+__HAT_DOMAIN__ = (HatState.HAT_CENTER,
+                  HatState.HAT_UP, HatState.HAT_UP_RIGHT,
+                  HatState.HAT_RIGHT, HatState.HAT_DOWN_RIGHT,
+                  HatState.HAT_DOWN, HatState.HAT_DOWN_LEFT,
+                  HatState.HAT_LEFT, HatState.HAT_UP_LEFT)
+
+
+def pure(processor=None, *, cache_size=__DEFAULT_CACHE_SIZE__):
+    """Marks a processor as pure, so its results can be memoized. cache_size is the size of the LRU cache, used when
+    the input domain is too large for a truth table."""
+    if processor is None:
+        return functools.partial(pure, cache_size=cache_size)
+    processor.__pure__ = True
+    processor.__pure_cache_size__ = cache_size
+    return processor
+
+
+def is_pure(processor):
+    return getattr(processor, '__pure__', False)
+
+
+def control_domain(control):
+    """Returns all the possible values of a control, or None if it isn't discrete."""
+    if isinstance(control, Button):
+        return False, True
+    if isinstance(control, Hat):
+        return __HAT_DOMAIN__
+    return None
+
+
+class MemoizedProcessor:
+    __MAX_TRUTH_TABLE_SIZE__ = 4096
+
+    def __init__(self, processor, input_controls):
+        self.processor = processor
+        self.hits = 0
+        self.misses = 0
+        self._cache_size = getattr(processor, '__pure_cache_size__', __DEFAULT_CACHE_SIZE__)
+        self._cache = collections.OrderedDict()  # input values => result, in LRU order
+        self._truth_table = None  # input values => result, for all the possible input values
+
+        # The states are keyed by control : a control used several times as input only has a single value
+        input_controls = list(dict.fromkeys(input_controls))
+        domains = [control_domain(c) for c in input_controls]
+        if all([domain is not None for domain in domains]) and \
+                functools.reduce(operator.mul, [len(domain) for domain in domains], 1) <= self.__MAX_TRUTH_TABLE_SIZE__:
+            self._truth_table = {values: processor(dict(zip(input_controls, values)))
+                                 for values in itertools.product(*domains)}
+
+    def __call__(self, ctrl_states):
+        key = tuple(ctrl_states.values())
+
+        if self._truth_table is not None and key in self._truth_table:
+            self.hits += 1
+            return self._truth_table[key]
+
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        result = self.processor(ctrl_states)
+        self._cache[key] = result
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+
+def memoize(processor, input_controls):
+    """Returns a memoized version of the processor if it is pure, or the processor itself otherwise."""
+    if not is_pure(processor):
+        return processor
+    return MemoizedProcessor(processor, list(input_controls or []))
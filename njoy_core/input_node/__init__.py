@@ -1,11 +1,26 @@
+import importlib
 import threading
 import zmq
 
-import njoy_core.input_node.hid_event_loop
+
+class InputNodeException(Exception):
+    pass
+
+
+# Input backend name => (module, class) of its event loop, imported on demand since they depend on the platform
+__INPUT_BACKENDS__ = {'sdl': ('njoy_core.input_node.hid_event_loop', 'HidEventLoop'),
+                      'evdev': ('njoy_core.input_node.evdev_event_loop', 'EvdevEventLoop')}
+
+
+def event_loop_class(backend):
+    if backend not in __INPUT_BACKENDS__:
+        raise InputNodeException("Unknown input backend '{}'".format(backend))
+    (module, name) = __INPUT_BACKENDS__[backend]
+    return getattr(importlib.import_module(module), name)
 
 
 class EmbeddedInputNode(threading.Thread):
-    def __init__(self, *, context, events_endpoint, requests_endpoint):
+    def __init__(self, *, context, events_endpoint, requests_endpoint, backend='sdl', wait_strategy='sleep'):
         super().__init__()
 
         self._ctx = context
@@ -16,7 +31,18 @@ class EmbeddedInputNode(threading.Thread):
         self._requests_socket = self._ctx.socket(zmq.REQ)
         self._requests_socket.connect(requests_endpoint)
 
-        self._hid_event_loop = njoy_core.input_node.hid_event_loop.HidEventLoop()
+        # The wait strategy only applies to the SDL backend, the evdev one waits on epoll
+        if backend == 'sdl':
+            self._hid_event_loop = event_loop_class(backend)(wait_strategy=wait_strategy)
+        else:
+            self._hid_event_loop = event_loop_class(backend)()
+
+    @property
+    def stats(self):
+        return self._hid_event_loop.stats
+
+    def request_full_state(self):
+        self._hid_event_loop.request_full_state()
 
     def run(self):
         print("Input Node: initial handshake")
@@ -0,0 +1,211 @@
+import fcntl
+import glob
+import os
+import struct
+
+from njoy_core.core.model import HatState
+
+
+class EvdevDeviceError(Exception):
+    pass
+
+
+class EvdevDevice:
+    """Linux input device, read directly from its /dev/input/event* node.
+
+    Its controls are numbered from the evdev codes :
+    - the axes are the absolute axes (except the hats), in code order ;
+    - the buttons are the joystick keys (from BTN_JOYSTICK), then the misc keys (BTN_MISC to BTN_JOYSTICK), in order ;
+    - the hats are the ABS_HATnX/ABS_HATnY pairs present, in order.
+    The raw axis values are scaled to the int16 range. The GUID is built from the evdev input_id only.
+
+    This layout is specific to this backend : SDL may number the controls differently (e.g. through its own device
+    drivers or mappings), and its GUIDs also depend on its version (some add a CRC of the device name). So a design
+    written against the SDL (HID) backend isn't guaranteed to match the same device under evdev.
+
+    The events are read in bulk : read_events() decodes all the input_event structs returned by a single read()."""
+    # From linux/input-event-codes.h
+    __EV_SYN__ = 0x00
+    __EV_KEY__ = 0x01
+    __EV_ABS__ = 0x03
+    __SYN_DROPPED__ = 0x03
+    __BTN_MISC__ = 0x100
+    __BTN_JOYSTICK__ = 0x120
+    __KEY_CNT__ = 0x300
+    __ABS_CNT__ = 0x40
+    __ABS_HAT0X__ = 0x10
+    __ABS_HAT3Y__ = 0x17
+
+    # ioctl requests, from linux/input.h
+    __EVIOCGID__ = 0x80084502
+    __EVIOCGNAME__ = 0x80FF4506  # 255 bytes
+    __EVIOCGKEY__ = 0x80604518  # KEY_CNT bits
+    __EVIOCGBIT_KEY__ = 0x80604521  # KEY_CNT bits
+    __EVIOCGBIT_ABS__ = 0x80084523  # ABS_CNT bits
+    __EVIOCGABS__ = 0x80184540  # + abs code
+
+    __READ_SIZE__ = 64  # Max number of events read at once
+
+    # (x, y) => hat state
+    __HAT_STATES__ = {(0, 0): HatState.HAT_CENTER,
+                      (0, -1): HatState.HAT_UP, (1, -1): HatState.HAT_UP_RIGHT,
+                      (1, 0): HatState.HAT_RIGHT, (1, 1): HatState.HAT_DOWN_RIGHT,
+                      (0, 1): HatState.HAT_DOWN, (-1, 1): HatState.HAT_DOWN_LEFT,
+                      (-1, 0): HatState.HAT_LEFT, (-1, -1): HatState.HAT_UP_LEFT}
+
+    _input_event = struct.Struct('@llHHi')  # struct input_event : timeval, type, code, value
+    _input_id = struct.Struct('@4H')  # struct input_id : bustype, vendor, product, version
+    _absinfo = struct.Struct('@6i')  # struct input_absinfo : value, minimum, maximum, fuzz, flat, resolution
+
+    @classmethod
+    def open(cls, path):
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            name = fcntl.ioctl(fd, cls.__EVIOCGNAME__, bytes(0xFF)).split(b'\x00', 1)[0].decode('utf-8', 'replace')
+            input_id = cls._input_id.unpack(fcntl.ioctl(fd, cls.__EVIOCGID__, bytes(cls._input_id.size)))
+            key_bits = int.from_bytes(fcntl.ioctl(fd, cls.__EVIOCGBIT_KEY__, bytes(cls.__KEY_CNT__ // 8)), 'little')
+            abs_bits = int.from_bytes(fcntl.ioctl(fd, cls.__EVIOCGBIT_ABS__, bytes(cls.__ABS_CNT__ // 8)), 'little')
+            abs_info = dict()
+            for code in [c for c in range(cls.__ABS_CNT__) if abs_bits & (1 << c)]:
+                (_, minimum, maximum, *_) = cls._absinfo.unpack(fcntl.ioctl(fd, cls.__EVIOCGABS__ + code,
+                                                                            bytes(cls._absinfo.size)))
+                abs_info[code] = (minimum, maximum)
+        except OSError as e:
+            os.close(fd)
+            raise EvdevDeviceError("Couldn't query the input device {}: {}".format(path, e)) from e
+
+        return cls(fd=fd,
+                   name=name,
+                   input_id=input_id,
+                   abs_info=abs_info,
+                   key_codes=[c for c in range(cls.__BTN_MISC__, cls.__KEY_CNT__) if key_bits & (1 << c)])
+
+    @classmethod
+    def device_list(cls, pattern='/dev/input/event*', exclude_list=None):
+        """Opens all the joysticks found, except the ones whose name starts with one of the excluded names."""
+        excluded_names = tuple(exclude_list) if exclude_list is not None else tuple()
+        devices = list()
+        for path in sorted(glob.glob(pattern)):
+            try:
+                device = cls.open(path)
+            except (OSError, EvdevDeviceError):
+                continue  # Typically not readable by the current user
+            if device.is_joystick and not device.name.startswith(excluded_names):
+                devices.append(device)
+            else:
+                device.close()
+        return devices
+
+    def __init__(self, *, fd, name, input_id, abs_info, key_codes):
+        """abs_info maps each absolute axis code to its (minimum, maximum) range.
+        key_codes are the codes of the keys, from BTN_MISC."""
+        self.fd = fd
+        self.name = name
+        (bustype, vendor, product, version) = input_id
+        self.guid = struct.pack('<8H', bustype, 0, vendor, 0, product, 0, version, 0)  # Not an SDL GUID (no name CRC)
+
+        is_hat = [self.__ABS_HAT0X__ <= code <= self.__ABS_HAT3Y__ for code in range(self.__ABS_CNT__)]
+        self.axis_codes = sorted([code for code in abs_info if not is_hat[code]])
+        self.hat_codes = [(code, code + 1) for code in range(self.__ABS_HAT0X__, self.__ABS_HAT3Y__, 2)
+                          if code in abs_info and code + 1 in abs_info]
+        self.button_codes = sorted([code for code in key_codes if code >= self.__BTN_JOYSTICK__]) + \
+            sorted([code for code in key_codes if self.__BTN_MISC__ <= code < self.__BTN_JOYSTICK__])
+        self._abs_info = dict(abs_info)
+
+    @property
+    def is_joystick(self):
+        return bool(self.axis_codes) and any([code >= self.__BTN_JOYSTICK__ for code in self.button_codes])
+
+    @property
+    def nb_axes(self):
+        return len(self.axis_codes)
+
+    @property
+    def nb_buttons(self):
+        return len(self.button_codes)
+
+    @property
+    def nb_hats(self):
+        return len(self.hat_codes)
+
+    def close(self):
+        os.close(self.fd)
+
+    def mk_axis_scaler(self, code):
+        """Returns the function scaling the raw values of the given axis into the int16 range.
+        The values are clamped, since many devices report values outside of their declared range."""
+        (minimum, maximum) = self._abs_info[code]
+        span = maximum - minimum
+        if span <= 0:
+            return lambda value: 0
+        return lambda value: (min(max(value, minimum), maximum) - minimum) * 0xFFFF // span - 0x8000
+
+    @classmethod
+    def hat_state(cls, x, y):
+        return cls.__HAT_STATES__[((x > 0) - (x < 0), (y > 0) - (y < 0))]
+
+    def read_events(self):
+        """Returns all the (seconds, microseconds, type, code, value) events available, from a single read().
+        Raises EvdevDeviceError if the device is gone (typically unplugged)."""
+        try:
+            data = os.read(self.fd, self.__READ_SIZE__ * self._input_event.size)
+        except BlockingIOError:
+            return []
+        except OSError as e:
+            raise EvdevDeviceError("Couldn't read from the input device {}: {}".format(self.name, e)) from e
+        return self._input_event.iter_unpack(data[:len(data) - len(data) % self._input_event.size])
+
+    def _query_abs(self, code):
+        return self._absinfo.unpack(fcntl.ioctl(self.fd, self.__EVIOCGABS__ + code, bytes(self._absinfo.size)))[0]
+
+    def _query_keys(self):
+        return int.from_bytes(fcntl.ioctl(self.fd, self.__EVIOCGKEY__, bytes(self.__KEY_CNT__ // 8)), 'little')
+
+    def get_axis(self, i):
+        code = self.axis_codes[i]
+        return self.mk_axis_scaler(code)(self._query_abs(code))
+
+    def get_button(self, i):
+        return bool(self._query_keys() & (1 << self.button_codes[i]))
+
+    def get_hat_position(self, i):
+        """Returns the raw (x, y) position of a hat."""
+        (code_x, code_y) = self.hat_codes[i]
+        return [self._query_abs(code_x), self._query_abs(code_y)]
+
+    def get_hat(self, i):
+        return self.hat_state(*self.get_hat_position(i))
+
+
+class PipeEvdevDevice(EvdevDevice):
+    """Fake input device, fed through a pipe : the events written with emit() are read back exactly like the events of
+    a real device. The state of its controls is tracked on the emitting side, the same way the kernel does."""
+    def __init__(self, *, name='nJoy Fake Joystick', input_id=(0x06, 0x1209, 0x4A5A, 1), abs_info=None,
+                 key_codes=None):
+        (read_fd, self._write_fd) = os.pipe()
+        os.set_blocking(read_fd, False)
+        super().__init__(fd=read_fd,
+                         name=name,
+                         input_id=input_id,
+                         abs_info=abs_info if abs_info is not None else {0x00: (-0x8000, 0x7FFF),
+                                                                         0x01: (-0x8000, 0x7FFF)},
+                         key_codes=key_codes if key_codes is not None else list(range(0x120, 0x124)))
+        self._state = dict()  # (type, code) => value
+
+    def close(self):
+        super().close()
+        os.close(self._write_fd)
+
+    def emit(self, events):
+        """Writes the given (type, code, value) events, followed by a SYN_REPORT, in a single write()."""
+        events = list(events) + [(self.__EV_SYN__, 0, 0)]
+        for (ev_type, code, value) in events:
+            self._state[(ev_type, code)] = value
+        os.write(self._write_fd, b''.join([self._input_event.pack(0, 0, *event) for event in events]))
+
+    def _query_abs(self, code):
+        return self._state.get((self.__EV_ABS__, code), 0)
+
+    def _query_keys(self):
+        return sum([1 << code for ((ev_type, code), value) in self._state.items()
+                    if ev_type == self.__EV_KEY__ and value])
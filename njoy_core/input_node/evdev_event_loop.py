@@ -0,0 +1,166 @@
+import select
+
+from njoy_core.core.model import InputNodeRegisterRequest, InputNodeRegisterReply
+from njoy_core.core.model import PhysicalControlEvent, PhysicalDeviceSnapshot
+
+from .event_loop import EventLoop
+from .evdev_device import EvdevDevice, EvdevDeviceError
+
+
+class EvdevEventLoopException(Exception):
+    """Top-level class for all exceptions raised from this module."""
+
+
+class EvdevEventLoop(EventLoop):
+    """Input backend reading the physical devices directly from their Linux evdev nodes, without SDL.
+
+    All the devices are waited on with a single epoll, and the events of each ready device are decoded in bulk.
+    Its dispatch table is keyed by (file descriptor, event type, event code), and each entry also holds the staging
+    method of the control : handling an event is a single lookup, a value pack and a staging call.
+
+    When the kernel reports that events were dropped (SYN_DROPPED), the full state is emitted again. A device which
+    can't be read anymore (typically unplugged) is dropped."""
+    __TIMEOUT__ = 0.01  # s, bounds the time a full state request may wait for
+
+    # Excluding our own output devices
+    __EXCLUDE_LIST__ = ['vJoy Device', 'nJoy Virtual Joystick']
+
+    def __init__(self, timeout=__TIMEOUT__):
+        super().__init__()
+        self._timeout = timeout
+        self._epoll = select.epoll()
+        self._hat_positions = dict()  # (file descriptor, hat index) => [x, y], the current position of each hat
+        self._wakeups = 0
+
+    @property
+    def stats(self):
+        return dict(super().stats, wakeups=self._wakeups)
+
+    def handshake(self, socket):
+        # First send our list of joysticks to njoy_core
+        evdev_devices = EvdevDevice.device_list(exclude_list=self.__EXCLUDE_LIST__)
+        InputNodeRegisterRequest(available_devices=[(d.guid, d.name) for d in evdev_devices],
+                                 axis_encodings=self.__AXIS_ENCODINGS__).send(socket)
+        print("Input Node: sent request")
+
+        # The nJoy core replies with the list of those it's interested in, if any...
+        reply = InputNodeRegisterReply.recv(socket)
+        print("Input Node: received reply")
+
+        # ... so keep those, and remember how it wants us to send the axis values
+        self._axis_encoding = reply.axis_encoding
+        self.attach_devices(reply.node, evdev_devices)
+
+    def attach_devices(self, njoy_devices, evdev_devices):
+        """Matches the nJoy devices with the evdev devices by GUID (the others are closed), then builds the dispatch
+        table and starts waiting on them."""
+        evdev_devices = list(evdev_devices)
+        devices = dict()
+        for njoy_device in njoy_devices:
+            matching = [d for d in evdev_devices if d.guid == njoy_device.guid]
+            if not matching:
+                raise EvdevEventLoopException("Couldn't find any device with GUID {}".format(njoy_device.guid))
+            evdev_device = matching[0]
+            evdev_devices.remove(evdev_device)
+            devices[evdev_device.fd] = {'njoy_device': njoy_device,
+                                        'evdev_device': evdev_device}
+        for evdev_device in evdev_devices:
+            evdev_device.close()
+
+        self._devices = devices
+        self._build_dispatch_table()
+        for fd in self._devices:
+            self._epoll.register(fd, select.EPOLLIN)
+
+    def _build_dispatch_table(self):
+        self._dispatch_table = dict()
+        for (fd, device) in self._devices.items():
+            njoy_device = device['njoy_device']
+            evdev_device = device['evdev_device']
+
+            for (index, axis) in njoy_device.axes.items():
+                code = evdev_device.axis_codes[index]
+                (scaler, value_packer) = (evdev_device.mk_axis_scaler(code), self._mk_value_packer(axis))
+                self._dispatch_table[(fd, EvdevDevice.__EV_ABS__, code)] = \
+                    (PhysicalControlEvent.mk_identity(axis),
+                     self._stage_axis,
+                     lambda value, scaler=scaler, value_packer=value_packer: value_packer(scaler(value)))
+
+            for (index, button) in njoy_device.buttons.items():
+                value_packer = self._mk_value_packer(button)
+                self._dispatch_table[(fd, EvdevDevice.__EV_KEY__, evdev_device.button_codes[index])] = \
+                    (PhysicalControlEvent.mk_identity(button),
+                     self._stage_edge,
+                     lambda value, value_packer=value_packer: value_packer(value != 0))
+
+            for (index, hat) in njoy_device.hats.items():
+                position = self._hat_positions[(fd, index)] = [0, 0]
+                value_packer = self._mk_value_packer(hat)
+                for (axis, code) in enumerate(evdev_device.hat_codes[index]):
+                    self._dispatch_table[(fd, EvdevDevice.__EV_ABS__, code)] = \
+                        (PhysicalControlEvent.mk_identity(hat),
+                         self._stage_edge,
+                         self._mk_hat_packer(position, axis, value_packer))
+
+    def _drop_device(self, fd):
+        """Stops waiting on a device, and removes its controls from the dispatch table."""
+        self._epoll.unregister(fd)
+        self._devices.pop(fd)['evdev_device'].close()
+        self._dispatch_table = {key: entry for (key, entry) in self._dispatch_table.items() if key[0] != fd}
+        self._hat_positions = {key: position for (key, position) in self._hat_positions.items() if key[0] != fd}
+
+    @staticmethod
+    def _mk_hat_packer(position, axis, value_packer):
+        """Returns the function updating one axis of the hat position, then packing the resulting hat state."""
+        def _pack(value):
+            position[axis] = value
+            return value_packer(EvdevDevice.hat_state(*position))
+        return _pack
+
+    def emit_full_state(self, socket):
+        # The whole state of each device is sent as a single snapshot
+        for (fd, device) in self._devices.items():
+            njoy_device = device['njoy_device']
+            evdev_device = device['evdev_device']
+            axes = {i: evdev_device.get_axis(i) for i in njoy_device.axes}
+            buttons = {i: evdev_device.get_button(i) for i in njoy_device.buttons}
+            hats = {i: evdev_device.get_hat(i) for i in njoy_device.hats}
+            PhysicalDeviceSnapshot(device=njoy_device,
+                                   axes={i: self._encoded_axis_value(value) for (i, value) in axes.items()},
+                                   buttons=buttons,
+                                   hats=hats,
+                                   axis_encoding=self._axis_encoding).send(socket)
+
+            # The snapshot is the new reference for the changes to send
+            for (controls, values) in [(njoy_device.axes, axes),
+                                       (njoy_device.buttons, buttons),
+                                       (njoy_device.hats, hats)]:
+                for (index, value) in values.items():
+                    control = controls[index]
+                    self._last_sent[PhysicalControlEvent.mk_identity(control)] = self._mk_value_packer(control)(value)
+            for index in njoy_device.hats:
+                self._hat_positions[(fd, index)][:] = evdev_device.get_hat_position(index)
+
+    def loop(self, socket):
+        if self._full_state_requested.is_set():
+            self._full_state_requested.clear()
+            self.emit_full_state(socket)
+
+        # All the events read from the ready devices are sent together, in a single batch
+        dispatch_table = self._dispatch_table
+        for (fd, _) in self._epoll.poll(self._timeout):
+            self._wakeups += 1
+            try:
+                events = self._devices[fd]['evdev_device'].read_events()
+            except EvdevDeviceError as e:
+                print("Input Node: {}".format(e))
+                self._drop_device(fd)
+                continue
+            for (_, _, ev_type, code, value) in events:
+                entry = dispatch_table.get((fd, ev_type, code))
+                if entry is not None:
+                    entry[1](entry[0], entry[2](value))
+                elif ev_type == EvdevDevice.__EV_SYN__ and code == EvdevDevice.__SYN_DROPPED__:
+                    self.request_full_state()
+
+        self._flush(socket)
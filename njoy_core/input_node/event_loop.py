@@ -0,0 +1,97 @@
+import threading
+
+from njoy_core.core.model import AxisEncoding, Axis, PhysicalControlEvent, PhysicalControlEventBatch
+
+
+class EventLoop:
+    """Base class of the input backends, reading the events of the physical devices and sending them to the nJoy core.
+
+    After the handshake, the set of controls is fixed : each backend then builds a flat dispatch table, mapping its own
+    event keys to the pre-packed identity frame of the corresponding control and the function packing its values, so
+    handling an event is a single lookup plus a value pack.
+
+    The events of a drain are staged as (identity, value frame) entries, then only the changes are sent, in a single
+    batch :
+    - The successive values of an axis within a drain are coalesced into the latest one, at its first position.
+    - All the edges of the buttons and hats are kept in order.
+    - The values identical to the last ones sent are dropped."""
+    __AXIS_ENCODINGS__ = (AxisEncoding.INT16, AxisEncoding.FLOAT64)  # By order of preference
+
+    def __init__(self):
+        self._devices = None
+        self._dispatch_table = dict()  # event key => (identity frame, value packer), the keys depend on the backend
+        self._axis_encoding = AxisEncoding.FLOAT64
+        self._full_state_requested = threading.Event()
+
+        self._entries = list()  # (identity frame, value frame), in order
+        self._axis_positions = dict()  # axis identity frame => position of its entry
+        self._last_sent = dict()  # identity frame => last value frame sent to the nJoy core
+        self._coalesced = 0
+        self._suppressed = 0
+
+    @property
+    def stats(self):
+        return {'coalesced': self._coalesced,
+                'suppressed': self._suppressed}
+
+    def handshake(self, socket):
+        raise NotImplementedError
+
+    def emit_full_state(self, socket):
+        raise NotImplementedError
+
+    def loop(self, socket):
+        raise NotImplementedError
+
+    def request_full_state(self):
+        """Thread-safe : the full state will be emitted again at the next iteration of the loop."""
+        self._full_state_requested.set()
+
+    def _mk_value_packer(self, control):
+        """Returns the function packing the raw values of the given control (int16 for the axes)."""
+        value_packer = PhysicalControlEvent.mk_value_packer(control, self._axis_encoding)
+        if isinstance(control, Axis) and self._axis_encoding != AxisEncoding.INT16:
+            axis_value = self._axis_value
+            return lambda value: value_packer(axis_value(value))
+        return value_packer
+
+    def _encoded_axis_value(self, value):
+        # With the int16 encoding, the raw value is sent as is
+        if self._axis_encoding == AxisEncoding.INT16:
+            return value
+        return self._axis_value(value)
+
+    @staticmethod
+    def _axis_value(value):
+        # Convert from [-32768 .. 32768] to [-1.0 .. 1.0]
+        return 2 * ((value + 0x8000) / 0xFFFF) - 1
+
+    def _stage_axis(self, identity, value):
+        if identity in self._axis_positions:
+            self._entries[self._axis_positions[identity]] = (identity, value)
+            self._coalesced += 1
+        else:
+            self._axis_positions[identity] = len(self._entries)
+            self._entries.append((identity, value))
+
+    def _stage_edge(self, identity, value):
+        if self._last_sent.get(identity) == value:
+            self._suppressed += 1
+        else:
+            self._last_sent[identity] = value
+            self._entries.append((identity, value))
+
+    def _flush(self, socket):
+        entries = list()
+        for (identity, value) in self._entries:
+            if identity in self._axis_positions:
+                if self._last_sent.get(identity) == value:
+                    self._suppressed += 1
+                    continue
+                self._last_sent[identity] = value
+            entries.append((identity, value))
+        self._entries.clear()
+        self._axis_positions.clear()
+
+        if entries:
+            PhysicalControlEventBatch.send_entries(socket, entries)
@@ -1,11 +1,12 @@
-import time
-
 import sdl2
 import sdl2.ext
 
-from njoy_core.core.model import InputNodeRegisterRequest, InputNodeRegisterReply, PhysicalControlEvent
+from njoy_core.core.model import InputNodeRegisterRequest, InputNodeRegisterReply
+from njoy_core.core.model import PhysicalControlEvent, PhysicalDeviceSnapshot
 
+from .event_loop import EventLoop
 from .sdl_joystick import SDLJoystick
+from .wait_strategies import mk_wait_strategy
 
 
 class HidEventLoopException(Exception):
@@ -16,74 +17,97 @@ class HidEventLoopQuit(HidEventLoopException):
     pass
 
 
-class HidEventLoop:
-    __LOOP_SLEEP_TIME__ = 0.0001  # 100 µs
+class HidEventLoop(EventLoop):
+    """Input backend reading the physical devices through SDL.
+
+    Its dispatch table is keyed by (SDL instance id, kind, index)."""
+    def __init__(self, wait_strategy='sleep'):
+        super().__init__()
+        self._wait_strategy = mk_wait_strategy(wait_strategy)  # How to wait between two drains of the event queue
 
-    def __init__(self):
-        self._devices = None
+    @property
+    def stats(self):
+        return dict(self._wait_strategy.stats, **super().stats)
 
     def handshake(self, socket):
         SDLJoystick.sdl_init()
 
         # First send our list of joysticks to njoy_core, excluding vJoy devices (those are our output devices)
-        InputNodeRegisterRequest(available_devices=SDLJoystick.device_list(exclude_list=['vJoy Device'])).send(socket)
+        InputNodeRegisterRequest(available_devices=SDLJoystick.device_list(exclude_list=['vJoy Device']),
+                                 axis_encodings=self.__AXIS_ENCODINGS__).send(socket)
         print("Input Node: sent request")
 
         # The nJoy core replies with the list of those it's interested in, if any...
         reply = InputNodeRegisterReply.recv(socket)
         print("Input Node: received reply")
 
-        # ... so open those
+        # ... so open those, and remember how it wants us to send the axis values
+        self._axis_encoding = reply.axis_encoding
         devices = dict()
         for njoy_device in reply.node:
             sdl_device = SDLJoystick.open(njoy_device.guid)
             devices[sdl_device.instance_id] = {'njoy_device': njoy_device,
                                                'sdl_device': sdl_device}
         self._devices = devices
-
-    @staticmethod
-    def _axis_value(value):
-        # Convert from [-32768 .. 32768] to [-1.0 .. 1.0]
-        return 2 * ((value + 0x8000) / 0xFFFF) - 1
-
-    @staticmethod
-    def _button_value(value):
-        return value != 0
+        self._build_dispatch_table()
+
+    def _build_dispatch_table(self):
+        self._dispatch_table = dict()
+        for (instance_id, device) in self._devices.items():
+            njoy_device = device['njoy_device']
+            for (kind, controls) in [('axis', njoy_device.axes),
+                                     ('button', njoy_device.buttons),
+                                     ('hat', njoy_device.hats)]:
+                for (index, control) in controls.items():
+                    self._dispatch_table[(instance_id, kind, index)] = (PhysicalControlEvent.mk_identity(control),
+                                                                       self._mk_value_packer(control))
 
     def emit_full_state(self, socket):
-        for device in self._devices.values():
+        # The whole state of each device is sent as a single snapshot
+        for (instance_id, device) in self._devices.items():
+            njoy_device = device['njoy_device']
             sdl_device = device['sdl_device']
-            for axis in device['njoy_device'].axes.values():
-                PhysicalControlEvent(control=axis,
-                                     value=sdl_device.get_axis(axis.id)).send(socket)
-            for button in device['njoy_device'].buttons.values():
-                PhysicalControlEvent(control=button,
-                                     value=sdl_device.get_button(button.id)).send(socket)
-            for hat in device['njoy_device'].hats.values():
-                PhysicalControlEvent(control=hat,
-                                     value=sdl_device.get_hat(hat.id)).send(socket)
+            axes = {i: sdl_device.get_axis(i) for i in njoy_device.axes}
+            buttons = {i: sdl_device.get_button(i) for i in njoy_device.buttons}
+            hats = {i: sdl_device.get_hat(i) for i in njoy_device.hats}
+            PhysicalDeviceSnapshot(device=njoy_device,
+                                   axes={i: self._encoded_axis_value(value) for (i, value) in axes.items()},
+                                   buttons=buttons,
+                                   hats=hats,
+                                   axis_encoding=self._axis_encoding).send(socket)
+
+            # The snapshot is the new reference for the changes to send
+            for (kind, values) in [('axis', axes), ('button', buttons), ('hat', hats)]:
+                for (index, value) in values.items():
+                    (identity, value_packer) = self._dispatch_table[(instance_id, kind, index)]
+                    self._last_sent[identity] = value_packer(value)
 
     def loop(self, socket):
-        for event in sdl2.ext.get_events():
+        if self._full_state_requested.is_set():
+            self._full_state_requested.clear()
+            self.emit_full_state(socket)
+
+        # All the events drained from the SDL queue are sent together, in a single batch
+        dispatch_table = self._dispatch_table
+        events = sdl2.ext.get_events()
+        for event in events:
             if event.type == sdl2.SDL_QUIT:
                 raise HidEventLoopQuit()
 
             if event.type == sdl2.SDL_JOYAXISMOTION:
-                device = self._devices[event.jaxis.which]['njoy_device']
-                if event.jaxis.axis in device.axes:
-                    PhysicalControlEvent(control=device.axes[event.jaxis.axis],
-                                         value=self._axis_value(event.jaxis.value)).send(socket)
+                entry = dispatch_table.get((event.jaxis.which, 'axis', event.jaxis.axis))
+                if entry is not None:
+                    self._stage_axis(entry[0], entry[1](event.jaxis.value))
 
             elif event.type in {sdl2.SDL_JOYBUTTONDOWN, sdl2.SDL_JOYBUTTONUP}:
-                device = self._devices[event.jbutton.which]['njoy_device']
-                if event.jbutton.button in device.buttons:
-                    PhysicalControlEvent(control=device.buttons[event.jbutton.button],
-                                         value=self._button_value(event.jbutton.state)).send(socket)
+                entry = dispatch_table.get((event.jbutton.which, 'button', event.jbutton.button))
+                if entry is not None:
+                    self._stage_edge(entry[0], entry[1](event.jbutton.state != 0))
 
             elif event.type == sdl2.SDL_JOYHATMOTION:
-                device = self._devices[event.jhat.which]['njoy_device']
-                if event.jhat.hat in device.hats:
-                    PhysicalControlEvent(control=device.hats[event.jhat.hat],
-                                         value=event.jhat.value).send(socket)
+                entry = dispatch_table.get((event.jhat.which, 'hat', event.jhat.hat))
+                if entry is not None:
+                    self._stage_edge(entry[0], entry[1](event.jhat.value))
 
-        time.sleep(self.__LOOP_SLEEP_TIME__)
+        self._flush(socket)
+        self._wait_strategy.wait(len(events))
@@ -0,0 +1,99 @@
+"""Wait strategies of the HidEventLoop, between two drains of the SDL event queue.
+
+- 'sleep' : sleeps for a fixed time after each drain (busy loop, the historical behavior).
+- 'blocking' : blocks until an event is available, with SDL_WaitEventTimeout. The timeout bounds the time a full state
+  request may wait for.
+- 'adaptive' : spins while the events keep coming, then backs off exponentially when idle.
+
+Each strategy keeps stats about the loop : its number of iterations (and their rate), and the time spent waiting."""
+import importlib
+import time
+
+
+class WaitStrategyError(Exception):
+    pass
+
+
+class WaitStrategy:
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._start = None
+        self._iterations = 0
+        self._idle_time = 0.0
+
+    @property
+    def stats(self):
+        elapsed = self._clock() - self._start if self._start is not None else 0.0
+        return {'iterations': self._iterations,
+                'iterations_per_second': self._iterations / elapsed if elapsed > 0 else 0.0,
+                'idle_time': self._idle_time}
+
+    def _wait(self, nb_events):
+        raise NotImplementedError
+
+    def wait(self, nb_events):
+        """Waits after a drain of the event queue, which returned nb_events events."""
+        now = self._clock()
+        if self._start is None:
+            self._start = now
+        self._iterations += 1
+        self._wait(nb_events)
+        self._idle_time += self._clock() - now
+
+
+class SleepWaitStrategy(WaitStrategy):
+    __SLEEP_TIME__ = 0.0001  # 100 µs
+
+    def __init__(self, sleep_time=__SLEEP_TIME__, **kwargs):
+        super().__init__(**kwargs)
+        self._sleep_time = sleep_time
+
+    def _wait(self, nb_events):
+        time.sleep(self._sleep_time)
+
+
+class BlockingWaitStrategy(WaitStrategy):
+    __TIMEOUT__ = 10  # ms
+
+    def __init__(self, timeout=__TIMEOUT__, wait_event=None, **kwargs):
+        """wait_event defaults to SDL_WaitEventTimeout, only imported then : the other strategies don't need SDL."""
+        super().__init__(**kwargs)
+        self._timeout = timeout
+        self._wait_event = wait_event or importlib.import_module('sdl2').SDL_WaitEventTimeout
+
+    def _wait(self, nb_events):
+        # Without any event structure to fill in, the event is left in the queue for the next drain
+        self._wait_event(None, self._timeout)
+
+
+class AdaptiveWaitStrategy(WaitStrategy):
+    __MIN_SLEEP_TIME__ = 0.00005  # 50 µs
+    __MAX_SLEEP_TIME__ = 0.005  # 5 ms
+
+    def __init__(self, min_sleep_time=__MIN_SLEEP_TIME__, max_sleep_time=__MAX_SLEEP_TIME__, **kwargs):
+        super().__init__(**kwargs)
+        self._min_sleep_time = min_sleep_time
+        self._max_sleep_time = max_sleep_time
+        self._sleep_time = 0.0
+
+    @property
+    def sleep_time(self):
+        return self._sleep_time
+
+    def _wait(self, nb_events):
+        if nb_events:
+            self._sleep_time = 0.0
+            return
+        self._sleep_time = min(self._max_sleep_time, 2 * self._sleep_time or self._min_sleep_time)
+        time.sleep(self._sleep_time)
+
+
+__WAIT_STRATEGIES__ = {'sleep': SleepWaitStrategy,
+                       'blocking': BlockingWaitStrategy,
+                       'adaptive': AdaptiveWaitStrategy}
+
+
+def mk_wait_strategy(name, **kwargs):
+    if name not in __WAIT_STRATEGIES__:
+        raise WaitStrategyError("Unknown wait strategy '{}'".format(name))
+    return __WAIT_STRATEGIES__[name](**kwargs)
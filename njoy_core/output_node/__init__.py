@@ -2,7 +2,7 @@ import multiprocessing
 import threading
 import zmq
 
-from njoy_core.core.model import OutputNodeCapabilities, OutputNodeAssignments
+from njoy_core.core.model import AxisEncoding, OutputNodeCapabilities, OutputNodeAssignments
 from .virtual_joystick import VirtualJoystick
 
 
@@ -11,22 +11,31 @@ class OutputNodeException(Exception):
 
 
 class StandaloneOutputNode:
-    def __init__(self, context, requests_endpoint, events_endpoint):
+    __AXIS_ENCODINGS__ = (AxisEncoding.INT16, AxisEncoding.FLOAT64)  # By order of preference
+
+    def __init__(self, context, requests_endpoint, events_endpoint, streaming=False, output_rate=None, backend='vjoy'):
         self._ctx = context
         self._requests_endpoint = requests_endpoint
         self._events_endpoint = events_endpoint
+        self._streaming = streaming  # Must match the output mode of the Core
+        self._output_rate = output_rate  # Max rate (in Hz) of the reports sent to each device, None for unlimited
+        self._backend = backend  # Output devices backend : 'vjoy' (Windows), 'uinput' (Linux) or 'memory'
 
     def _request_assignments(self):
         socket = self._ctx.socket(zmq.REQ)
         socket.connect(self._requests_endpoint)
-        OutputNodeCapabilities(capabilities=VirtualJoystick.device_capabilities()).send(socket)
+        OutputNodeCapabilities(capabilities=VirtualJoystick.device_capabilities(backend=self._backend),
+                               axis_encodings=self.__AXIS_ENCODINGS__).send(socket)
         reply = OutputNodeAssignments.recv(socket)
         return reply.node
 
     def run(self):
         virtual_joysticks = [VirtualJoystick(device=device,
                                              context=self._ctx,
-                                             events_endpoint=self._events_endpoint)
+                                             events_endpoint=self._events_endpoint,
+                                             streaming=self._streaming,
+                                             output_rate=self._output_rate,
+                                             backend=self._backend)
                              for device in self._request_assignments()]
 
         for vj in virtual_joysticks:
@@ -37,20 +46,22 @@ class StandaloneOutputNode:
 
 
 class EmbeddedOutputNode(threading.Thread):
-    def __init__(self, context, requests_endpoint, events_endpoint):
+    def __init__(self, context, requests_endpoint, events_endpoint, streaming=False, output_rate=None, backend='vjoy'):
         super().__init__()
         self._ctx = context
-        self._node = StandaloneOutputNode(self._ctx, requests_endpoint, events_endpoint)
+        self._node = StandaloneOutputNode(self._ctx, requests_endpoint, events_endpoint, streaming, output_rate,
+                                          backend)
 
     def run(self):
         self._node.run()
 
 
 class ExternalOutputNode(multiprocessing.Process):
-    def __init__(self, requests_endpoint, events_endpoint):
+    def __init__(self, requests_endpoint, events_endpoint, streaming=False, output_rate=None, backend='vjoy'):
         super().__init__()
         self._ctx = zmq.Context()
-        self._node = StandaloneOutputNode(self._ctx, requests_endpoint, events_endpoint)
+        self._node = StandaloneOutputNode(self._ctx, requests_endpoint, events_endpoint, streaming, output_rate,
+                                          backend)
 
     def run(self):
         self._node.run()
@@ -0,0 +1,97 @@
+import array
+import enum
+import time
+
+from njoy_core.core.model import ControlEvent
+
+
+class MemoryDevice:
+    """In-memory output device, with the same interface as VJoyDevice, which records every change it is sent.
+
+    Each change is recorded along with the (monotonic) time it was sent at, into a ring buffer preallocated at
+    instantiation : only the last 'capacity' changes are kept, and recording never allocates. The changes staged with
+    the report_* methods are all recorded with the time of the send_report call which sends them. The axis values are
+    always recorded as floats in range [-1.0 .. 1.0], whether they were sent as floats or as raw int16 values.
+
+    It doesn't depend on any driver, so the whole pipeline can run (and be benchmarked) anywhere."""
+    class Kind(enum.IntEnum):
+        AXIS = 0
+        BUTTON = 1
+        POV = 2
+
+    __MAX_NB_AXES__ = 8
+    __MAX_NB_BUTTONS__ = 128
+    __MAX_NB_HATS__ = 4
+
+    __CAPACITY__ = 0x10000  # Default number of records kept
+
+    @classmethod
+    def nb_devices(cls):
+        # Same as vjoy
+        return 2
+
+    def __init__(self, device_id, capacity=None, clock=time.monotonic):
+        self._device_id = device_id
+        self._clock = clock
+        self._capacity = capacity or self.__CAPACITY__
+        self._timestamps = array.array('d', bytes(8 * self._capacity))
+        self._kinds = array.array('B', bytes(self._capacity))
+        self._ids = array.array('H', bytes(2 * self._capacity))
+        self._values = array.array('d', bytes(8 * self._capacity))
+        self._count = 0  # Total number of records, including the overwritten ones
+        self._pending = dict()  # (kind, id) => value, for the changes staged since the last report
+
+    @property
+    def count(self):
+        return self._count
+
+    def records(self):
+        """Returns the records kept, from the oldest to the newest, as (timestamp, kind, id, value) tuples."""
+        start = max(0, self._count - self._capacity)
+        return [(self._timestamps[i % self._capacity],
+                 self.Kind(self._kinds[i % self._capacity]),
+                 self._ids[i % self._capacity],
+                 self._values[i % self._capacity])
+                for i in range(start, self._count)]
+
+    def clear(self):
+        self._count = 0
+        self._pending.clear()
+
+    def close(self):
+        """Nothing to release : the records are kept, for inspection."""
+
+    def _record(self, timestamp, kind, control_id, value):
+        position = self._count % self._capacity
+        self._timestamps[position] = timestamp
+        self._kinds[position] = kind
+        self._ids[position] = control_id
+        self._values[position] = value
+        self._count += 1
+
+    def report_axis(self, axis_id, axis_value):
+        """Stages the new value of an axis (a float in range [-1.0 .. 1.0], or a raw int16 value)."""
+        self._pending[(self.Kind.AXIS, axis_id)] = ControlEvent.axis_to_float(axis_value)
+
+    def report_button(self, button_id, state):
+        self._pending[(self.Kind.BUTTON, button_id)] = 1 if state else 0
+
+    def report_cont_pov(self, pov_id, pov_value):
+        """Stages the new direction of a hat : in range [0 .. 35900] (tenth of degrees) or -1 for none (not pressed)"""
+        self._pending[(self.Kind.POV, pov_id)] = pov_value
+
+    def send_report(self):
+        """Records all the changes staged since the last report, with the current time."""
+        timestamp = self._clock()
+        for ((kind, control_id), value) in self._pending.items():
+            self._record(timestamp, kind, control_id, value)
+        self._pending.clear()
+
+    def set_axis(self, axis_id, axis_value):
+        self._record(self._clock(), self.Kind.AXIS, axis_id, ControlEvent.axis_to_float(axis_value))
+
+    def set_button(self, button_id, state):
+        self._record(self._clock(), self.Kind.BUTTON, button_id, 1 if state else 0)
+
+    def set_cont_pov(self, pov_id, pov_value):
+        self._record(self._clock(), self.Kind.POV, pov_id, pov_value)
@@ -0,0 +1,55 @@
+import math
+import time
+
+
+class OutputScheduler:
+    """Decides when the changes staged into the report of an output device are flushed to the driver.
+
+    Without any rate, every change is flushed right away. With a rate (in Hz), a dirty device is flushed at most once
+    per period, so the successive changes of the axes are coalesced into a single report. The edges (buttons and hats)
+    are always flushed immediately, along with everything else staged so far.
+
+    The stats count the staged updates, the reports actually sent, and the updates which were coalesced into a report
+    shared with another one."""
+
+    def __init__(self, *, rate=None, clock=time.monotonic):
+        self._period = 1.0 / rate if rate else None
+        self._clock = clock
+        self._next_flush = 0.0
+        self._dirty = 0  # Number of updates staged since the last flush
+        self._edge = False  # Whether an edge was staged since the last flush
+        self._updates = 0
+        self._reports = 0
+        self._coalesced = 0
+
+    @property
+    def stats(self):
+        return {'updates': self._updates,
+                'reports': self._reports,
+                'coalesced': self._coalesced}
+
+    def stage(self, edge=False):
+        self._updates += 1
+        self._dirty += 1
+        self._edge |= edge
+
+    def is_due(self):
+        if not self._dirty:
+            return False
+        return self._edge or self._period is None or self._clock() >= self._next_flush
+
+    def timeout(self):
+        """Returns the time to wait (in milliseconds) before the next flush is due, or None if nothing is staged."""
+        if not self._dirty:
+            return None
+        if self.is_due():
+            return 0
+        return math.ceil(1000 * (self._next_flush - self._clock()))
+
+    def flushed(self):
+        self._reports += 1
+        self._coalesced += self._dirty - 1
+        self._dirty = 0
+        self._edge = False
+        if self._period is not None:
+            self._next_flush = self._clock() + self._period
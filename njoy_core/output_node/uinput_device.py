@@ -0,0 +1,169 @@
+import fcntl
+import os
+import stat
+import struct
+
+
+class UInputDeviceError(Exception):
+    pass
+
+
+class UInputDevice:
+    """Virtual joystick created through the Linux uinput module, with the same interface as VJoyDevice.
+
+    The report_* methods only stage the changes of the current frame. send_report then writes all of them in a single
+    write() call, followed by a single EV_SYN, so the kernel (and the games) see the whole frame at once. The set_*
+    methods stage a single change and send it right away.
+
+    If 'path' is a regular file instead of the uinput character device, the device setup and all the events are
+    simply appended to it (it is created if needed), without any ioctl : it is a stand-in for the tests, or for running
+    without uinput. Without 'path', /dev/uinput must be the uinput character device."""
+    __UINPUT_PATH__ = '/dev/uinput'
+
+    __MAX_NB_AXES__ = 8
+    __MAX_NB_BUTTONS__ = 56
+    __MAX_NB_HATS__ = 4
+
+    # From linux/input-event-codes.h
+    __EV_SYN__ = 0x00
+    __EV_KEY__ = 0x01
+    __EV_ABS__ = 0x03
+    __SYN_REPORT__ = 0x00
+
+    # Axis id => absolute axis code : X, Y, Z, RX, RY, RZ, THROTTLE, RUDDER, WHEEL (same order as the vjoy axes)
+    __ABS_AXES__ = (0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x08)
+    # Hat id => (ABS_HATnX, ABS_HATnY)
+    __ABS_HATS__ = ((0x10, 0x11), (0x12, 0x13), (0x14, 0x15), (0x16, 0x17))
+    # Button id => key code : BTN_TRIGGER to BTN_DEAD, then BTN_TRIGGER_HAPPY1 to BTN_TRIGGER_HAPPY40
+    __KEY_BUTTONS__ = tuple(range(0x120, 0x130)) + tuple(range(0x2C0, 0x2E8))
+
+    __AXIS_MIN__ = -0x8000
+    __AXIS_MAX__ = 0x7FFF
+
+    # Continuous pov (tenth of degrees, by steps of 45°) => (x, y) hat values ; -1 for none (not pressed)
+    __HAT_VALUES__ = {-1: (0, 0),
+                      0: (0, -1), 4500: (1, -1), 9000: (1, 0), 13500: (1, 1),
+                      18000: (0, 1), 22500: (-1, 1), 27000: (-1, 0), 31500: (-1, -1)}
+
+    # ioctl requests, from linux/uinput.h
+    __UI_DEV_CREATE__ = 0x5501
+    __UI_DEV_DESTROY__ = 0x5502
+    __UI_SET_EVBIT__ = 0x40045564
+    __UI_SET_KEYBIT__ = 0x40045565
+    __UI_SET_ABSBIT__ = 0x40045567
+
+    __BUS_VIRTUAL__ = 0x06
+    __ABS_CNT__ = 0x40
+
+    _input_event = struct.Struct('@llHHi')  # struct input_event : timeval (ignored by uinput), type, code, value
+    _user_dev = struct.Struct('@80sHHHHI{0}i{0}i{0}i{0}i'.format(__ABS_CNT__))  # struct uinput_user_dev
+
+    @classmethod
+    def nb_devices(cls):
+        # uinput has no limit of its own : stick to the number of vjoy devices
+        return 2
+
+    def __init__(self, device_id, path=None):
+        self._device_id = device_id
+        flags = os.O_WRONLY | os.O_NONBLOCK | os.O_APPEND
+        try:
+            self._fd = os.open(path, flags | os.O_CREAT) if path else os.open(self.__UINPUT_PATH__, flags)
+        except OSError as e:
+            raise UInputDeviceError("Couldn't open {}: {}".format(path or self.__UINPUT_PATH__, e)) from e
+        self._is_uinput = stat.S_ISCHR(os.fstat(self._fd).st_mode)
+        if not path and not self._is_uinput:
+            os.close(self._fd)
+            raise UInputDeviceError("{} isn't a character device, is the uinput module loaded ?"
+                                    .format(self.__UINPUT_PATH__))
+        self._pending = dict()  # (type, code) => value, for the changes of the current frame
+        try:
+            self._setup()
+        except (OSError, UInputDeviceError):
+            os.close(self._fd)
+            raise
+
+    def _ioctl(self, request, arg=0):
+        if self._is_uinput:
+            fcntl.ioctl(self._fd, request, arg)
+
+    def _setup(self):
+        self._ioctl(self.__UI_SET_EVBIT__, self.__EV_KEY__)
+        for code in self.__KEY_BUTTONS__:
+            self._ioctl(self.__UI_SET_KEYBIT__, code)
+
+        self._ioctl(self.__UI_SET_EVBIT__, self.__EV_ABS__)
+        abs_min = [0] * self.__ABS_CNT__
+        abs_max = [0] * self.__ABS_CNT__
+        for code in self.__ABS_AXES__:
+            self._ioctl(self.__UI_SET_ABSBIT__, code)
+            (abs_min[code], abs_max[code]) = (self.__AXIS_MIN__, self.__AXIS_MAX__)
+        for hat in self.__ABS_HATS__:
+            for code in hat:
+                self._ioctl(self.__UI_SET_ABSBIT__, code)
+                (abs_min[code], abs_max[code]) = (-1, 1)
+
+        name = 'nJoy Virtual Joystick {}'.format(self._device_id).encode('utf-8')
+        zeros = [0] * self.__ABS_CNT__
+        self._write(self._user_dev.pack(name, self.__BUS_VIRTUAL__, 0x1209, 0x4A59, 1 + self._device_id, 0,
+                                        *abs_max, *abs_min, *zeros, *zeros))
+        self._ioctl(self.__UI_DEV_CREATE__)
+
+    def _write(self, data):
+        try:
+            os.write(self._fd, data)
+        except OSError as e:
+            raise UInputDeviceError("Failed to write to the uinput device {}: {}".format(self._device_id, e)) from e
+
+    def close(self):
+        self._ioctl(self.__UI_DEV_DESTROY__)
+        os.close(self._fd)
+
+    @classmethod
+    def _to_axis_value(cls, axis_value):
+        if isinstance(axis_value, int):
+            return max(axis_value, -cls.__AXIS_MAX__)  # -0x8000 is -1.0, like -0x7FFF (see ControlEvent.axis_to_float)
+        return round(max(-1.0, min(1.0, axis_value)) * cls.__AXIS_MAX__)
+
+    def report_axis(self, axis_id, axis_value):
+        """Stages the new value of an axis, sent by the next call to send_report.
+        axis_id is 0-based [0..8], internally converted to the uinput axis code
+        axis_value is a float in range [-1.0 .. 1.0], or a raw int16 value"""
+        self._pending[(self.__EV_ABS__, self.__ABS_AXES__[axis_id])] = self._to_axis_value(axis_value)
+
+    def report_button(self, button_id, state):
+        """Stages the new state of a button, sent by the next call to send_report.
+        button_id is 0-based, internally converted to the uinput key code"""
+        self._pending[(self.__EV_KEY__, self.__KEY_BUTTONS__[button_id])] = 1 if state else 0
+
+    def report_cont_pov(self, pov_id, pov_value):
+        """Stages the new direction of a hat, sent by the next call to send_report.
+        pov_value is an int in range [0 .. 35900] (tenth of degrees) or -1 for none (not pressed), internally converted
+        to the closest x and y hat values"""
+        if pov_value not in self.__HAT_VALUES__:
+            pov_value = -1 if pov_value < 0 else 4500 * (round(pov_value / 4500) % 8)
+        (x, y) = self.__HAT_VALUES__[pov_value]
+        (code_x, code_y) = self.__ABS_HATS__[pov_id]
+        self._pending[(self.__EV_ABS__, code_x)] = x
+        self._pending[(self.__EV_ABS__, code_y)] = y
+
+    def send_report(self):
+        """Writes all the changes staged since the last report in a single call, followed by a single EV_SYN."""
+        if not self._pending:
+            return
+        events = [self._input_event.pack(0, 0, ev_type, code, value)
+                  for ((ev_type, code), value) in self._pending.items()]
+        events.append(self._input_event.pack(0, 0, self.__EV_SYN__, self.__SYN_REPORT__, 0))
+        self._pending.clear()
+        self._write(b''.join(events))
+
+    def set_axis(self, axis_id, axis_value):
+        self.report_axis(axis_id, axis_value)
+        self.send_report()
+
+    def set_button(self, button_id, state):
+        self.report_button(button_id, state)
+        self.send_report()
+
+    def set_cont_pov(self, pov_id, pov_value):
+        self.report_cont_pov(pov_id, pov_value)
+        self.send_report()
@@ -1,49 +1,36 @@
+import importlib
 import threading
 import zmq
 
-from njoy_core.core.model import VirtualControlEvent
+from njoy_core.core.model import VirtualControlEvent, VirtualControlEventBatch, VirtualDeviceSnapshot, OutputCredits
 from njoy_core.core.model import HatState
-from njoy_core.output_node import vjoy_device
+from njoy_core.output_node.scheduler import OutputScheduler
 
 
-class Feeder(threading.Thread):
-    def __init__(self, virtual_joystick, control):
-        super().__init__()
-
-        self._ctx = virtual_joystick.ctx
-        self._socket = self._ctx.socket(zmq.REQ)
-        self._socket.set(zmq.IDENTITY, VirtualControlEvent.mk_identity(control))
-        self._socket.connect(virtual_joystick.events_endpoint)
-
-        self._output_device = virtual_joystick.output_device
-        self._control = control
+class OutputBackendError(Exception):
+    pass
 
-    def _handle_event(self, event):
-        raise NotImplementedError
-
-    def loop(self, socket):
-        VirtualControlEvent().send(socket)
-        event = VirtualControlEvent.recv(socket)
-        self._handle_event(event)
-
-    def run(self):
-        while True:
-            self.loop(self._socket)
 
+# Output backend name => (module, class) of its output devices, imported on demand since they depend on the platform
+__OUTPUT_BACKENDS__ = {'vjoy': ('njoy_core.output_node.vjoy_device', 'VJoyDevice'),
+                       'uinput': ('njoy_core.output_node.uinput_device', 'UInputDevice'),
+                       'memory': ('njoy_core.output_node.memory_device', 'MemoryDevice')}
 
-class AxisFeeder(Feeder):
-    def _handle_event(self, event):
-        self._output_device.set_axis(axis_id=self._control.id,
-                                     axis_value=event.value)
 
+def output_device_class(backend):
+    if backend not in __OUTPUT_BACKENDS__:
+        raise OutputBackendError("Unknown output backend '{}'".format(backend))
+    (module, name) = __OUTPUT_BACKENDS__[backend]
+    return getattr(importlib.import_module(module), name)
 
-class ButtonFeeder(Feeder):
-    def _handle_event(self, event):
-        self._output_device.set_button(button_id=self._control.id,
-                                       state=event.value)
 
+class Feeder(threading.Thread):
+    """Feeds all the controls of a virtual joystick, from a single thread.
 
-class HatFeeder(Feeder):
+    The values received for the controls are staged into the position report of the output device, and the whole
+    report is then sent to the driver in a single call, when the OutputScheduler says so. Only the values which changed
+    are staged. The controls are matched on their raw identity frames.
+    The int16 axis values are kept raw, and converted to the vjoy range through a lookup table."""
     # -1 for none (not pressed), or in range [0 .. 35900] (tenth of degrees)
     __to_continuous_pov = {HatState.HAT_UP: 0,
                            HatState.HAT_UP_RIGHT: 4500,
@@ -55,34 +42,145 @@ class HatFeeder(Feeder):
                            HatState.HAT_UP_LEFT: 31500,
                            HatState.HAT_CENTER: -1}
 
-    def _handle_event(self, event):
-        self._output_device.set_cont_pov(pov_id=self._control.id,
-                                         pov_value=self.__to_continuous_pov[event.value])
+    def __init__(self, virtual_joystick, device):
+        super().__init__()
+
+        self._ctx = virtual_joystick.ctx
+        self._events_endpoint = virtual_joystick.events_endpoint
+        self._output_device = virtual_joystick.output_device
+        self._scheduler = OutputScheduler(rate=virtual_joystick.output_rate)
 
+        self._controls = dict()  # identity => (control, stage function, is edge)
+        for (controls, stage, edge) in [(device.axes, self._stage_axis, False),
+                                        (device.buttons, self._stage_button, True),
+                                        (device.hats, self._stage_hat, True)]:
+            for control in controls.values():
+                self._controls[VirtualControlEvent.mk_identity(control)] = (control, stage, edge)
+        self._values = dict()  # identity => last staged value
+
+    @property
+    def stats(self):
+        return self._scheduler.stats
+
+    def _stage_axis(self, control, value):
+        self._output_device.report_axis(axis_id=control.id, axis_value=value)
+
+    def _stage_button(self, control, value):
+        self._output_device.report_button(button_id=control.id, state=value)
+
+    def _stage_hat(self, control, value):
+        self._output_device.report_cont_pov(pov_id=control.id, pov_value=self.__to_continuous_pov[value])
+
+    def _stage(self, identity, value):
+        """Stages the value of a control into the position report. Returns whether it staged an edge."""
+        if identity not in self._controls or self._values.get(identity) == value:
+            return False
+        (control, stage, edge) = self._controls[identity]
+        stage(control, value)
+        self._values[identity] = value
+        self._scheduler.stage(edge=edge)
+        return edge
+
+    def _flush(self):
+        if self._scheduler.is_due():
+            self._output_device.send_report()
+            self._scheduler.flushed()
+
+    def loop(self):
+        raise NotImplementedError
+
+    def run(self):
+        while True:
+            self.loop()
 
-class VirtualJoystick(threading.Thread):
-    # TODO: find a way to get the current vjoy configuration for that device
-    __MAX_NB_AXES__ = 8
-    __MAX_NB_BUTTONS__ = 128
-    __MAX_NB_HATS__ = 4
 
+class LockstepFeeder(Feeder):
+    """Feeder for the lockstep OutputMultiplexer : each control still has its own REQ socket, identified by the
+    identity of the control, but they are all polled from the same thread.
+
+    All the events available are staged before sending a single report, then a new 'ready' request is sent on each
+    socket which received an event."""
+    def __init__(self, virtual_joystick, device):
+        super().__init__(virtual_joystick, device)
+
+        self._poller = zmq.Poller()
+        self._sockets = dict()  # socket => identity
+        for identity in self._controls:
+            socket = self._ctx.socket(zmq.REQ)
+            socket.set(zmq.IDENTITY, identity)
+            socket.connect(self._events_endpoint)
+            self._poller.register(socket, zmq.POLLIN)
+            self._sockets[socket] = identity
+
+        # Reused for every exchange, the events are received in place
+        self._ready = VirtualControlEvent()
+        self._event = VirtualControlEvent()
+
+    def loop(self):
+        ready_sockets = [socket for (socket, _) in self._poller.poll(self._scheduler.timeout())]
+
+        for socket in ready_sockets:
+            event = VirtualControlEvent.recv_into(socket, self._event, raw_axes=True)
+            self._stage(self._sockets[socket], event.value)
+        self._flush()
+
+        for socket in ready_sockets:
+            self._ready.send(socket)
+
+    def run(self):
+        for socket in self._sockets:
+            self._ready.send(socket)
+        super().run()
+
+
+class StreamingFeeder(Feeder):
+    """Feeder for the StreamingOutputMultiplexer : all the controls are received from a single streaming socket.
+
+    The feeder first grants a few credits to the multiplexer, then grants a new one each time it applied a batch.
+    The axes of a batch are staged into a single report, but each edge (button or hat) is sent in its own report."""
+    __CREDITS__ = 4  # Max number of batches in flight
+
+    def __init__(self, virtual_joystick, device):
+        super().__init__(virtual_joystick, device)
+
+        self._socket = self._ctx.socket(zmq.DEALER)
+        self._socket.set(zmq.IDENTITY, VirtualDeviceSnapshot.mk_topic(device))
+        self._socket.connect(self._events_endpoint)
+
+    def loop(self):
+        if self._socket.poll(self._scheduler.timeout()):
+            for (identity, value) in VirtualControlEventBatch.recv_values(self._socket, raw_axes=True):
+                if self._stage(identity, value):
+                    self._flush()  # One report per edge, so that a press and release are never collapsed
+            OutputCredits(credits=1).send(self._socket)
+        self._flush()
+
+    def run(self):
+        OutputCredits(credits=self.__CREDITS__).send(self._socket)
+        super().run()
+
+
+class VirtualJoystick(threading.Thread):
     @classmethod
-    def device_capabilities(cls, device_id=None):
+    def device_capabilities(cls, device_id=None, backend='vjoy'):
+        output_device_cls = output_device_class(backend)
         if device_id is None:
-            return [cls.device_capabilities(i) for i in range(vjoy_device.VJoyDevice.nb_devices())]
+            return [cls.device_capabilities(i, backend) for i in range(output_device_cls.nb_devices())]
 
         return {'device_id': device_id,
-                'max_nb_axes': cls.__MAX_NB_AXES__,
-                'max_nb_buttons': cls.__MAX_NB_BUTTONS__,
-                'max_nb_hats': cls.__MAX_NB_HATS__}
+                'max_nb_axes': output_device_cls.__MAX_NB_AXES__,
+                'max_nb_buttons': output_device_cls.__MAX_NB_BUTTONS__,
+                'max_nb_hats': output_device_cls.__MAX_NB_HATS__}
 
-    def __init__(self, device, context, events_endpoint):
+    def __init__(self, device, context, events_endpoint, streaming=False, output_rate=None, backend='vjoy'):
         super().__init__(name="/virtual_joysticks/{}".format(device.id))
         self._ctx = context
         self._events_endpoint = events_endpoint
+        self._output_rate = output_rate  # Max rate (in Hz) of the reports sent to the driver, None for unlimited
         self._device = device
-        self._output_device = vjoy_device.VJoyDevice(device_id=device.id)
-        self._feeders = self._make_feeders()
+        self._output_device = output_device_class(backend)(device_id=device.id)
+        feeder_cls = StreamingFeeder if streaming else LockstepFeeder
+        self._feeder = feeder_cls(virtual_joystick=self, device=device)
 
     @property
     def ctx(self):
@@ -96,14 +194,18 @@ class VirtualJoystick(threading.Thread):
     def output_device(self):
         return self._output_device
 
-    def _make_feeders(self):
-        feeders = [AxisFeeder(virtual_joystick=self, control=axis) for axis in self._device.axes.values()]
-        feeders += [ButtonFeeder(virtual_joystick=self, control=button) for button in self._device.buttons.values()]
-        feeders += [HatFeeder(virtual_joystick=self, control=hat) for hat in self._device.hats.values()]
-        return feeders
+    @property
+    def output_rate(self):
+        return self._output_rate
+
+    @property
+    def stats(self):
+        return self._feeder.stats
 
     def run(self):
-        for feeder in self._feeders:
-            feeder.start()
-        for feeder in self._feeders:
-            feeder.join()
+        # The output device is only closed once its feeder is done with it
+        try:
+            self._feeder.start()
+            self._feeder.join()
+        finally:
+            self._output_device.close()
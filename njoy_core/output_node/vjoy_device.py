@@ -21,6 +21,29 @@ class VJoyDevice(pyvjoy.VJoyDevice):
         WHEEL = 8
         POV = 9
 
+    # TODO: find a way to get the current vjoy configuration for each device
+    __MAX_NB_AXES__ = 8
+    __MAX_NB_BUTTONS__ = 128
+    __MAX_NB_HATS__ = 4
+
+    # Fields of the position report (pyvjoy's _JOYSTICK_POSITION_V2), indexed by axis, button group and pov ids
+    __REPORT_AXES__ = ['wAxisX', 'wAxisY', 'wAxisZ',
+                       'wAxisXRot', 'wAxisYRot', 'wAxisZRot',
+                       'wSlider', 'wDial',
+                       'wWheel']
+    __REPORT_BUTTONS__ = ['lButtons', 'lButtonsEx1', 'lButtonsEx2', 'lButtonsEx3']  # 32 buttons each
+    __REPORT_POVS__ = ['bHats', 'bHatsEx1', 'bHatsEx2', 'bHatsEx3']
+
+    __VJOY_AXIS_IDS__ = (pyvjoy.HID_USAGE_X, pyvjoy.HID_USAGE_Y, pyvjoy.HID_USAGE_Z,
+                         pyvjoy.HID_USAGE_RX, pyvjoy.HID_USAGE_RY, pyvjoy.HID_USAGE_RZ,
+                         pyvjoy.HID_USAGE_SL0, pyvjoy.HID_USAGE_SL1,
+                         pyvjoy.HID_USAGE_WHL,
+                         pyvjoy.HID_USAGE_POV)
+
+    # Raw int16 axis value (offset by 0x8000) => vjoy axis value, consistent with the conversion of the float values
+    __VJOY_AXIS_VALUES__ = tuple(math.floor(1 + (0x7FFF * (1 + max(v / 0x7FFF, -1.0))) / 2)
+                                 for v in range(-0x8000, 0x8000))
+
     @classmethod
     def nb_devices(cls):
         # TODO: find a way to ask vjoy how many devices are configured
@@ -30,15 +53,31 @@ class VJoyDevice(pyvjoy.VJoyDevice):
         """device_id is 0-based, internally converted to vjoy 1-based index."""
         super().__init__(1 + device_id)
         self.reset()
+        self._reset_report()
+
+    def close(self):
+        """Releases all the controls : vjoy devices are persistent, so they would otherwise keep their last state."""
+        self.reset()
+
+    def _reset_report(self):
+        """Initializes the reused position report : centered axes, released buttons and povs."""
+        for field in self.__REPORT_AXES__:
+            setattr(self.data, field, self._to_vjoy_axis_value(0.0))
+        for field in self.__REPORT_BUTTONS__:
+            setattr(self.data, field, 0)
+        for field in self.__REPORT_POVS__:
+            setattr(self.data, field, 0xFFFFFFFF)  # -1 as a DWORD : none (not pressed)
+        self._buttons = [0] * len(self.__REPORT_BUTTONS__)  # Unsigned masks of each button group
 
-    @staticmethod
-    def _to_vjoy_axis_id(value):
-        mapping = [pyvjoy.HID_USAGE_X, pyvjoy.HID_USAGE_Y, pyvjoy.HID_USAGE_Z,
-                   pyvjoy.HID_USAGE_RX, pyvjoy.HID_USAGE_RY, pyvjoy.HID_USAGE_RZ,
-                   pyvjoy.HID_USAGE_SL0, pyvjoy.HID_USAGE_SL1,
-                   pyvjoy.HID_USAGE_WHL,
-                   pyvjoy.HID_USAGE_POV]
-        return mapping[value]
+    @classmethod
+    def _to_vjoy_axis_id(cls, value):
+        return cls.__VJOY_AXIS_IDS__[value]
+
+    @classmethod
+    def _to_vjoy_axis_value(cls, axis_value):
+        if isinstance(axis_value, int):
+            return cls.__VJOY_AXIS_VALUES__[axis_value + 0x8000]
+        return math.floor(1 + (0x7FFF * (1 + axis_value)) / 2)
 
     def set_button(self, button_id, state, delay=None):  # pylint: disable=arguments-differ
         """Set a given button to On (1 or True) or Off (0 or False)
@@ -59,12 +98,36 @@ class VJoyDevice(pyvjoy.VJoyDevice):
     def set_axis(self, axis_id, axis_value):  # pylint: disable=arguments-differ
         """Set a given axis to the given value.
         axis_id is 0-based [0..9], internally converted to vjoy axis ID
-        axis_value is a float in range [-1.0 .. 1.0], internally converted to vjoy int range [0X0001..0x8000]"""
-        return super().set_axis(self._to_vjoy_axis_id(axis_id),
-                                math.floor(1 + (0x7FFF * (1 + axis_value)) / 2))
+        axis_value is a float in range [-1.0 .. 1.0], or a raw int16 value, internally converted to vjoy int range
+        [0X0001..0x8000]"""
+        return super().set_axis(self._to_vjoy_axis_id(axis_id), self._to_vjoy_axis_value(axis_value))
 
     def set_cont_pov(self, pov_id, pov_value):  # pylint: disable=arguments-differ
         """Set a given POV (numbered from 0) to a continuous direction :
         pov_id is 0-based, internally converted to vjoy 1-based pov ID
         pov_value is :an int in range [0 .. 35900] (tenth of degrees) or -1 for none (not pressed)"""
         return super().set_cont_pov(1 + pov_id, pov_value)
+
+    def report_axis(self, axis_id, axis_value):
+        """Same as set_axis, but only updates the position report : it is sent by the next call to send_report.
+        Only the axes X to WHEEL can be reported."""
+        setattr(self.data, self.__REPORT_AXES__[axis_id], self._to_vjoy_axis_value(axis_value))
+
+    def report_button(self, button_id, state):
+        """Same as set_button, but only updates the position report : it is sent by the next call to send_report."""
+        (group, bit) = divmod(button_id, 32)
+        if state:
+            self._buttons[group] |= 1 << bit
+        else:
+            self._buttons[group] &= ~(1 << bit)
+        # The button groups are signed LONGs
+        mask = self._buttons[group]
+        setattr(self.data, self.__REPORT_BUTTONS__[group], mask - (1 << 32) if mask & 0x80000000 else mask)
+
+    def report_cont_pov(self, pov_id, pov_value):
+        """Same as set_cont_pov, but only updates the position report : it is sent by the next call to send_report."""
+        setattr(self.data, self.__REPORT_POVS__[pov_id], pov_value & 0xFFFFFFFF)
+
+    def send_report(self):
+        """Sends the whole position report to the driver, in a single call."""
+        return self.update()
@@ -1,16 +1,48 @@
 # pylint: skip-file
 import collections
+import pytest
 import njoy_core.core.model
 
-collect_ignore = ["njoy_core/input_node/test_hid_event_loop.py"]
-
 
 def pytest_runtest_setup(item):
     if "ensure_clean_input_node_cache" in item.keywords:
         njoy_core.core.model.InputNode.__NODES__ = collections.defaultdict(list)
+        njoy_core.core.model.PhysicalControlEvent.clear_lookup_table()
     if "ensure_clean_output_node_cache" in item.keywords:
         njoy_core.core.model.OutputNode.__NODES__ = collections.defaultdict(list)
+        njoy_core.core.model.VirtualControlEvent.clear_lookup_table()
     if "ensure_clean_physical_device_cache" in item.keywords:
         njoy_core.core.model.PhysicalDevice.__ALIAS_INDEX__ = dict()
         njoy_core.core.model.PhysicalDevice.__NAME_INDEX__ = collections.defaultdict(list)
         njoy_core.core.model.PhysicalDevice.__GUID_INDEX__ = dict()
+
+
+class Clock:
+    """Fake clock, only moving forward when told to."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LoopbackSocket:
+    """Fake socket, whose recv_multipart returns the last frames sent."""
+    def __init__(self):
+        self.frames = None
+
+    def send_multipart(self, frames):
+        self.frames = frames
+
+    def recv_multipart(self, copy=True):
+        return self.frames
+
+
+@pytest.fixture(scope="function")
+def clock():
+    return Clock()
+
+
+@pytest.fixture(scope="function")
+def loopback_socket():
+    return LoopbackSocket()
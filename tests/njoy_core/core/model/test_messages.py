@@ -4,8 +4,11 @@ import pytest
 from njoy_core.core.model import InputNode, OutputNode
 from njoy_core.core.model import PhysicalDevice, VirtualDevice
 from njoy_core.core.model import Axis, Button, Hat
-from njoy_core.core.model import ControlEvent
-from njoy_core.core.model import MessageIdentityError
+from njoy_core.core.model import HatState, AxisEncoding, ControlEvent, PhysicalControlEvent, PhysicalControlEventBatch
+from njoy_core.core.model import PhysicalDeviceSnapshot, OutputCredits
+from njoy_core.core.model import CoreRequest, InputNodeRegisterRequest, InputNodeRegisterReply
+from njoy_core.core.model import OutputNodeCapabilities, OutputNodeAssignments
+from njoy_core.core.model import MessageError, MessageIdentityError, MessageProtocolVersionError
 
 
 @pytest.fixture(scope="module",
@@ -38,3 +41,262 @@ class TestControlEvent:
     def test_case_2_mk_identity(self, unassigned_control):
         with pytest.raises(MessageIdentityError):
             _ = ControlEvent.mk_identity(unassigned_control)
+
+
+@pytest.fixture(scope="function")
+def physical_controls():
+    node = InputNode()
+    device = PhysicalDevice(alias='batch', name='batch')
+    node.append(device)
+    return {'axis': Axis(dev=device),
+            'button': Button(dev=device),
+            'hat': Hat(dev=device)}
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestControlEventBatch:
+    def test_case_1(self, physical_controls):
+        """A batch packs all its events into a single frame, and is decoded back into the same events."""
+        batch = PhysicalControlEventBatch(events=[
+            PhysicalControlEvent(control=physical_controls['axis'], value=0.5),
+            PhysicalControlEvent(control=physical_controls['button'], value=True),
+            PhysicalControlEvent(control=physical_controls['hat'], value=HatState.HAT_UP_LEFT)])
+        frames = [PhysicalControlEventBatch.__MARKER__, b'', batch._serialize_entries()]
+        assert PhysicalControlEventBatch.is_batch(frames)
+        assert PhysicalControlEventBatch(events=PhysicalControlEventBatch._deserialize(frames)) == batch
+
+    def test_case_2(self, physical_controls):
+        """Splitting a batch gives back the frames of the equivalent single events."""
+        events = [PhysicalControlEvent(control=physical_controls['axis'], value=-0.25),
+                  PhysicalControlEvent(control=physical_controls['button'], value=False)]
+        frames = [PhysicalControlEventBatch.__MARKER__, b'',
+                  PhysicalControlEventBatch(events=events)._serialize_entries()]
+        assert PhysicalControlEventBatch.split(frames) == [e._serialize_control() + [e._serialize_value()]
+                                                           for e in events]
+
+    def test_case_3(self, physical_controls):
+        """A single event is accepted as a batch of one."""
+        event = PhysicalControlEvent(control=physical_controls['hat'], value=HatState.HAT_DOWN)
+        frames = event._serialize_control() + [event._serialize_value()]
+        assert not PhysicalControlEventBatch.is_batch(frames)
+        assert PhysicalControlEventBatch.split(frames) == [frames]
+        assert PhysicalControlEventBatch._deserialize(frames) == [event]
+
+    def test_case_4(self, physical_controls):
+        """A truncated batch is rejected."""
+        batch = PhysicalControlEventBatch(events=[PhysicalControlEvent(control=physical_controls['axis'], value=0.5)])
+        frames = [PhysicalControlEventBatch.__MARKER__, b'', batch._serialize_entries()[:-1]]
+        with pytest.raises(MessageError):
+            _ = PhysicalControlEventBatch.split(frames)
+
+    def test_case_5(self, physical_controls, loopback_socket):
+        """Pre-serialized entries, packed with the value packers, are sent as the equivalent batch."""
+        values = [('axis', -0x4000, AxisEncoding.INT16), ('button', True, None), ('hat', HatState.HAT_UP_LEFT, None)]
+        entries = [(PhysicalControlEvent.mk_identity(physical_controls[ctrl]),
+                    PhysicalControlEvent.mk_value_packer(physical_controls[ctrl], encoding)(value))
+                   for (ctrl, value, encoding) in values]
+        PhysicalControlEventBatch.send_entries(loopback_socket, entries)
+
+        batch = PhysicalControlEventBatch(events=[
+            PhysicalControlEvent(control=physical_controls['axis'], value=-0x4000, axis_encoding=AxisEncoding.INT16),
+            PhysicalControlEvent(control=physical_controls['button'], value=True),
+            PhysicalControlEvent(control=physical_controls['hat'], value=HatState.HAT_UP_LEFT)])
+        assert loopback_socket.frames == [PhysicalControlEventBatch.__MARKER__, b'', batch._serialize_entries()]
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestLookupTable:
+    def test_case_1(self, physical_controls):
+        """The identities are stored on the controls while the lookup table is frozen, and computed again after."""
+        control = physical_controls['button']
+        PhysicalControlEvent.freeze_lookup_table()
+        identity = PhysicalControlEvent.mk_identity(control)
+        assert control.identity is identity
+        assert PhysicalControlEvent.mk_identity(control) is identity
+
+        PhysicalControlEvent.clear_lookup_table()
+        assert control.identity is None
+        control.id += 1
+        assert PhysicalControlEvent.mk_identity(control) != identity
+        control.id -= 1
+
+    def test_case_2(self, physical_controls):
+        """Once frozen, the lookup table maps each identity straight to its control."""
+        PhysicalControlEvent.freeze_lookup_table()
+        table = PhysicalControlEvent.__CONTROL_TABLE__
+        assert len(table) == 0x10000
+        for control in physical_controls.values():
+            identity = PhysicalControlEvent.mk_identity(control)
+            assert table[int.from_bytes(identity, 'big')] is control
+            assert PhysicalControlEvent._deserialize_control(identity) is control
+        assert len([c for c in table if c is not None]) == len(physical_controls)
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestRecvInto:
+    def test_case_1(self, physical_controls, loopback_socket):
+        """The event is decoded in place, into the given event instance."""
+        event = PhysicalControlEvent()
+        for (ctrl, value) in [('axis', 0.5), ('button', True), ('hat', HatState.HAT_LEFT)]:
+            PhysicalControlEvent(control=physical_controls[ctrl], value=value).send(loopback_socket)
+            assert PhysicalControlEvent.recv_into(loopback_socket, event) is event
+            assert event.control is physical_controls[ctrl]
+            assert event.value == value
+
+    @pytest.mark.parametrize("value,expected", [(0.5, 0.5), (-1.0, -1.0), (1.0, 1.0), (-0x8000, -1.0), (0x7FFF, 1.0)])
+    def test_case_3(self, physical_controls, value, expected, loopback_socket):
+        """With the int16 encoding, the axis values are sent as fixed-point values, raw int values as is."""
+        event = PhysicalControlEvent()
+        PhysicalControlEvent(control=physical_controls['axis'],
+                             value=value,
+                             axis_encoding=AxisEncoding.INT16).send(loopback_socket)
+        assert len(loopback_socket.frames[2]) == 2
+        PhysicalControlEvent.recv_into(loopback_socket, event)
+        assert event.value == pytest.approx(expected, abs=1 / 0x7FFF)
+        assert event.axis_encoding == AxisEncoding.INT16
+
+    def test_case_2(self, physical_controls, loopback_socket):
+        """The values of a batch are written straight into the state, ignoring the controls it doesn't hold."""
+        state = {physical_controls['axis']: 0.0, physical_controls['button']: True}
+        PhysicalControlEventBatch(events=[
+            PhysicalControlEvent(control=physical_controls['axis'], value=0.5),
+            PhysicalControlEvent(control=physical_controls['button'], value=True),
+            PhysicalControlEvent(control=physical_controls['hat'], value=HatState.HAT_UP)]).send(loopback_socket)
+        assert PhysicalControlEventBatch.recv_into(loopback_socket, state) == 1
+        assert state == {physical_controls['axis']: 0.5, physical_controls['button']: True}
+
+    def test_case_4(self, physical_controls, loopback_socket):
+        """The int16 axis values can be kept raw, and are converted back to floats where needed."""
+        state = {physical_controls['axis']: None}
+        PhysicalControlEventBatch(events=[PhysicalControlEvent(control=physical_controls['axis'],
+                                                               value=-0x4000,
+                                                               axis_encoding=AxisEncoding.INT16)]).send(loopback_socket)
+        PhysicalControlEventBatch.recv_into(loopback_socket, state, raw_axes=True)
+        assert state[physical_controls['axis']] == -0x4000
+        assert ControlEvent.axis_to_float(-0x4000) == pytest.approx(-0.5, abs=1 / 0x7FFF)
+
+        # A raw value is converted when sent with the float64 encoding
+        PhysicalControlEvent(control=physical_controls['axis'], value=-0x4000).send(loopback_socket)
+        assert PhysicalControlEvent.recv(loopback_socket).value == pytest.approx(-0.5, abs=1 / 0x7FFF)
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestDeviceSnapshot:
+    @pytest.mark.parametrize("axis_encoding", [AxisEncoding.FLOAT64, AxisEncoding.INT16])
+    def test_case_1(self, physical_controls, axis_encoding, loopback_socket):
+        """A snapshot carries the whole state of a device in a single message."""
+        device = physical_controls['axis'].dev
+        buttons = [Button(dev=device, ctrl=i) for i in [1, 63, 127]]
+        hats = [Hat(dev=device, ctrl=i) for i in [1, 3]]
+
+        PhysicalDeviceSnapshot(device=device,
+                               axes={0: 0.5},
+                               buttons={0: True, 1: False, 63: True, 127: True},
+                               hats={0: HatState.HAT_UP, 1: HatState.HAT_DOWN_LEFT, 3: HatState.HAT_RIGHT},
+                               axis_encoding=axis_encoding).send(loopback_socket)
+        assert PhysicalDeviceSnapshot.is_snapshot(loopback_socket.frames)
+        assert not PhysicalControlEventBatch.is_batch(loopback_socket.frames)
+
+        snapshot = PhysicalDeviceSnapshot.recv(loopback_socket)
+        state = dict(snapshot.items())
+        assert state[physical_controls['axis']] == pytest.approx(0.5, abs=1 / 0x7FFF)
+        assert [state[b] for b in [physical_controls['button']] + buttons] == [True, False, True, True]
+        assert [state[h] for h in [physical_controls['hat']] + hats] == [HatState.HAT_UP,
+                                                                         HatState.HAT_DOWN_LEFT,
+                                                                         HatState.HAT_RIGHT]
+
+    def test_case_2(self, physical_controls):
+        """The topic of a snapshot never matches the identity of a control."""
+        device = physical_controls['axis'].dev
+        topic = PhysicalDeviceSnapshot.mk_topic(device)
+        for control in [Axis(dev=device, ctrl=7), Button(dev=device, ctrl=127), Hat(dev=device, ctrl=3)]:
+            assert not topic.startswith(ControlEvent.mk_identity(control))
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_output_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestCoreRequest:
+    def test_case_1(self, loopback_socket):
+        """The available devices of an input node are sent as (guid, name) couples"""
+        available_devices = [(b'\x03\x00\x4f', 'Throttle'), (b'\x03\x01', 'Joystick')]
+        InputNodeRegisterRequest(available_devices=available_devices).send(loopback_socket)
+        request = CoreRequest.recv(loopback_socket)
+        assert isinstance(request, InputNodeRegisterRequest)
+        assert request.available_devices == available_devices
+
+    def test_case_2(self, loopback_socket):
+        """The capabilities of an output node are sent as a list of dicts"""
+        capabilities = [{'device_id': i, 'max_nb_axes': 8, 'max_nb_buttons': 128, 'max_nb_hats': 4} for i in range(2)]
+        OutputNodeCapabilities(capabilities=capabilities).send(loopback_socket)
+        request = CoreRequest.recv(loopback_socket)
+        assert isinstance(request, OutputNodeCapabilities)
+        assert request.capabilities == capabilities
+
+    def test_case_3(self, loopback_socket):
+        """Only the ids of the node, devices and controls are sent, the received node isn't registered anywhere"""
+        node = InputNode()
+        device = PhysicalDevice(alias='thr', name='Throttle', guid=b'\x03\x00')
+        node.append(device)
+        axis = Axis(dev=device)
+        button = Button(dev=device, ctrl=21)
+
+        InputNodeRegisterReply(node=node).send(loopback_socket)
+        reply = CoreRequest.recv(loopback_socket)
+        assert isinstance(reply, InputNodeRegisterReply)
+        assert InputNode.registered_nodes() == [node]
+
+        assert reply.node is not node
+        assert reply.node.id == node.id
+        assert len(reply.node) == 1
+        assert reply.node[0].guid == b'\x03\x00'
+        assert reply.node[0].name == 'Throttle'
+        assert list(reply.node[0].axes.keys()) == [axis.id]
+        assert list(reply.node[0].buttons.keys()) == [21]
+        assert reply.node[0].hats == dict()
+        assert ControlEvent.mk_identity(reply.node[0].buttons[21]) == ControlEvent.mk_identity(button)
+
+    def test_case_4(self, loopback_socket):
+        """The processors of the virtual controls are never sent"""
+        node = OutputNode()
+        device = VirtualDevice(node=node)
+        hat = Hat(dev=device, processor=lambda s: s, inputs=[Hat()])
+
+        OutputNodeAssignments(node=node).send(loopback_socket)
+        reply = CoreRequest.recv(loopback_socket)
+        assert isinstance(reply, OutputNodeAssignments)
+        assert reply.node[0].hats[0].processor is None
+        assert reply.node[0].hats[0].input_controls is None
+        assert ControlEvent.mk_identity(reply.node[0].hats[0]) == ControlEvent.mk_identity(hat)
+
+    def test_case_5(self, loopback_socket):
+        """The axis encodings are negotiated during the handshake"""
+        InputNodeRegisterRequest(available_devices=[],
+                                 axis_encodings=[AxisEncoding.INT16, AxisEncoding.FLOAT64]).send(loopback_socket)
+        assert CoreRequest.recv(loopback_socket).axis_encodings == [AxisEncoding.INT16, AxisEncoding.FLOAT64]
+
+        OutputNodeAssignments(node=OutputNode(), axis_encoding=AxisEncoding.INT16).send(loopback_socket)
+        assert CoreRequest.recv(loopback_socket).axis_encoding == AxisEncoding.INT16
+
+    def test_case_6(self, loopback_socket):
+        """Both sides must speak the same version of the protocol"""
+        OutputNodeCapabilities(capabilities=[]).send(loopback_socket)
+        loopback_socket.frames[1] = b'\xFF'
+        with pytest.raises(MessageProtocolVersionError):
+            _ = CoreRequest.recv(loopback_socket)
+
+
+class TestOutputCredits:
+    def test_case_1(self, loopback_socket):
+        """The credits survive a round trip, and can't be mistaken for another message."""
+        OutputCredits(credits=4).send(loopback_socket)
+        assert OutputCredits.recv(loopback_socket) == OutputCredits(credits=4)
+        assert not PhysicalControlEventBatch.is_batch(loopback_socket.frames)
+
+        loopback_socket.frames = [PhysicalControlEventBatch.__MARKER__, b'', b'']
+        with pytest.raises(MessageError):
+            OutputCredits.recv(loopback_socket)
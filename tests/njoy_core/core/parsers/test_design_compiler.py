@@ -0,0 +1,87 @@
+# pylint: skip-file
+import unittest.mock as mock
+import pytest
+
+from njoy_core.core.parsers.design_compiler import compile_design
+from njoy_core.core.parsers.design_compiler import DesignCompilerError
+from njoy_core.core.model import InputNode, OutputNode
+from njoy_core.core.model import PhysicalDevice, VirtualDevice
+from njoy_core.core.model import Axis, Button
+from njoy_core.core.toolbox.essential_toolbox import EssentialToolbox
+
+
+@pytest.fixture(scope="function")
+def buttons():
+    node = InputNode()
+    device = PhysicalDevice(alias='c', name='c')
+    node.append(device)
+    return [Button(dev=device), Button(dev=device)]
+
+
+@pytest.fixture(scope="function")
+def virtual_device():
+    return VirtualDevice(node=OutputNode())
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_output_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestCompileDesign:
+    def test_case_1(self, buttons, virtual_device):
+        """Passthroughs are short-circuited, and the common sub-expressions are only evaluated once."""
+        not_any = mock.Mock(wraps=EssentialToolbox.not_any)
+        virtual_controls = [Button(dev=virtual_device, processor=EssentialToolbox.passthrough, inputs=[buttons[0]]),
+                            Button(dev=virtual_device, processor=not_any, inputs=[buttons[0], buttons[1]]),
+                            Button(dev=virtual_device,
+                                   processor=EssentialToolbox.not_,
+                                   inputs=[Button(processor=not_any, inputs=[buttons[0], buttons[1]])])]
+        evaluators = compile_design(virtual_controls)
+        assert len(evaluators) == 1
+        assert evaluators[0].input_controls == buttons
+
+        state = {buttons[0]: False, buttons[1]: False}
+        assert evaluators[0].evaluate(state) == [(virtual_controls[0], False),
+                                                 (virtual_controls[1], True),
+                                                 (virtual_controls[2], False)]
+        assert not_any.call_count == 1
+
+    def test_case_2(self, buttons, virtual_device):
+        """Only the outputs depending on the changed controls are evaluated, once all their inputs have a value."""
+        virtual_controls = [Button(dev=virtual_device, processor=EssentialToolbox.passthrough, inputs=[buttons[0]]),
+                            Button(dev=virtual_device, processor=EssentialToolbox.not_, inputs=[buttons[1]])]
+        evaluator = compile_design(virtual_controls)[0]
+
+        assert evaluator.evaluate({buttons[0]: True, buttons[1]: None}) == [(virtual_controls[0], True)]
+        assert evaluator.evaluate({buttons[0]: True, buttons[1]: True}, [buttons[1]]) == [(virtual_controls[1], False)]
+
+    def test_case_3(self, buttons, virtual_device):
+        """The processors without any input, or whose inputs are all constants, are folded at compile time."""
+        constant = mock.Mock(return_value=True)
+        virtual_controls = [Button(dev=virtual_device,
+                                   processor=EssentialToolbox.not_,
+                                   inputs=[Button(processor=constant, inputs=[])])]
+        evaluator = compile_design(virtual_controls)[0]
+        assert constant.call_count == 1
+        assert evaluator.input_controls == []
+        # The constants are only output by a full evaluation, since they don't depend on any change
+        assert evaluator.evaluate({}) == [(virtual_controls[0], False)]
+        assert evaluator.evaluate({}, []) == []
+
+    def test_case_4(self, virtual_device):
+        """A virtual control must have a processor."""
+        with pytest.raises(DesignCompilerError):
+            compile_design([Button(dev=virtual_device)])
+
+    def test_case_5(self, virtual_device):
+        """The raw int16 axis values are forwarded as is by the passthroughs, and converted for the processors."""
+        node = InputNode()
+        device = PhysicalDevice(alias='a', name='a')
+        node.append(device)
+        axis = Axis(dev=device)
+        virtual_controls = [Axis(dev=virtual_device, processor=EssentialToolbox.passthrough, inputs=[axis]),
+                            Axis(dev=virtual_device, processor=lambda states: -list(states.values())[0], inputs=[axis])]
+        evaluator = compile_design(virtual_controls)[0]
+
+        ((_, passthrough), (_, inverted)) = evaluator.evaluate({axis: 0x7FFF})
+        assert passthrough == 0x7FFF
+        assert inverted == -1.0
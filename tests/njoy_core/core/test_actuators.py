@@ -74,3 +74,64 @@ class TestActuatorLoop:
             actuator.loop()
         actuator._socket.send_multipart.assert_called_with([VirtualControlEvent(value=0.1)._serialize_value()])
 
+    def test_case_2(self, mocker, context):
+        """The input states can be read from a state store shared by the Actuators."""
+        node = InputNode()
+        device = PhysicalDevice(alias='a', name='n')
+        node.append(device)
+        button = Button(dev=device)
+
+        node = OutputNode()
+        device = VirtualDevice(node=node)
+        node.append(device)
+        virtual_button = Button(dev=device,
+                                processor=EssentialToolbox.passthrough,
+                                inputs=[button])
+
+        state_store = mock.Mock()
+        state_store.wait_state.return_value = (3, {button: True})
+        actuator = Actuator(context=context,
+                            input_endpoint='inproc://input',
+                            output_endpoint='inproc://output',
+                            virtual_control=virtual_button,
+                            state_store=state_store)
+        assert actuator._input_buffer is None
+        mocker.patch.object(actuator._socket, 'send_multipart', autospec=True)
+        mocker.patch.object(actuator._socket, 'recv_multipart', autospec=True)
+        actuator._socket.recv_multipart.return_value = [VirtualControlEvent(value=None)._serialize_value()]
+        actuator.loop()
+        state_store.wait_state.assert_called_with([button], 0)
+        assert actuator._state_version == 3
+        actuator._socket.send_multipart.assert_called_with([VirtualControlEvent(value=True)._serialize_value()])
+
+    def test_case_3(self, mocker, context):
+        """The outputs which wouldn't change the last emitted value are suppressed."""
+        node = InputNode()
+        device = PhysicalDevice(alias='a', name='n')
+        node.append(device)
+        buttons = [Button(dev=device), Button(dev=device)]
+
+        node = OutputNode()
+        device = VirtualDevice(node=node)
+        node.append(device)
+        virtual_button = Button(dev=device,
+                                processor=EssentialToolbox.not_any,
+                                inputs=buttons)
+
+        state_store = mock.Mock()
+        actuator = Actuator(context=context,
+                            input_endpoint='inproc://input',
+                            output_endpoint='inproc://output',
+                            virtual_control=virtual_button,
+                            state_store=state_store)
+        mocker.patch.object(actuator._socket, 'send_multipart', autospec=True)
+        mocker.patch.object(actuator._socket, 'recv_multipart', autospec=True)
+        actuator._socket.recv_multipart.return_value = [VirtualControlEvent(value=None)._serialize_value()]
+
+        for (version, state) in enumerate([[True, False], [False, True], [True, True], [False, False]], start=1):
+            state_store.wait_state.return_value = (version, dict(zip(buttons, state)))
+            actuator.loop()
+        assert actuator._socket.send_multipart.call_args_list == [
+            mock.call([VirtualControlEvent(value=False)._serialize_value()]),
+            mock.call([VirtualControlEvent(value=True)._serialize_value()])]
+        assert actuator.suppressed_events == 2
@@ -0,0 +1,41 @@
+# pylint: skip-file
+import pytest
+
+from njoy_core.core.control_state import ControlState
+from njoy_core.core.model import Axis, Button
+
+
+@pytest.fixture(scope="module")
+def controls():
+    return [Axis(), Button(), Button()]
+
+
+class TestControlState:
+    def test_case_1(self, controls):
+        """The state is a mapping of the given controls, which can't be extended."""
+        state = ControlState(controls + [controls[0]])
+        assert len(state) == 3
+        assert list(state) == controls
+        assert list(state.values()) == [None, None, None]
+
+        state[controls[1]] = True
+        assert state[controls[1]] is True
+        assert controls[1] in state
+        assert Button() not in state
+        with pytest.raises(KeyError):
+            state[Button()] = True
+        with pytest.raises(TypeError):
+            del state[controls[1]]
+
+    def test_case_2(self, controls):
+        """The snapshots are read-only views, which are not affected by the later writes."""
+        state = ControlState(controls)
+        state[controls[0]] = 0.1
+        snapshot = state.snapshot()
+
+        state[controls[0]] = 0.2
+        state[controls[2]] = False
+        assert snapshot == {controls[0]: 0.1, controls[1]: None, controls[2]: None}
+        assert state == {controls[0]: 0.2, controls[1]: None, controls[2]: False}
+        with pytest.raises(TypeError):
+            snapshot[controls[0]] = 0.3
@@ -1,4 +1,5 @@
 # pylint: skip-file
+import threading
 import pytest
 import zmq
 
@@ -6,7 +7,7 @@ from njoy_core.core.input_buffer import InputBuffer
 from njoy_core.core.model import InputNode
 from njoy_core.core.model import PhysicalDevice
 from njoy_core.core.model import Axis, Button, Hat, HatState
-from njoy_core.core.model import PhysicalControlEvent
+from njoy_core.core.model import PhysicalControlEvent, PhysicalControlEventBatch, PhysicalDeviceSnapshot
 
 
 @pytest.fixture(scope="module")
@@ -85,6 +86,34 @@ class TestInitialLoop:
             assert expected[k] == v
 
 
+def loop_recv_batch(input_buffer, events):
+    batch = PhysicalControlEventBatch(events=[PhysicalControlEvent(control=c, value=v) for (c, v) in events])
+    input_buffer._socket.recv_multipart.return_value = [PhysicalControlEventBatch.__MARKER__, b'',
+                                                        batch._serialize_entries()]
+    input_buffer.loop()
+
+
+@pytest.mark.ensure_clean_physical_device_cache
+class TestInitialSnapshot:
+    def test_case_1(self, mocker, context, controls):
+        """A single snapshot of the device is enough to get a first full set of control values."""
+        input_buffer = InputBuffer(context=context,
+                                   input_endpoint='inproc://input',
+                                   physical_controls=[controls[k] for k in ['axis', 'button', 'hat']])
+        mocker.patch.object(input_buffer._socket, 'recv_multipart', autospec=True)
+
+        snapshot = PhysicalDeviceSnapshot(device=controls['axis'].dev,
+                                          axes={controls['axis'].id: 0.25},
+                                          buttons={controls['button'].id: True},
+                                          hats={controls['hat'].id: HatState.HAT_LEFT})
+        input_buffer._socket.recv_multipart.return_value = [PhysicalDeviceSnapshot.mk_topic(snapshot.device), b'',
+                                                            snapshot._serialize_state()]
+        input_buffer.initial_loop()
+
+        state = input_buffer.state
+        assert state == {controls['axis']: 0.25, controls['button']: True, controls['hat']: HatState.HAT_LEFT}
+
+
 @pytest.mark.ensure_clean_physical_device_cache
 class TestLoop:
     def test_case_1(self, mocker, context, controls):
@@ -130,6 +159,28 @@ class TestLoop:
         assert state[controls[ctrl]] == expected
 
 
+    def test_case_3(self, mocker, context, controls):
+        """A whole batch of events is applied before publishing a single new state."""
+        input_buffer = InputBuffer(context=context,
+                                   input_endpoint='inproc://input',
+                                   physical_controls=[controls[k] for k in ['axis', 'button', 'hat']])
+        mocker.patch.object(input_buffer._socket, 'recv_multipart', autospec=True)
+
+        initial_loop_recv(input_buffer, controls['axis'], 0.1)
+        initial_loop_recv(input_buffer, controls['button'], True)
+        initial_loop_recv(input_buffer, controls['hat'], HatState.HAT_DOWN)
+        assert input_buffer.state is not None
+
+        loop_recv_batch(input_buffer, [(controls['axis'], 0.2),
+                                       (controls['axis'], 0.3),
+                                       (controls['button'], False)])
+        assert len(input_buffer._state_queue) == 1
+        state = input_buffer.state
+        assert state[controls['axis']] == 0.3
+        assert state[controls['button']] is False
+        assert state[controls['hat']] == HatState.HAT_DOWN
+
+
 @pytest.mark.ensure_clean_physical_device_cache
 class TestState:
     @pytest.mark.parametrize("ctrl", ['axis', 'button', 'hat'])
@@ -155,3 +206,26 @@ class TestState:
         initial_loop_recv(input_buffer, controls[ctrl], value)
         assert input_buffer.state is not None
         assert len(input_buffer._state_queue) == 0
+
+    @pytest.mark.parametrize("ctrl", ['axis', 'button', 'hat'])
+    def test_case_3(self, context, controls, ctrl):
+        """Waiting for a state with a timeout returns None if nothing was published in time."""
+        input_buffer = InputBuffer(context=context,
+                                   input_endpoint='inproc://input',
+                                   physical_controls=[controls[ctrl]])
+        assert input_buffer.wait_state(timeout=0.01) is None
+
+    def test_case_4(self, mocker, context, controls):
+        """A consumer waiting for a state is woken up as soon as one is published."""
+        control = controls['button']
+        input_buffer = InputBuffer(context=context,
+                                   input_endpoint='inproc://input',
+                                   physical_controls=[control])
+        mocker.patch.object(input_buffer._socket, 'recv_multipart', autospec=True)
+
+        states = list()
+        consumer = threading.Thread(target=lambda: states.append(input_buffer.wait_state(timeout=5)))
+        consumer.start()
+        initial_loop_recv(input_buffer, control, True)
+        consumer.join()
+        assert states == [{control: True}]
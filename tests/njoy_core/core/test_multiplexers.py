@@ -2,11 +2,12 @@
 import pytest
 import zmq
 
-from njoy_core.core.multiplexers import OutputMultiplexer
-from njoy_core.core.model import OutputNode
-from njoy_core.core.model import VirtualDevice
+from njoy_core.core.multiplexers import InputMultiplexer, OutputMultiplexer, StreamingOutputMultiplexer
+from njoy_core.core.model import InputNode, OutputNode
+from njoy_core.core.model import PhysicalDevice, VirtualDevice
 from njoy_core.core.model import Axis, Button, Hat, HatState
-from njoy_core.core.model import VirtualControlEvent
+from njoy_core.core.model import PhysicalControlEvent, PhysicalControlEventBatch, VirtualControlEvent
+from njoy_core.core.model import VirtualControlEventBatch, VirtualDeviceSnapshot, OutputCredits
 
 
 @pytest.fixture(scope="module")
@@ -36,33 +37,38 @@ def event(request, device):
 
 class TestMultiplexerLoop:
     @staticmethod
-    def actuator_socket(context, event):
+    def endpoint(name, case, event):
+        # Closing a socket is asynchronous, so each case binds its own endpoints
+        return 'inproc://{}/{}/{}'.format(name, case, VirtualControlEvent.mk_identity(event.control).hex())
+
+    @classmethod
+    def actuator_socket(cls, context, event, case):
         socket = context.socket(zmq.DEALER)
         socket.set(zmq.IDENTITY, VirtualControlEvent.mk_identity(event.control))
-        socket.connect('inproc://backend')
+        socket.connect(cls.endpoint('backend', case, event))
         return socket
 
-    @staticmethod
-    def node_socket(context, event):
+    @classmethod
+    def node_socket(cls, context, event, case):
         socket = context.socket(zmq.DEALER)
         socket.set(zmq.IDENTITY, VirtualControlEvent.mk_identity(event.control))
-        socket.connect('inproc://frontend')
+        socket.connect(cls.endpoint('frontend', case, event))
         return socket
 
     def test_case_1(self, context, event):
         """The output node is already waiting for this event, forward it immediately
         Also signal back to the backend that we treated its event
         """
-        actuator_socket = self.actuator_socket(context, event)
-        node_socket = self.node_socket(context, event)
+        actuator_socket = self.actuator_socket(context, event, 1)
+        node_socket = self.node_socket(context, event, 1)
         multiplexer = OutputMultiplexer(context=context,
-                                        frontend='inproc://frontend',
-                                        backend='inproc://backend')
+                                        frontend=self.endpoint('frontend', 1, event),
+                                        backend=self.endpoint('backend', 1, event))
 
         ready = VirtualControlEvent(control=event.control, value=None)
 
         actuator_socket.send_multipart([b'', event._serialize_value()])  # Add an empty frame to mimic a REQ socket
-        multiplexer._queue[ready.control] = ready
+        multiplexer._queue[VirtualControlEvent.mk_identity(event.control)] = ready._serialize_value()
         multiplexer.loop()
 
         msg_parts = node_socket.recv_multipart()
@@ -75,12 +81,15 @@ class TestMultiplexerLoop:
         assert msg_parts[0] == b''
         assert msg_parts[1] == ready._serialize_value()
 
+        for socket in (actuator_socket, node_socket, multiplexer._frontend, multiplexer._backend):
+            socket.close(linger=0)
+
     def test_case_2(self, context, event):
         """The output node is not ready for this event yet, queue it"""
-        actuator_socket = self.actuator_socket(context, event)
+        actuator_socket = self.actuator_socket(context, event, 2)
         multiplexer = OutputMultiplexer(context=context,
-                                        frontend='inproc://frontend',
-                                        backend='inproc://backend')
+                                        frontend=self.endpoint('frontend', 2, event),
+                                        backend=self.endpoint('backend', 2, event))
 
         assert len(multiplexer._queue) == 0
 
@@ -88,23 +97,26 @@ class TestMultiplexerLoop:
         multiplexer.loop()
 
         assert len(multiplexer._queue) == 1
-        assert event.control in multiplexer._queue.keys()
-        assert multiplexer._queue[event.control] == event
+        assert VirtualControlEvent.mk_identity(event.control) in multiplexer._queue.keys()
+        assert multiplexer._queue[VirtualControlEvent.mk_identity(event.control)] == event._serialize_value()
+
+        for socket in (actuator_socket, multiplexer._frontend, multiplexer._backend):
+            socket.close(linger=0)
 
     def test_case_3(self, context, event):
         """The backend has already sent an event for this control, forward it immediately
         Also signal back to the backend that we treated its event
         """
-        actuator_socket = self.actuator_socket(context, event)
-        node_socket = self.node_socket(context, event)
+        actuator_socket = self.actuator_socket(context, event, 3)
+        node_socket = self.node_socket(context, event, 3)
         multiplexer = OutputMultiplexer(context=context,
-                                        frontend='inproc://frontend',
-                                        backend='inproc://backend')
+                                        frontend=self.endpoint('frontend', 3, event),
+                                        backend=self.endpoint('backend', 3, event))
 
         ready = VirtualControlEvent(control=event.control, value=None)
 
         node_socket.send_multipart([b'', ready._serialize_value()])  # Add an empty frame to mimic a REQ socket
-        multiplexer._queue[event.control] = event
+        multiplexer._queue[VirtualControlEvent.mk_identity(event.control)] = event._serialize_value()
         multiplexer.loop()
 
         msg_parts = node_socket.recv_multipart()
@@ -117,12 +129,15 @@ class TestMultiplexerLoop:
         assert msg_parts[0] == b''
         assert msg_parts[1] == ready._serialize_value()
 
+        for socket in (actuator_socket, node_socket, multiplexer._frontend, multiplexer._backend):
+            socket.close(linger=0)
+
     def test_case_4(self, context, event):
         """The backend hasn't sent any event for this control yet, queue the request"""
-        node_socket = self.node_socket(context, event)
+        node_socket = self.node_socket(context, event, 4)
         multiplexer = OutputMultiplexer(context=context,
-                                        frontend='inproc://frontend',
-                                        backend='inproc://backend')
+                                        frontend=self.endpoint('frontend', 4, event),
+                                        backend=self.endpoint('backend', 4, event))
 
         ready = VirtualControlEvent(control=event.control, value=None)
 
@@ -132,5 +147,152 @@ class TestMultiplexerLoop:
         multiplexer.loop()
 
         assert len(multiplexer._queue) == 1
-        assert event.control in multiplexer._queue.keys()
-        assert multiplexer._queue[event.control] == ready
+        assert VirtualControlEvent.mk_identity(event.control) in multiplexer._queue.keys()
+        assert multiplexer._queue[VirtualControlEvent.mk_identity(event.control)] == ready._serialize_value()
+
+        for socket in (node_socket, multiplexer._frontend, multiplexer._backend):
+            socket.close(linger=0)
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestInputMultiplexerLoop:
+    def test_case_1(self, context):
+        """Batches received from the input nodes are split back into single events before being published"""
+        node = InputNode()
+        device = PhysicalDevice(alias='mux', name='mux')
+        node.append(device)
+        events = [PhysicalControlEvent(control=Axis(dev=device), value=0.1),
+                  PhysicalControlEvent(control=Button(dev=device), value=True)]
+
+        multiplexer = InputMultiplexer(context=context,
+                                       frontend='inproc://input_mux_frontend',
+                                       backend='inproc://input_mux_backend')
+        node_socket = context.socket(zmq.PUSH)
+        node_socket.connect('inproc://input_mux_frontend')
+        subscriber = context.socket(zmq.SUB)
+        subscriber.connect('inproc://input_mux_backend')
+        subscriber.subscribe(PhysicalControlEvent.mk_identity(events[1].control))
+
+        PhysicalControlEventBatch(events=events).send(node_socket)
+        multiplexer.loop()
+
+        msg_parts = subscriber.recv_multipart()
+        assert msg_parts == events[1]._serialize_control() + [events[1]._serialize_value()]
+
+        for socket in (node_socket, subscriber, multiplexer._frontend, multiplexer._backend):
+            socket.close(linger=0)
+
+    def test_case_2(self, context):
+        """In conflating mode, only the latest value of an axis is published, but no button edge is dropped"""
+        node = InputNode()
+        device = PhysicalDevice(alias='mux', name='mux')
+        node.append(device)
+        axis = Axis(dev=device)
+        button = Button(dev=device)
+
+        multiplexer = InputMultiplexer(context=context,
+                                       frontend='inproc://conflating_mux_frontend',
+                                       backend='inproc://conflating_mux_backend',
+                                       conflate=True)
+        node_socket = context.socket(zmq.PUSH)
+        node_socket.connect('inproc://conflating_mux_frontend')
+        subscriber = context.socket(zmq.SUB)
+        subscriber.connect('inproc://conflating_mux_backend')
+        subscriber.subscribe(b'')
+
+        PhysicalControlEventBatch(events=[PhysicalControlEvent(control=axis, value=0.1),
+                                          PhysicalControlEvent(control=button, value=True),
+                                          PhysicalControlEvent(control=axis, value=0.2),
+                                          PhysicalControlEvent(control=button, value=False),
+                                          PhysicalControlEvent(control=axis, value=0.3)]).send(node_socket)
+        multiplexer.loop()
+        assert [PhysicalControlEvent.recv(subscriber) for _ in range(2)] == [
+            PhysicalControlEvent(control=axis, value=0.3),
+            PhysicalControlEvent(control=button, value=True)]
+
+        multiplexer.loop()
+        assert PhysicalControlEvent.recv(subscriber) == PhysicalControlEvent(control=button, value=False)
+        assert not multiplexer._pending
+
+        for socket in (node_socket, subscriber, multiplexer._frontend, multiplexer._backend):
+            socket.close(linger=0)
+
+
+@pytest.mark.ensure_clean_output_node_cache
+class TestStreamingOutputMultiplexerLoop:
+    def test_case_1(self, context):
+        """The actuators are acknowledged right away, and only the latest value of each axis is streamed to the
+        output devices, in a single batch per credit"""
+        node = OutputNode()
+        device = VirtualDevice(node=node)
+        node.append(device)
+        (axis, button) = (Axis(dev=device), Button(dev=device))
+
+        multiplexer = StreamingOutputMultiplexer(context=context,
+                                                 frontend='inproc://streaming_mux_frontend',
+                                                 backend='inproc://streaming_mux_backend')
+        actuators = dict()
+        for control in (axis, button):
+            actuators[control] = context.socket(zmq.REQ)
+            actuators[control].set(zmq.IDENTITY, VirtualControlEvent.mk_identity(control))
+            actuators[control].connect('inproc://streaming_mux_backend')
+        feeder = context.socket(zmq.DEALER)
+        feeder.set(zmq.IDENTITY, VirtualDeviceSnapshot.mk_topic(device))
+        feeder.connect('inproc://streaming_mux_frontend')
+
+        for (control, value) in [(axis, 0.1), (button, True), (axis, 0.2)]:
+            VirtualControlEvent(value=value).send(actuators[control])
+            multiplexer.loop()
+            VirtualControlEvent.recv(actuators[control])
+        assert not feeder.poll(10)
+
+        OutputCredits(credits=1).send(feeder)
+        multiplexer.loop()
+        assert VirtualControlEventBatch.recv_values(feeder) == [(VirtualControlEvent.mk_identity(axis), 0.2),
+                                                                (VirtualControlEvent.mk_identity(button), True)]
+
+        VirtualControlEvent(value=False).send(actuators[button])
+        multiplexer.loop()
+        VirtualControlEvent.recv(actuators[button])
+        assert not feeder.poll(10)
+
+        OutputCredits(credits=1).send(feeder)
+        multiplexer.loop()
+        assert VirtualControlEventBatch.recv_values(feeder) == [(VirtualControlEvent.mk_identity(button), False)]
+
+        for socket in list(actuators.values()) + [feeder, multiplexer._frontend, multiplexer._backend]:
+            socket.close(linger=0)
+
+    def test_case_2(self, context):
+        """A press and release without any credit in between are both streamed, in order."""
+        node = OutputNode()
+        device = VirtualDevice(node=node)
+        node.append(device)
+        (axis, button) = (Axis(dev=device), Button(dev=device))
+
+        multiplexer = StreamingOutputMultiplexer(context=context,
+                                                 frontend='inproc://streaming_mux_frontend_edges',
+                                                 backend='inproc://streaming_mux_backend_edges')
+        actuators = dict()
+        for control in (axis, button):
+            actuators[control] = context.socket(zmq.REQ)
+            actuators[control].set(zmq.IDENTITY, VirtualControlEvent.mk_identity(control))
+            actuators[control].connect('inproc://streaming_mux_backend_edges')
+        feeder = context.socket(zmq.DEALER)
+        feeder.set(zmq.IDENTITY, VirtualDeviceSnapshot.mk_topic(device))
+        feeder.connect('inproc://streaming_mux_frontend_edges')
+
+        for (control, value) in [(button, True), (axis, 0.1), (button, False), (axis, 0.2)]:
+            VirtualControlEvent(value=value).send(actuators[control])
+            multiplexer.loop()
+            VirtualControlEvent.recv(actuators[control])
+
+        OutputCredits(credits=1).send(feeder)
+        multiplexer.loop()
+        assert VirtualControlEventBatch.recv_values(feeder) == [(VirtualControlEvent.mk_identity(button), True),
+                                                                (VirtualControlEvent.mk_identity(axis), 0.2),
+                                                                (VirtualControlEvent.mk_identity(button), False)]
+
+        for socket in list(actuators.values()) + [feeder, multiplexer._frontend, multiplexer._backend]:
+            socket.close(linger=0)
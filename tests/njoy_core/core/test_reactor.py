@@ -0,0 +1,212 @@
+# pylint: skip-file
+import pytest
+import zmq
+
+from njoy_core.core.multiplexers import OutputMultiplexer
+from njoy_core.core.reactor import Reactor
+from njoy_core.core.model import InputNode, OutputNode
+from njoy_core.core.model import PhysicalDevice, VirtualDevice
+from njoy_core.core.model import Axis, Button
+from njoy_core.core.model import AxisEncoding, VirtualControlEvent
+from njoy_core.core.toolbox.essential_toolbox import EssentialToolbox
+from njoy_core.output_node.virtual_joystick import VirtualJoystick
+
+
+@pytest.fixture(scope="module")
+def context():
+    return zmq.Context()
+
+
+@pytest.fixture(scope="function")
+def design():
+    node = InputNode()
+    device = PhysicalDevice(alias='r', name='r')
+    node.append(device)
+    buttons = [Button(dev=device), Button(dev=device), Button(dev=device)]
+
+    node = OutputNode()
+    device = VirtualDevice(node=node)
+    return {'buttons': buttons,
+            'virtual_controls': [Button(dev=device,
+                                        processor=EssentialToolbox.passthrough,
+                                        inputs=[buttons[0]]),
+                                 Button(dev=device,
+                                        processor=EssentialToolbox.not_any,
+                                        inputs=[buttons[0], buttons[1]]),
+                                 Button(dev=device,
+                                        processor=EssentialToolbox.passthrough,
+                                        inputs=[buttons[2]])]}
+
+
+def mk_reactor(context, design):
+    return Reactor(context=context,
+                   input_endpoint='inproc://reactor_input',
+                   output_endpoint='inproc://reactor_output',
+                   virtual_controls=design['virtual_controls'])
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_output_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestEvaluate:
+    def test_case_1(self, context, design):
+        """Only the virtual controls depending on the changed physical controls are evaluated."""
+        reactor = mk_reactor(context, design)
+        reactor._state.update({c: False for c in design['buttons']})
+
+        reactor._state[design['buttons'][0]] = True
+        assert reactor._evaluate([design['buttons'][0]]) == [(design['virtual_controls'][0], True),
+                                                            (design['virtual_controls'][1], False)]
+
+    def test_case_2(self, context, design):
+        """A virtual control is only evaluated once all its inputs received a first value."""
+        reactor = mk_reactor(context, design)
+
+        reactor._state[design['buttons'][0]] = True
+        assert reactor._evaluate([design['buttons'][0]]) == [(design['virtual_controls'][0], True)]
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_output_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestEmit:
+    def test_case_1(self, mocker, context, design):
+        """There's at most one output in flight per virtual control, only the latest pending one is sent once
+        acknowledged."""
+        reactor = mk_reactor(context, design)
+        virtual_control = design['virtual_controls'][0]
+        socket = reactor._outputs[virtual_control]
+        mocker.patch.object(socket, 'send_multipart', autospec=True)
+        mocker.patch.object(socket, 'recv_multipart', autospec=True)
+
+        reactor._emit(virtual_control, True)
+        reactor._emit(virtual_control, False)
+        socket.send_multipart.assert_called_once_with([b'', VirtualControlEvent(value=True)._serialize_value()])
+
+        reactor._acknowledge(socket)
+        socket.send_multipart.assert_called_with([b'', VirtualControlEvent(value=False)._serialize_value()])
+        assert socket.send_multipart.call_count == 2
+        assert virtual_control in reactor._in_flight
+        assert not reactor._pending
+
+    def test_case_2(self, mocker, context, design):
+        """The outputs which wouldn't change the last value emitted for a virtual control are suppressed."""
+        reactor = mk_reactor(context, design)
+        virtual_control = design['virtual_controls'][0]
+        socket = reactor._outputs[virtual_control]
+        mocker.patch.object(socket, 'send_multipart', autospec=True)
+        mocker.patch.object(socket, 'recv_multipart', autospec=True)
+
+        reactor._emit(virtual_control, True)
+        reactor._acknowledge(socket)
+        reactor._emit(virtual_control, True)
+        assert socket.send_multipart.call_count == 1
+        assert reactor.suppressed_events == 1
+
+    def test_case_3(self, mocker, context, design):
+        """A pending output is dropped when the virtual control reverts to the value in flight."""
+        reactor = mk_reactor(context, design)
+        virtual_control = design['virtual_controls'][0]
+        socket = reactor._outputs[virtual_control]
+        mocker.patch.object(socket, 'send_multipart', autospec=True)
+        mocker.patch.object(socket, 'recv_multipart', autospec=True)
+
+        reactor._emit(virtual_control, True)
+        reactor._emit(virtual_control, False)
+        reactor._emit(virtual_control, True)
+        assert not reactor._pending
+
+        reactor._acknowledge(socket)
+        socket.send_multipart.assert_called_once_with([b'', VirtualControlEvent(value=True)._serialize_value()])
+        assert virtual_control not in reactor._in_flight
+
+        reactor._emit(virtual_control, True)
+        assert socket.send_multipart.call_count == 1
+        assert reactor.suppressed_events == 2
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_output_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestConstants:
+    def test_case_1(self, context, design):
+        """The virtual controls folded into constants are emitted when the reactor starts."""
+        router = context.socket(zmq.ROUTER)
+        router.bind('inproc://reactor_output_constants')
+        virtual_device = design['virtual_controls'][0].dev
+        constant = Button(dev=virtual_device, processor=EssentialToolbox.not_, inputs=[Button(processor=lambda _: False,
+                                                                                              inputs=[])])
+        reactor = Reactor(context=context,
+                          input_endpoint='inproc://reactor_input_constants',
+                          output_endpoint='inproc://reactor_output_constants',
+                          virtual_controls=design['virtual_controls'] + [constant])
+
+        for (virtual_control, value) in reactor._evaluate_all():
+            reactor._emit(virtual_control, value)
+
+        assert router.poll(1000)
+        assert router.recv_multipart() == [VirtualControlEvent.mk_identity(constant),
+                                           b'',
+                                           VirtualControlEvent(value=True)._serialize_value()]
+        assert not router.poll(0)
+
+        for socket in [*reactor._outputs.values(), reactor._input, router]:
+            socket.close()
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_output_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestRawAxes:
+    def test_case_1(self, mocker, context):
+        """The raw int16 axis values flow untouched through the passthroughs, down to the feeders, and are only
+        converted to floats for the processors."""
+        node = InputNode()
+        device = PhysicalDevice(alias='r', name='r')
+        node.append(device)
+        physical_axis = Axis(dev=device)
+
+        processor_inputs = list()
+
+        def halve(ctrl_states):
+            processor_inputs.extend(ctrl_states.values())
+            return list(ctrl_states.values())[0] / 2
+
+        device = VirtualDevice(node=OutputNode())
+        virtual_axes = [Axis(dev=device, processor=EssentialToolbox.passthrough, inputs=[physical_axis]),
+                        Axis(dev=device, processor=halve, inputs=[physical_axis])]
+
+        multiplexer = OutputMultiplexer(context=context,
+                                        frontend='inproc://reactor_raw_axes_frontend',
+                                        backend='inproc://reactor_raw_axes_backend')
+        reactor = Reactor(context=context,
+                          input_endpoint='inproc://reactor_raw_axes_input',
+                          output_endpoint='inproc://reactor_raw_axes_backend',
+                          virtual_controls=virtual_axes,
+                          axis_encodings={id(axis): AxisEncoding.INT16 for axis in virtual_axes})
+        virtual_joystick = VirtualJoystick(device=device,
+                                           context=context,
+                                           events_endpoint='inproc://reactor_raw_axes_frontend',
+                                           backend='memory')
+        feeder = virtual_joystick._feeder
+        report_axis = mocker.spy(virtual_joystick.output_device, 'report_axis')
+
+        for socket in feeder._sockets:
+            feeder._ready.send(socket)
+        reactor._state[physical_axis] = 0x4000
+        for (virtual_control, value) in reactor._evaluate([physical_axis]):
+            reactor._emit(virtual_control, value)
+        while multiplexer._poller.poll(100):
+            multiplexer.loop()
+        feeder.loop()
+
+        assert processor_inputs == [0x4000 / 0x7FFF]
+        assert isinstance(processor_inputs[0], float)
+        values = {c[1]['axis_id']: c[1]['axis_value'] for c in report_axis.call_args_list}
+        assert values[virtual_axes[0].id] == 0x4000
+        assert isinstance(values[virtual_axes[0].id], int)
+
+        for socket in list(feeder._sockets) + list(reactor._outputs.values()) + [reactor._input,
+                                                                                   multiplexer._frontend,
+                                                                                   multiplexer._backend]:
+            socket.close(linger=0)
@@ -0,0 +1,81 @@
+# pylint: skip-file
+import pytest
+import zmq
+
+from njoy_core.core.state_store import StateStore
+from njoy_core.core.model import InputNode
+from njoy_core.core.model import PhysicalDevice
+from njoy_core.core.model import Axis, Button
+from njoy_core.core.model import PhysicalControlEvent
+
+
+@pytest.fixture(scope="module")
+def context():
+    return zmq.Context()
+
+
+@pytest.fixture(scope="function")
+def controls():
+    node = InputNode()
+    device = PhysicalDevice(alias='s', name='s')
+    node.append(device)
+    return {'axis': Axis(dev=device),
+            'button': Button(dev=device)}
+
+
+def loop_recv(state_store, control, value):
+    event = PhysicalControlEvent(control=control, value=value)
+    state_store._socket.recv_multipart.return_value = event._serialize_control() + [event._serialize_value()]
+    state_store.loop()
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestWaitState:
+    def test_case_1(self, mocker, context, controls):
+        """A state is only available once all the requested controls have a value."""
+        state_store = StateStore(context=context,
+                                 input_endpoint='inproc://input',
+                                 physical_controls=[controls['axis'], controls['button'], controls['button']])
+        mocker.patch.object(state_store._socket, 'recv_multipart', autospec=True)
+
+        loop_recv(state_store, controls['button'], True)
+        assert state_store.wait_state([controls['button']]) == (1, {controls['button']: True})
+        assert state_store.wait_state([controls['axis'], controls['button']], timeout=0.01) is None
+
+        loop_recv(state_store, controls['axis'], 0.5)
+        assert state_store.wait_state([controls['axis'], controls['button']]) == \
+            (2, {controls['axis']: 0.5, controls['button']: True})
+
+    def test_case_2(self, mocker, context, controls):
+        """A reader is only woken up by the changes of its own controls, after the version it already consumed."""
+        state_store = StateStore(context=context,
+                                 input_endpoint='inproc://input',
+                                 physical_controls=[controls['axis'], controls['button']])
+        mocker.patch.object(state_store._socket, 'recv_multipart', autospec=True)
+
+        loop_recv(state_store, controls['button'], True)
+        loop_recv(state_store, controls['axis'], 0.5)
+        (version, _) = state_store.wait_state([controls['button']])
+        assert version == 2
+
+        loop_recv(state_store, controls['axis'], 0.6)
+        loop_recv(state_store, controls['button'], True)  # Unchanged value, no new version
+        assert state_store.version == 3
+        assert state_store.wait_state([controls['button']], version, timeout=0.01) is None
+        assert state_store.wait_state([controls['axis']], version) == (3, {controls['axis']: 0.6})
+
+    def test_case_3(self, mocker, context, controls):
+        """A change only wakes up the readers depending on the changed control."""
+        state_store = StateStore(context=context,
+                                 input_endpoint='inproc://input',
+                                 physical_controls=[controls['axis'], controls['button']])
+        mocker.patch.object(state_store._socket, 'recv_multipart', autospec=True)
+        for (name, control) in controls.items():
+            assert state_store.wait_state([control], timeout=0) is None
+        conditions = {name: state_store._conditions[frozenset([control])] for (name, control) in controls.items()}
+        notified = {name: mocker.spy(condition, 'notify_all') for (name, condition) in conditions.items()}
+
+        loop_recv(state_store, controls['axis'], 0.5)
+        assert (notified['axis'].call_count, notified['button'].call_count) == (1, 0)
+        assert state_store.wait_state([controls['axis']]) == (1, {controls['axis']: 0.5})
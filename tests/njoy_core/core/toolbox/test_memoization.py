@@ -0,0 +1,62 @@
+# pylint: skip-file
+from njoy_core.core.toolbox.memoization import pure, is_pure, memoize, control_domain, MemoizedProcessor
+from njoy_core.core.toolbox.essential_toolbox import EssentialToolbox
+from njoy_core.core.model import Axis, Button, Hat, HatState
+
+
+def mk_processor(cache_size=None):
+    def processor(ctrl_states):
+        processor.call_count += 1
+        return list(ctrl_states.values())[0]
+
+    processor.call_count = 0
+    return pure(processor) if cache_size is None else pure(cache_size=cache_size)(processor)
+
+
+class TestMemoize:
+    def test_case_1(self):
+        """Only the processors marked as pure are memoized."""
+        assert is_pure(EssentialToolbox.not_any)
+        assert not is_pure(EssentialToolbox.passthrough)
+        assert memoize(EssentialToolbox.passthrough, [Button()]) is EssentialToolbox.passthrough
+        assert isinstance(memoize(EssentialToolbox.not_any, [Button()]), MemoizedProcessor)
+
+    def test_case_2(self):
+        """The whole truth table of processors with discrete inputs is computed upfront."""
+        (button, hat) = (Button(), Hat())
+        processor = mk_processor()
+        memoized = memoize(processor, [button, hat])
+        assert processor.call_count == 2 * 9
+
+        assert memoized({button: True, hat: HatState.HAT_UP}) is True
+        assert memoized({button: False, hat: HatState.HAT_UP}) is False
+        assert processor.call_count == 2 * 9
+        assert memoized.hits == 2
+
+    def test_case_3(self):
+        """The results of processors with continuous inputs are kept in a LRU cache."""
+        axis = Axis()
+        processor = mk_processor(cache_size=2)
+        memoized = memoize(processor, [axis])
+        assert processor.call_count == 0
+
+        for value in [0.1, 0.2, 0.1, 0.3, 0.2]:
+            assert memoized({axis: value}) == value
+        assert (memoized.hits, memoized.misses) == (1, 4)
+
+    def test_case_4(self):
+        """A control used several times as input only counts once in the truth table."""
+        (button, hat) = (Button(), Hat())
+        processor = mk_processor()
+        memoized = memoize(processor, [button, hat, button])
+        assert processor.call_count == 2 * 9
+
+        assert memoized({button: True, hat: HatState.HAT_DOWN}) is True
+        assert (memoized.hits, memoized.misses) == (1, 0)
+
+    def test_case_5(self):
+        """The domain of a hat holds all its states, including the center and the diagonals."""
+        assert len(set(control_domain(Hat()))) == 9
+        assert {HatState.HAT_CENTER, HatState.HAT_UP_LEFT, HatState.HAT_DOWN_RIGHT} <= set(control_domain(Hat()))
+        assert control_domain(Button()) == (False, True)
+        assert control_domain(Axis()) is None
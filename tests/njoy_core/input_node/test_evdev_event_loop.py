@@ -0,0 +1,127 @@
+# pylint: skip-file
+import errno
+import pytest
+
+from njoy_core.core.model import InputNode, PhysicalDevice, Axis, Button, Hat, HatState, AxisEncoding
+from njoy_core.core.model import PhysicalControlEvent, PhysicalControlEventBatch, PhysicalDeviceSnapshot
+from njoy_core.input_node.evdev_device import PipeEvdevDevice
+from njoy_core.input_node.evdev_event_loop import EvdevEventLoop, EvdevEventLoopException
+
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+
+
+@pytest.fixture(scope="function")
+def fake_device():
+    device = PipeEvdevDevice(abs_info={0x00: (0, 1023), 0x01: (-0x8000, 0x7FFF), 0x10: (-1, 1), 0x11: (-1, 1)},
+                             key_codes=[0x100, 0x120, 0x121])
+    yield device
+    device.close()
+
+
+@pytest.fixture(scope="function")
+def event_loop(fake_device):
+    node = InputNode()
+    device = PhysicalDevice(alias='a', name='a', guid=fake_device.guid)
+    node.append(device)
+    Axis(dev=device)
+    Axis(dev=device)
+    Button(dev=device)
+    Button(dev=device)
+    Button(dev=device)
+    Hat(dev=device)
+    event_loop = EvdevEventLoop(timeout=0)
+    event_loop._axis_encoding = AxisEncoding.INT16
+    event_loop.attach_devices([device], [fake_device])
+    return event_loop
+
+
+class TestPipeEvdevDevice:
+    def test_case_1(self, fake_device):
+        """The controls are numbered from their evdev codes, and the events are read back in bulk."""
+        assert fake_device.axis_codes == [0x00, 0x01]
+        assert fake_device.button_codes == [0x120, 0x121, 0x100]
+        assert fake_device.hat_codes == [(0x10, 0x11)]
+        assert fake_device.is_joystick
+
+        fake_device.emit([(EV_ABS, 0x00, 1023), (EV_KEY, 0x100, 1)])
+        assert [event[2:] for event in fake_device.read_events()] == [(EV_ABS, 0x00, 1023),
+                                                                      (EV_KEY, 0x100, 1),
+                                                                      (EV_SYN, 0x00, 0)]
+        assert list(fake_device.read_events()) == []
+        assert (fake_device.get_axis(0), fake_device.get_button(2)) == (0x7FFF, True)
+
+    def test_case_2(self, fake_device):
+        """The axis values outside of the declared range are clamped."""
+        scaler = fake_device.mk_axis_scaler(0x00)
+        assert [scaler(value) for value in [-5, 0, 1023, 1030]] == [-0x8000, -0x8000, 0x7FFF, 0x7FFF]
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestEvdevEventLoop:
+    def test_case_1(self, fake_device, event_loop, loopback_socket):
+        """The axes are scaled and coalesced, the button edges are kept in order, and the hats are combined."""
+        device = event_loop._devices[fake_device.fd]['njoy_device']
+        fake_device.emit([(EV_ABS, 0x00, 0), (EV_KEY, 0x100, 1), (EV_ABS, 0x00, 1023), (EV_KEY, 0x100, 0)])
+        fake_device.emit([(EV_ABS, 0x10, 1), (EV_ABS, 0x11, -1)])
+        event_loop.loop(loopback_socket)
+
+        assert PhysicalControlEventBatch.recv_values(loopback_socket, raw_axes=True) == \
+            [(PhysicalControlEvent.mk_identity(device.axes[0]), 0x7FFF),
+             (PhysicalControlEvent.mk_identity(device.buttons[2]), True),
+             (PhysicalControlEvent.mk_identity(device.buttons[2]), False),
+             (PhysicalControlEvent.mk_identity(device.hats[0]), HatState.HAT_RIGHT),
+             (PhysicalControlEvent.mk_identity(device.hats[0]), HatState.HAT_UP_RIGHT)]
+        assert event_loop.stats == {'coalesced': 1, 'suppressed': 0, 'wakeups': 1}
+
+    def test_case_2(self, fake_device, event_loop, loopback_socket):
+        """The full state is the reference for the changes to send, and is emitted again when events were dropped."""
+        device = event_loop._devices[fake_device.fd]['njoy_device']
+        fake_device.emit([(EV_ABS, 0x01, 100), (EV_KEY, 0x121, 1), (EV_ABS, 0x11, 1)])
+        fake_device.read_events()
+        event_loop.emit_full_state(loopback_socket)
+
+        snapshot = PhysicalDeviceSnapshot(**PhysicalDeviceSnapshot._deserialize(loopback_socket.frames, raw_axes=True))
+        assert (snapshot.axes[1], snapshot.buttons[1], snapshot.hats[0]) == (100, True, HatState.HAT_DOWN)
+
+        loopback_socket.frames = None
+        fake_device.emit([(EV_ABS, 0x01, 100), (EV_KEY, 0x121, 1), (EV_ABS, 0x10, 0)])
+        event_loop.loop(loopback_socket)
+        assert loopback_socket.frames is None
+
+        fake_device.emit([(EV_SYN, 0x03, 0)])
+        event_loop.loop(loopback_socket)
+        assert event_loop._full_state_requested.is_set()
+
+    def test_case_3(self, fake_device):
+        """The nJoy devices must all match an evdev device."""
+        with pytest.raises(EvdevEventLoopException):
+            EvdevEventLoop().attach_devices([PhysicalDevice(alias='b', guid=b'\x00' * 16)], [])
+
+    def test_case_4(self, fake_device, event_loop, loopback_socket):
+        """An out of range axis value is sent clamped, instead of breaking the value pack."""
+        device = event_loop._devices[fake_device.fd]['njoy_device']
+        fake_device.emit([(EV_ABS, 0x00, 1030)])
+        event_loop.loop(loopback_socket)
+
+        assert PhysicalControlEventBatch.recv_values(loopback_socket, raw_axes=True) == \
+            [(PhysicalControlEvent.mk_identity(device.axes[0]), 0x7FFF)]
+
+    def test_case_5(self, mocker, loopback_socket):
+        """A device which can't be read anymore is dropped, and the loop keeps going."""
+        fake_device = PipeEvdevDevice()
+        node = InputNode()
+        device = PhysicalDevice(alias='c', name='c', guid=fake_device.guid)
+        node.append(device)
+        Axis(dev=device)
+        event_loop = EvdevEventLoop(timeout=0)
+        event_loop.attach_devices([device], [fake_device])
+
+        fake_device.emit([(EV_ABS, 0x00, 100)])
+        mocker.patch('njoy_core.input_node.evdev_device.os.read', side_effect=OSError(errno.ENODEV, 'No such device'))
+        event_loop.loop(loopback_socket)
+        assert event_loop._devices == {} and event_loop._dispatch_table == {}
+        assert loopback_socket.frames is None
+
+        event_loop.loop(loopback_socket)
+        assert event_loop.stats['wakeups'] == 1
@@ -3,9 +3,35 @@
 # WARNING:
 # Need to set PYSDL2_DLL_PATH=../../../lib64/sdl2 for this test
 #
+import sys
+import types
+from types import SimpleNamespace
+
 import pytest
 import zmq
 
+
+def mk_sdl2():
+    """Minimal stand-in for sdl2, when it (or the SDL library) isn't available : the SDL events are simple namespaces,
+    and the event queue is always empty (the tests patch sdl2.ext.get_events)."""
+    sdl2 = types.ModuleType('sdl2')
+    sdl2.ext = types.ModuleType('sdl2.ext')
+    sdl2.ext.get_events = lambda: []
+    (sdl2.SDL_QUIT, sdl2.SDL_JOYAXISMOTION, sdl2.SDL_JOYHATMOTION) = (0x100, 0x600, 0x602)
+    (sdl2.SDL_JOYBUTTONDOWN, sdl2.SDL_JOYBUTTONUP) = (0x603, 0x604)
+    sdl2.SDL_WaitEventTimeout = lambda event, timeout: 0
+    sys.modules.update({'sdl2': sdl2, 'sdl2.ext': sdl2.ext})
+    return sdl2
+
+
+try:
+    import sdl2
+    import sdl2.ext
+except (ImportError, RuntimeError):  # pysdl2 raises a RuntimeError when it can't find the SDL library
+    sdl2 = mk_sdl2()
+
+from njoy_core.core.model import InputNode, PhysicalDevice, Axis, Button, AxisEncoding
+from njoy_core.core.model import PhysicalControlEvent, PhysicalControlEventBatch
 from njoy_core.input_node.hid_event_loop import HidEventLoop
 
 
@@ -32,3 +58,108 @@ class TestLoop:
         input_node = MockInputNode(context)
         hid_event_loop = HidEventLoop()
         mocker.patch('sdl2.ext.get_events')
+
+
+def axis_motion(axis, value):
+    return SimpleNamespace(type=sdl2.SDL_JOYAXISMOTION, jaxis=SimpleNamespace(which=0, axis=axis, value=value))
+
+
+def button(button, state):
+    return SimpleNamespace(type=sdl2.SDL_JOYBUTTONDOWN if state else sdl2.SDL_JOYBUTTONUP,
+                           jbutton=SimpleNamespace(which=0, button=button, state=state))
+
+
+@pytest.fixture(scope="function")
+def hid_event_loop():
+    node = InputNode()
+    device = PhysicalDevice(alias='a', name='a')
+    node.append(device)
+    Axis(dev=device)
+    Axis(dev=device)
+    Button(dev=device)
+    hid_event_loop = HidEventLoop()
+    hid_event_loop._devices = {0: {'njoy_device': device, 'sdl_device': None}}
+    hid_event_loop._axis_encoding = AxisEncoding.INT16
+    hid_event_loop._build_dispatch_table()
+    return hid_event_loop
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestCoalescing:
+    def test_case_1(self, mocker, hid_event_loop, loopback_socket):
+        """The axes are coalesced to their latest value, while all the edges of the buttons are kept in order."""
+        mocker.patch('time.sleep')
+        mocker.patch('sdl2.ext.get_events', return_value=[axis_motion(0, 100),
+                                                          button(0, 1),
+                                                          axis_motion(1, 5),
+                                                          axis_motion(0, 200),
+                                                          button(0, 0)])
+        device = hid_event_loop._devices[0]['njoy_device']
+        hid_event_loop.loop(loopback_socket)
+
+        assert PhysicalControlEventBatch.recv_values(loopback_socket, raw_axes=True) == \
+            [(PhysicalControlEvent.mk_identity(device.axes[0]), 200),
+             (PhysicalControlEvent.mk_identity(device.buttons[0]), True),
+             (PhysicalControlEvent.mk_identity(device.axes[1]), 5),
+             (PhysicalControlEvent.mk_identity(device.buttons[0]), False)]
+        assert hid_event_loop.stats['coalesced'] == 1
+
+    def test_case_2(self, mocker, hid_event_loop, loopback_socket):
+        """The values identical to the last ones sent are never sent again."""
+        mocker.patch('time.sleep')
+        get_events = mocker.patch('sdl2.ext.get_events', return_value=[axis_motion(0, 100), button(0, 1)])
+        device = hid_event_loop._devices[0]['njoy_device']
+        hid_event_loop.loop(loopback_socket)
+
+        loopback_socket.frames = None
+        get_events.return_value = [axis_motion(0, 100), button(0, 1)]
+        hid_event_loop.loop(loopback_socket)
+        assert loopback_socket.frames is None
+        assert hid_event_loop.stats['suppressed'] == 2
+
+        get_events.return_value = [axis_motion(0, 100), axis_motion(1, 100)]
+        hid_event_loop.loop(loopback_socket)
+        assert PhysicalControlEventBatch.recv_values(loopback_socket, raw_axes=True) == \
+            [(PhysicalControlEvent.mk_identity(device.axes[1]), 100)]
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestDispatchTable:
+    def test_case_1(self, hid_event_loop):
+        """The dispatch table holds the pre-packed identity of each control, and the function packing its values."""
+        device = hid_event_loop._devices[0]['njoy_device']
+        assert set(hid_event_loop._dispatch_table) == {(0, 'axis', 0), (0, 'axis', 1), (0, 'button', 0)}
+
+        (identity, value_packer) = hid_event_loop._dispatch_table[(0, 'axis', 1)]
+        assert identity == PhysicalControlEvent.mk_identity(device.axes[1])
+        assert value_packer(-0x8000) == b'\x80\x00'
+
+    def test_case_2(self, mocker, hid_event_loop, loopback_socket):
+        """The events of unknown controls are ignored, and with the float64 encoding the raw values are converted."""
+        mocker.patch('time.sleep')
+        mocker.patch('sdl2.ext.get_events', return_value=[axis_motion(0, 0x7FFF), axis_motion(5, 0)])
+        hid_event_loop._axis_encoding = AxisEncoding.FLOAT64
+        hid_event_loop._build_dispatch_table()
+        device = hid_event_loop._devices[0]['njoy_device']
+        hid_event_loop.loop(loopback_socket)
+
+        assert PhysicalControlEventBatch.recv_values(loopback_socket) == \
+            [(PhysicalControlEvent.mk_identity(device.axes[0]), 1.0)]
+
+
+@pytest.mark.ensure_clean_input_node_cache
+@pytest.mark.ensure_clean_physical_device_cache
+class TestWaitStrategy:
+    def test_case_1(self, mocker, loopback_socket):
+        """The loop waits with the configured strategy after each drain, and counts its iterations."""
+        mocker.patch('sdl2.ext.get_events', return_value=[])
+        wait_event = mocker.patch('sdl2.SDL_WaitEventTimeout')
+        hid_event_loop = HidEventLoop(wait_strategy='blocking')
+        hid_event_loop._devices = dict()
+        hid_event_loop.loop(loopback_socket)
+        hid_event_loop.loop(loopback_socket)
+
+        assert wait_event.call_count == 2
+        assert hid_event_loop.stats['iterations'] == 2
@@ -0,0 +1,38 @@
+# pylint: skip-file
+import pytest
+
+from njoy_core.input_node.wait_strategies import mk_wait_strategy, WaitStrategyError
+
+
+class TestWaitStrategies:
+    def test_case_1(self, mocker):
+        """The blocking strategy waits on SDL, and leaves the event in the queue."""
+        wait_event = mocker.Mock()
+        strategy = mk_wait_strategy('blocking', timeout=20, wait_event=wait_event)
+        strategy.wait(0)
+        wait_event.assert_called_once_with(None, 20)
+
+    def test_case_2(self, mocker):
+        """The adaptive strategy spins while the events keep coming, and backs off exponentially when idle."""
+        sleep = mocker.patch('time.sleep')
+        strategy = mk_wait_strategy('adaptive', min_sleep_time=0.001, max_sleep_time=0.003)
+        for nb_events in [0, 0, 0, 1, 0]:
+            strategy.wait(nb_events)
+        assert [c[0][0] for c in sleep.call_args_list] == [0.001, 0.002, 0.003, 0.001]
+        assert strategy.sleep_time == 0.001
+
+    def test_case_3(self, mocker, clock):
+        """The stats count the iterations and the time spent waiting."""
+        def sleep(duration):
+            clock.now += duration
+
+        mocker.patch('time.sleep', side_effect=sleep)
+        strategy = mk_wait_strategy('sleep', sleep_time=0.25, clock=clock)
+        for _ in range(4):
+            strategy.wait(1)
+            clock.now += 0.25
+        assert strategy.stats == {'iterations': 4, 'iterations_per_second': 2.0, 'idle_time': 1.0}
+
+    def test_case_4(self):
+        with pytest.raises(WaitStrategyError):
+            mk_wait_strategy('unknown')
@@ -0,0 +1,125 @@
+# pylint: skip-file
+import pytest
+import zmq
+
+from njoy_core.core.model import OutputNode, VirtualDevice, Axis, Button, Hat, HatState
+from njoy_core.core.model import VirtualControlEvent, VirtualControlEventBatch
+from njoy_core.output_node.memory_device import MemoryDevice
+from njoy_core.output_node.virtual_joystick import VirtualJoystick
+
+
+class TestMemoryDevice:
+    def test_case_1(self, clock):
+        """The staged changes are recorded with the time of the report which sends them."""
+        device = MemoryDevice(device_id=0, clock=clock)
+        device.report_axis(axis_id=0, axis_value=0.5)
+        device.report_button(button_id=3, state=True)
+        clock.now = 1.0
+        device.send_report()
+        clock.now = 2.0
+        device.set_cont_pov(pov_id=1, pov_value=9000)
+
+        assert device.records() == [(1.0, MemoryDevice.Kind.AXIS, 0, 0.5),
+                                    (1.0, MemoryDevice.Kind.BUTTON, 3, 1),
+                                    (2.0, MemoryDevice.Kind.POV, 1, 9000)]
+
+    def test_case_2(self):
+        """Only the last records are kept, in the preallocated ring buffer."""
+        device = MemoryDevice(device_id=0, capacity=4)
+        for value in range(10):
+            device.set_axis(axis_id=1, axis_value=value / 10)
+
+        assert device.count == 10
+        assert [record[3] for record in device.records()] == [0.6, 0.7, 0.8, 0.9]
+
+    def test_case_3(self):
+        """The raw int16 axis values are recorded as floats, like the float ones."""
+        device = MemoryDevice(device_id=0)
+        device.set_axis(axis_id=0, axis_value=-0x8000)
+        device.set_axis(axis_id=0, axis_value=0x7FFF)
+        device.report_axis(axis_id=1, axis_value=0)
+        device.report_axis(axis_id=2, axis_value=-0.25)
+        device.send_report()
+
+        assert [record[3] for record in device.records()] == [-1.0, 1.0, 0.0, -0.25]
+
+
+@pytest.mark.ensure_clean_output_node_cache
+class TestVirtualJoystick:
+    def test_case_1(self):
+        """The memory backend is selected by configuration, and records what the feeder sends."""
+        device = VirtualDevice(node=OutputNode())
+        (axis, button, hat) = (Axis(dev=device), Button(dev=device), Hat(dev=device))
+        ctx = zmq.Context()
+        virtual_joystick = VirtualJoystick(device=device,
+                                           context=ctx,
+                                           events_endpoint='inproc://test_memory_device',
+                                           streaming=True,
+                                           backend='memory')
+        feeder = virtual_joystick._feeder
+        feeder._stage(VirtualControlEvent.mk_identity(axis), -0x8000)
+        feeder._stage(VirtualControlEvent.mk_identity(button), True)
+        feeder._stage(VirtualControlEvent.mk_identity(hat), HatState.HAT_LEFT)
+        feeder._flush()
+
+        assert isinstance(virtual_joystick.output_device, MemoryDevice)
+        assert [record[1:] for record in virtual_joystick.output_device.records()] == \
+            [(MemoryDevice.Kind.AXIS, 0, -1.0),
+             (MemoryDevice.Kind.BUTTON, 0, 1),
+             (MemoryDevice.Kind.POV, 0, 27000)]
+        assert virtual_joystick.stats == {'updates': 3, 'reports': 1, 'coalesced': 2}
+
+        feeder._socket.close()
+        ctx.term()
+
+    def test_case_2(self):
+        """Each edge of a streamed batch is sent in its own report, so a press and release are never collapsed."""
+        device = VirtualDevice(node=OutputNode())
+        (axis, button) = (Axis(dev=device), Button(dev=device))
+        ctx = zmq.Context()
+        router = ctx.socket(zmq.ROUTER)
+        router.bind('inproc://test_memory_device_edges')
+        virtual_joystick = VirtualJoystick(device=device,
+                                           context=ctx,
+                                           events_endpoint='inproc://test_memory_device_edges',
+                                           streaming=True,
+                                           backend='memory')
+        feeder = virtual_joystick._feeder
+        feeder._socket.send(b'')  # Let the router learn the identity of the feeder
+        (stream, _) = router.recv_multipart()
+
+        entries = [(VirtualControlEvent.mk_identity(button), VirtualControlEvent(value=True)._serialize_value()),
+                   (VirtualControlEvent.mk_identity(axis), VirtualControlEvent(value=0.5)._serialize_value()),
+                   (VirtualControlEvent.mk_identity(button), VirtualControlEvent(value=False)._serialize_value())]
+        router.send_multipart([stream, VirtualControlEventBatch.__MARKER__, b'',
+                               VirtualControlEventBatch.pack_entries(entries)])
+        feeder.loop()
+
+        assert [record[1:] for record in virtual_joystick.output_device.records()] == \
+            [(MemoryDevice.Kind.BUTTON, 0, 1),
+             (MemoryDevice.Kind.AXIS, 0, 0.5),
+             (MemoryDevice.Kind.BUTTON, 0, 0)]
+        assert virtual_joystick.stats['reports'] == 2
+
+        for socket in [feeder._socket, router]:
+            socket.close(linger=0)
+        ctx.term()
+
+    def test_case_3(self, mocker):
+        """The output device is closed once its feeder stops."""
+        device = VirtualDevice(node=OutputNode())
+        Axis(dev=device)
+        ctx = zmq.Context()
+        virtual_joystick = VirtualJoystick(device=device,
+                                           context=ctx,
+                                           events_endpoint='inproc://test_memory_device_close',
+                                           backend='memory')
+        feeder = virtual_joystick._feeder
+        mocker.patch.object(feeder, 'run')
+        close = mocker.patch.object(virtual_joystick.output_device, 'close')
+        virtual_joystick.run()
+
+        close.assert_called_once_with()
+        for socket in feeder._sockets:
+            socket.close(linger=0)
+        ctx.term()
@@ -0,0 +1,45 @@
+# pylint: skip-file
+from njoy_core.output_node.scheduler import OutputScheduler
+
+
+class TestOutputScheduler:
+    def test_case_1(self):
+        """Without any rate, every change is flushed right away."""
+        scheduler = OutputScheduler()
+        assert not scheduler.is_due()
+        assert scheduler.timeout() is None
+
+        scheduler.stage()
+        assert scheduler.is_due()
+        scheduler.flushed()
+        assert scheduler.stats == {'updates': 1, 'reports': 1, 'coalesced': 0}
+
+    def test_case_2(self, clock):
+        """With a rate, the axes changes are coalesced until the end of the period."""
+        scheduler = OutputScheduler(rate=500, clock=clock)
+        scheduler.stage()
+        scheduler.flushed()
+
+        clock.now = 0.001
+        scheduler.stage()
+        scheduler.stage()
+        assert not scheduler.is_due()
+        assert scheduler.timeout() == 1
+
+        clock.now = 0.002
+        assert scheduler.is_due()
+        scheduler.flushed()
+        assert scheduler.stats == {'updates': 3, 'reports': 2, 'coalesced': 1}
+
+    def test_case_3(self, clock):
+        """The edges are flushed immediately, along with everything staged so far."""
+        scheduler = OutputScheduler(rate=500, clock=clock)
+        scheduler.stage()
+        scheduler.flushed()
+
+        scheduler.stage()
+        scheduler.stage(edge=True)
+        assert scheduler.is_due()
+        assert scheduler.timeout() == 0
+        scheduler.flushed()
+        assert scheduler.stats == {'updates': 3, 'reports': 2, 'coalesced': 1}
@@ -0,0 +1,80 @@
+# pylint: skip-file
+import os
+import pytest
+
+from njoy_core.core.model import ControlEvent
+from njoy_core.output_node.uinput_device import UInputDevice, UInputDeviceError
+
+
+def read_events(path):
+    data = open(path, 'rb').read()[UInputDevice._user_dev.size:]
+    return [UInputDevice._input_event.unpack_from(data, offset)[2:]
+            for offset in range(0, len(data), UInputDevice._input_event.size)]
+
+
+class TestUInputDevice:
+    def test_case_1(self, tmp_path):
+        """A file-backed device only receives the device setup, until a report is sent."""
+        path = tmp_path / 'uinput'
+        device = UInputDevice(device_id=0, path=str(path))
+        device.send_report()
+        device.close()
+
+        data = open(str(path), 'rb').read()
+        assert len(data) == UInputDevice._user_dev.size
+        assert data.startswith(b'nJoy Virtual Joystick 0\x00')
+
+    def test_case_2(self, tmp_path):
+        """All the changes of a frame are written at once, followed by a single EV_SYN."""
+        path = tmp_path / 'uinput'
+        device = UInputDevice(device_id=0, path=str(path))
+        device.report_axis(axis_id=1, axis_value=0x4000)
+        device.report_axis(axis_id=0, axis_value=-1.0)
+        device.report_axis(axis_id=1, axis_value=0x7FFF)  # Only the last value of the frame is written
+        device.report_button(button_id=17, state=True)
+        device.report_cont_pov(pov_id=1, pov_value=13500)
+        device.send_report()
+        device.close()
+
+        assert read_events(str(path)) == [(0x03, 0x01, 0x7FFF),
+                                          (0x03, 0x00, -0x7FFF),
+                                          (0x01, 0x2C1, 1),
+                                          (0x03, 0x12, 1),
+                                          (0x03, 0x13, 1),
+                                          (0x00, 0x00, 0)]
+
+    def test_case_3(self, tmp_path):
+        """The set_* methods send their change right away."""
+        path = tmp_path / 'uinput'
+        device = UInputDevice(device_id=1, path=str(path))
+        device.set_button(button_id=0, state=True)
+        device.set_cont_pov(pov_id=0, pov_value=-1)
+        device.close()
+
+        assert read_events(str(path)) == [(0x01, 0x120, 1), (0x00, 0x00, 0),
+                                          (0x03, 0x10, 0), (0x03, 0x11, 0), (0x00, 0x00, 0)]
+
+    def test_case_4(self, tmp_path, mocker):
+        """Without an explicit path, the uinput device node is never created, and must be a character device."""
+        path = tmp_path / 'uinput'
+        mocker.patch.object(UInputDevice, '__UINPUT_PATH__', str(path))
+        with pytest.raises(UInputDeviceError):
+            UInputDevice(device_id=0)
+        assert not path.exists()
+
+        path.write_bytes(b'')
+        with pytest.raises(UInputDeviceError):
+            UInputDevice(device_id=0)
+
+    @pytest.mark.parametrize("value", [-0x8000, -1, 0, 1, 0x7FFF])
+    def test_case_5(self, value):
+        """The raw int16 axis values are consistent with the conversion of the floats."""
+        assert UInputDevice._to_axis_value(value) == UInputDevice._to_axis_value(ControlEvent.axis_to_float(value))
+
+    def test_case_6(self, tmp_path, mocker):
+        """The device is closed if its setup fails."""
+        mocker.patch.object(UInputDevice, '_ioctl', side_effect=PermissionError(1, 'Operation not permitted'))
+        close = mocker.spy(os, 'close')
+        with pytest.raises(PermissionError):
+            UInputDevice(device_id=0, path=str(tmp_path / 'uinput'))
+        close.assert_called_once()
@@ -0,0 +1,127 @@
+# pylint: skip-file
+import importlib
+import sys
+import types
+import pytest
+import zmq
+
+from njoy_core.core.model import OutputNode, VirtualDevice, Axis, Button, Hat, HatState
+from njoy_core.core.model import ControlEvent, VirtualControlEvent
+
+
+def mk_pyvjoy():
+    """Minimal stand-in for pyvjoy (which needs the vJoy driver) : the position report is a plain namespace."""
+    class VJoyDevice:
+        def __init__(self, rID=None, data=None):
+            self.rID = rID
+            self.data = data if data is not None else types.SimpleNamespace()
+
+        def reset(self):
+            pass
+
+        def update(self):
+            pass
+
+    pyvjoy = types.ModuleType('pyvjoy')
+    pyvjoy.VJoyDevice = VJoyDevice
+    for (i, usage) in enumerate(['X', 'Y', 'Z', 'RX', 'RY', 'RZ', 'SL0', 'SL1', 'WHL', 'POV']):
+        setattr(pyvjoy, 'HID_USAGE_{}'.format(usage), 0x30 + i)
+    return pyvjoy
+
+
+@pytest.fixture(scope="function")
+def vjoy_device(mocker):
+    # The modules imported while pyvjoy is stubbed are discarded along with the stub
+    mocker.patch.dict(sys.modules, {'pyvjoy': mk_pyvjoy()})
+    return importlib.import_module('njoy_core.output_node.vjoy_device')
+
+
+class TestVJoyDevice:
+    def test_case_1(self, vjoy_device):
+        """The position report starts centered, with all the buttons and povs released."""
+        device = vjoy_device.VJoyDevice(device_id=0)
+        assert device.rID == 1
+        assert (device.data.wAxisX, device.data.wWheel) == (0x4000, 0x4000)
+        assert (device.data.lButtons, device.data.lButtonsEx3) == (0, 0)
+        assert (device.data.bHats, device.data.bHatsEx3) == (0xFFFFFFFF, 0xFFFFFFFF)
+
+    def test_case_2(self, vjoy_device):
+        """The button groups are signed LONGs, of 32 buttons each."""
+        device = vjoy_device.VJoyDevice(device_id=0)
+        device.report_button(button_id=31, state=True)
+        assert device.data.lButtons == -0x80000000
+        device.report_button(button_id=0, state=True)
+        assert device.data.lButtons == -0x7FFFFFFF
+
+        device.report_button(button_id=32, state=True)
+        assert (device.data.lButtons, device.data.lButtonsEx1) == (-0x7FFFFFFF, 1)
+        device.report_button(button_id=31, state=False)
+        device.report_button(button_id=32, state=False)
+        assert (device.data.lButtons, device.data.lButtonsEx1) == (1, 0)
+
+    def test_case_3(self, vjoy_device):
+        """The axes are reported into their own field, and the povs as DWORDs."""
+        device = vjoy_device.VJoyDevice(device_id=0)
+        device.report_axis(axis_id=3, axis_value=1.0)
+        device.report_axis(axis_id=8, axis_value=-1.0)
+        assert (device.data.wAxisXRot, device.data.wWheel, device.data.wAxisX) == (0x8000, 0x0001, 0x4000)
+
+        device.report_cont_pov(pov_id=1, pov_value=27000)
+        assert device.data.bHatsEx1 == 27000
+        device.report_cont_pov(pov_id=1, pov_value=-1)
+        assert device.data.bHatsEx1 == 0xFFFFFFFF
+
+    def test_case_4(self, mocker, vjoy_device):
+        """The whole position report is sent in a single call."""
+        device = vjoy_device.VJoyDevice(device_id=0)
+        update = mocker.patch.object(device, 'update')
+        device.report_axis(axis_id=0, axis_value=0.0)
+        device.report_button(button_id=1, state=True)
+        device.send_report()
+        update.assert_called_once_with()
+
+    @pytest.mark.parametrize("value", [-0x8000, -1, 0, 1, 0x7FFF])
+    def test_case_5(self, vjoy_device, value):
+        """The raw int16 axis values are converted through a table, consistent with the conversion of the floats."""
+        to_vjoy_axis_value = vjoy_device.VJoyDevice._to_vjoy_axis_value
+        assert to_vjoy_axis_value(value) == to_vjoy_axis_value(ControlEvent.axis_to_float(value))
+
+
+@pytest.mark.ensure_clean_output_node_cache
+class TestLockstepFeeder:
+    def test_case_1(self, mocker, vjoy_device):
+        """All the events available are staged into the position report, then sent with a single update()."""
+        from njoy_core.output_node.virtual_joystick import VirtualJoystick
+
+        device = VirtualDevice(node=OutputNode())
+        (axis, button, hat) = (Axis(dev=device), Button(dev=device), Hat(dev=device))
+        ctx = zmq.Context()
+        router = ctx.socket(zmq.ROUTER)
+        router.bind('inproc://test_vjoy_device_lockstep')
+        virtual_joystick = VirtualJoystick(device=device,
+                                           context=ctx,
+                                           events_endpoint='inproc://test_vjoy_device_lockstep',
+                                           backend='vjoy')
+        update = mocker.patch.object(virtual_joystick.output_device, 'update')
+        feeder = virtual_joystick._feeder
+        for socket in feeder._sockets:
+            feeder._ready.send(socket)
+        identities = [router.recv_multipart()[0] for _ in feeder._sockets]
+
+        values = {VirtualControlEvent.mk_identity(axis): 1.0,
+                  VirtualControlEvent.mk_identity(button): True,
+                  VirtualControlEvent.mk_identity(hat): HatState.HAT_RIGHT}
+        for identity in identities:
+            router.send_multipart([identity, b'', VirtualControlEvent(value=values[identity])._serialize_value()])
+        for socket in feeder._sockets:
+            assert socket.poll(1000)
+        feeder.loop()
+
+        update.assert_called_once_with()
+        data = virtual_joystick.output_device.data
+        assert (data.wAxisX, data.lButtons, data.bHats) == (0x8000, 1, 9000)
+        assert sorted([router.recv_multipart()[0] for _ in feeder._sockets]) == sorted(identities)  # Ready again
+
+        for socket in list(feeder._sockets) + [router]:
+            socket.close(linger=0)
+        ctx.term()